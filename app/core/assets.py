@@ -0,0 +1,202 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+import time
+
+from .database import DATA_DIR
+
+try:  # brotli é opcional: sem ele só há a variante gzip
+    import brotli
+except ImportError:  # pragma: no cover - depende do ambiente
+    brotli = None
+
+# ==============================================================================
+# ARQUIVOS ESTÁTICOS COM IMPRESSÃO DIGITAL (hash do conteúdo na URL)
+#
+# - No startup cada arquivo de app/static ganha uma URL com o hash do conteúdo
+#   (styles.css -> /assets/styles.3f2a9c1b7d4e.css). Conteúdo novo = URL nova,
+#   então a resposta pode ser "immutable": visitas seguintes não pedem nada.
+# - Nos templates: {{ asset_url("styles.css") }}.
+# - Variantes br/gzip são comprimidas uma vez (numa thread) e guardadas em
+#   ASSET_CACHE_DIR/<hash>.br|.gz; a escolhida vem do Accept-Encoding.
+#   Só ficam as que economizam pelo menos MIN_SAVING (PDF quase não encolhe).
+# - /static continua servindo os mesmos arquivos pelo nome (links antigos).
+# ==============================================================================
+
+STATIC_DIR = os.path.join("app", "static")
+URL_PREFIX = "/assets"
+CACHE_DIR = os.getenv("ASSET_CACHE_DIR", os.path.join(DATA_DIR, "assets"))
+PRECOMPRESS = os.getenv("ASSET_PRECOMPRESS", "1") == "1"
+MIN_SAVING = float(os.getenv("ASSET_MIN_SAVING", "0.1"))
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+HASH_LEN = 12
+
+# preferência do servidor quando o cliente aceita as duas
+ENCODINGS = (("br", "br"), ("gzip", "gz"))
+
+log = logging.getLogger("setting.assets")
+
+
+class Asset:
+    __slots__ = ("path", "file", "digest", "url", "media_type", "variants")
+
+    def __init__(self, path: str, file: str, digest: str, url: str):
+        self.path = path            # nome lógico ("biblioteca_base/x.pdf")
+        self.file = file            # caminho no disco
+        self.digest = digest
+        self.url = url
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.variants: dict[str, str] = {}  # content-encoding -> arquivo comprimido
+
+
+def _digest(file: str) -> str:
+    h = hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()[:HASH_LEN]
+
+
+def _fingerprinted(path: str, digest: str) -> str:
+    base, ext = os.path.splitext(path)
+    return f"{base}.{digest}{ext}"
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class AssetManifest:
+    def __init__(self):
+        self._by_path: dict[str, Asset] = {}
+        self._by_url: dict[str, Asset] = {}
+
+    def build(self) -> dict:
+        """Calcula o hash de cada arquivo de STATIC_DIR e liga as variantes que já estão no cache."""
+        started = time.perf_counter()
+        by_path, by_url = {}, {}
+        for root, dirs, files in os.walk(STATIC_DIR):
+            dirs[:] = sorted(d for d in dirs if not d.startswith((".", "__")))
+            for name in sorted(files):
+                if name.startswith("."):
+                    continue
+                file = os.path.join(root, name)
+                path = os.path.relpath(file, STATIC_DIR).replace(os.sep, "/")
+                digest = _digest(file)
+                asset = Asset(path, file, digest, _fingerprinted(path, digest))
+                self._attach_variants(asset)
+                by_path[path] = by_url[asset.url] = asset
+        # troca de uma vez: requisições em andamento veem o manifesto velho ou o novo
+        self._by_path, self._by_url = by_path, by_url
+        return {"arquivos": len(by_path), "segundos": round(time.perf_counter() - started, 3)}
+
+    def _attach_variants(self, asset: Asset) -> None:
+        for encoding, ext in ENCODINGS:
+            variant = os.path.join(CACHE_DIR, f"{asset.digest}.{ext}")
+            if os.path.exists(variant):
+                asset.variants[encoding] = variant
+
+    def precompress(self) -> dict:
+        """Comprime o que ainda não está no cache; quem não compensa ganha um marcador .none."""
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        made = skipped = 0
+        for asset in list(self._by_path.values()):
+            data = None
+            for encoding, ext in ENCODINGS:
+                if encoding == "br" and brotli is None:
+                    continue
+                variant = os.path.join(CACHE_DIR, f"{asset.digest}.{ext}")
+                marker = variant + ".none"
+                if os.path.exists(variant) or os.path.exists(marker):
+                    continue
+                if data is None:
+                    with open(asset.file, "rb") as f:
+                        data = f.read()
+                packed = _compress(data, encoding)
+                if len(packed) > len(data) * (1 - MIN_SAVING):
+                    open(marker, "wb").close()
+                    skipped += 1
+                    continue
+                tmp = f"{variant}.{os.getpid()}.part"
+                with open(tmp, "wb") as f:
+                    f.write(packed)
+                os.replace(tmp, variant)
+                made += 1
+            self._attach_variants(asset)
+        return {"comprimidos": made, "sem_ganho": skipped}
+
+    def url(self, path: str) -> str:
+        asset = self._by_path.get(path.lstrip("/"))
+        if asset is None:
+            # arquivo fora do manifesto (ou antes do startup): nome fixo, sem cache longo
+            return f"/static/{path.lstrip('/')}"
+        return f"{URL_PREFIX}/{asset.url}"
+
+    def lookup(self, url_path: str) -> Asset | None:
+        return self._by_url.get(url_path)
+
+
+manifest = AssetManifest()
+
+
+def asset_url(path: str) -> str:
+    """Global dos templates: URL com impressão digital de um arquivo de app/static."""
+    return manifest.url(path)
+
+
+def install(templates) -> None:
+    """Registra asset_url num Jinja2Templates (cada router tem o seu)."""
+    templates.env.globals["asset_url"] = asset_url
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """Codificações com q > 0 no Accept-Encoding ("*" vale para as que não foram citadas)."""
+    accepted, refused, star = set(), set(), False
+    for part in (header or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name == "*":
+            star = q > 0
+        elif name:
+            (accepted if q > 0 else refused).add(name)
+    if star:
+        accepted |= {enc for enc, _ in ENCODINGS} - refused
+    return accepted
+
+
+def choose_variant(asset: Asset, accept_encoding: str) -> tuple[str | None, str]:
+    """(content-encoding ou None, arquivo a servir)."""
+    if asset.variants:
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in accepted and encoding in asset.variants:
+                return encoding, asset.variants[encoding]
+    return None, asset.file
+
+
+def _precompress_in_background() -> None:
+    try:
+        log.info("assets precompressed", extra=manifest.precompress())
+    except Exception as e:  # noqa: BLE001 - sem variantes o arquivo sai sem compressão
+        log.warning("asset precompress failed: %s", e)
+
+
+def start() -> None:
+    summary = manifest.build()
+    log.info("assets fingerprinted", extra=summary)
+    if PRECOMPRESS:
+        threading.Thread(target=_precompress_in_background, name="setting-assets", daemon=True).start()
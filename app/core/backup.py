@@ -0,0 +1,215 @@
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+from . import metrics, shards
+from .database import DATA_DIR, DB_PATH
+
+# ==============================================================================
+# BACKUP ONLINE DO SQLITE (sem parar o serviço)
+#
+# - API de backup do SQLite em passos de BACKUP_PAGES páginas, com pausa de
+#   BACKUP_SLEEP_MS entre eles: a origem fica livre para os escritores.
+#   Se a origem muda no meio, o SQLite recomeça a cópia; depois de
+#   BACKUP_MAX_RESTARTS recomeços, o resto vai num passo só.
+# - A cópia é conferida (PRAGMA integrity_check) e comprimida em gzip, em
+#   streaming, para BACKUP_DIR; ficam os BACKUP_KEEP mais recentes por banco.
+# - Restaurar = descomprimir para um arquivo NOVO em BACKUP_DIR/restaurados;
+#   o banco em uso nunca é sobrescrito (troque o DB_PATH e reinicie).
+# ==============================================================================
+
+BACKUP_DIR = os.getenv("BACKUP_DIR", os.path.join(DATA_DIR, "backups"))
+RESTORE_DIR = os.path.join(BACKUP_DIR, "restaurados")
+KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+PAGES = int(os.getenv("BACKUP_PAGES", "256"))
+SLEEP = float(os.getenv("BACKUP_SLEEP_MS", "10")) / 1000.0
+MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", "3"))
+
+SUFFIX = ".db.gz"
+_CHUNK = 1024 * 1024
+
+log = logging.getLogger("setting.backup")
+
+DURATION = metrics.histogram(
+    "setting_backup_duration_seconds",
+    "Duração do backup (cópia + verificação + compressão).",
+    ("db",),
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+SIZE = metrics.gauge("setting_backup_size_bytes", "Tamanho do último backup comprimido.", ("db",))
+LAST_SUCCESS = metrics.gauge("setting_backup_last_success_timestamp", "Epoch do último backup bem-sucedido.", ("db",))
+FAILURES = metrics.counter("setting_backup_failures_total", "Backups que falharam.", ("db",))
+
+
+class BackupError(Exception):
+    pass
+
+
+def _integrity(path: str) -> None:
+    conn = sqlite3.connect(f"file:{Path(path).as_posix()}?mode=ro", uri=True)
+    try:
+        rows = [r[0] for r in conn.execute("PRAGMA integrity_check")]
+    finally:
+        conn.close()
+    if rows != ["ok"]:
+        raise BackupError(f"integrity_check falhou: {'; '.join(rows[:5])}")
+
+
+def _remove_db(path: str, keep_main: bool = False) -> None:
+    """Apaga o arquivo e os -wal/-shm: a cópia herda o modo WAL da origem e o integrity_check os cria."""
+    for p in ((path,) if not keep_main else ()) + (path + "-wal", path + "-shm"):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+class _TooBusy(Exception):
+    pass
+
+
+def _copy(src_path: str, dst_path: str) -> dict:
+    """Cópia online em passos; devolve páginas copiadas e recomeços."""
+    src = sqlite3.connect(f"file:{Path(src_path).as_posix()}?mode=ro", uri=True)
+    dst = sqlite3.connect(dst_path)
+    state = {"pages": 0, "restarts": 0, "remaining": None}
+
+    def _progress(status, remaining, total):
+        # o que falta só cresce quando a origem mudou e a cópia recomeçou
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > MAX_RESTARTS:
+                raise _TooBusy()
+        state["remaining"], state["pages"] = remaining, total
+        if remaining:
+            time.sleep(SLEEP)
+
+    try:
+        try:
+            src.backup(dst, pages=PAGES, progress=_progress)
+        except _TooBusy:
+            # origem muito movimentada: termina num passo só
+            # (no WAL o leitor não bloqueia o escritor, só segura o checkpoint)
+            log.warning("backup restarted %d times, finishing in one step", state["restarts"], extra={"db": src_path})
+            src.backup(dst, pages=-1)
+    finally:
+        src.close()
+        dst.close()
+    return {"paginas": state["pages"], "recomecos": state["restarts"]}
+
+
+def _compress(src_path: str, dst_path: str) -> None:
+    tmp = dst_path + ".part"
+    with open(src_path, "rb") as fin, gzip.open(tmp, "wb", compresslevel=6) as fout:
+        shutil.copyfileobj(fin, fout, _CHUNK)
+    os.replace(tmp, dst_path)
+
+
+def _rotate(stem: str, keep: int = KEEP) -> int:
+    old = [b for b in list_backups() if b["db"] == stem][keep:]
+    for b in old:
+        os.remove(os.path.join(BACKUP_DIR, b["name"]))
+    return len(old)
+
+
+def backup_file(src_path: str, stem: str) -> dict:
+    """Faz o backup de um arquivo SQLite; devolve um resumo."""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    # milissegundos: dois backups no mesmo segundo não se sobrescrevem
+    name = f"{stem}-{now:%Y%m%d}-{now:%H%M%S%f}"[:-3] + SUFFIX
+    raw = os.path.join(BACKUP_DIR, f".{name}.db")
+    try:
+        copy = _copy(src_path, raw)
+        _integrity(raw)
+        _compress(raw, os.path.join(BACKUP_DIR, name))
+    except Exception:
+        FAILURES.inc(db=stem)
+        raise
+    finally:
+        _remove_db(raw)
+
+    size = os.path.getsize(os.path.join(BACKUP_DIR, name))
+    elapsed = time.perf_counter() - started
+    DURATION.observe(elapsed, db=stem)
+    SIZE.set(size, db=stem)
+    LAST_SUCCESS.set(time.time(), db=stem)
+    return {"arquivo": name, "bytes": size, "segundos": round(elapsed, 2), **copy, "apagados": _rotate(stem)}
+
+
+def backup_all() -> dict:
+    """Banco principal e, com SHARD_PER_ORG=1, cada shard (um arquivo por vez)."""
+    out = {"principal": backup_file(DB_PATH, Path(DB_PATH).stem)}
+    if shards.ENABLED and os.path.isdir(shards.SHARD_DIR):
+        for entry in sorted(os.listdir(shards.SHARD_DIR)):
+            if entry.endswith(".db"):
+                stem = Path(entry).stem
+                out[stem] = backup_file(os.path.join(shards.SHARD_DIR, entry), stem)
+    return out
+
+
+# ---------- consulta / restauração ----------
+def _safe_name(name: str) -> str | None:
+    base = os.path.basename(name)
+    return base if base == name and base.endswith(SUFFIX) and not base.startswith(".") else None
+
+
+def list_backups() -> list[dict]:
+    """Backups do mais novo para o mais antigo."""
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    out = []
+    for entry in os.listdir(BACKUP_DIR):
+        if not _safe_name(entry):
+            continue
+        # <banco>-AAAAMMDD-HHMMSSmmm.db.gz (outros nomes são ignorados)
+        parts = entry[: -len(SUFFIX)].rsplit("-", 2)
+        if len(parts) != 3:
+            continue
+        stem, day, hour = parts
+        st = os.stat(os.path.join(BACKUP_DIR, entry))
+        out.append({
+            "name": entry,
+            "db": stem,
+            "stamp": f"{day}-{hour}",
+            "bytes": st.st_size,
+            "created": datetime.fromtimestamp(st.st_mtime),
+        })
+    return sorted(out, key=lambda b: b["stamp"], reverse=True)
+
+
+def list_restores() -> list[dict]:
+    if not os.path.isdir(RESTORE_DIR):
+        return []
+    out = []
+    for entry in sorted(os.listdir(RESTORE_DIR), reverse=True):
+        if entry.endswith(".db"):
+            path = os.path.join(RESTORE_DIR, entry)
+            out.append({"name": entry, "path": path, "bytes": os.path.getsize(path)})
+    return out
+
+
+def restore(name: str) -> str:
+    """Descomprime o backup para um arquivo novo, confere e devolve o caminho."""
+    safe = _safe_name(name)
+    src = os.path.join(BACKUP_DIR, safe) if safe else None
+    if not src or not os.path.isfile(src):
+        raise BackupError("Backup não encontrado.")
+
+    os.makedirs(RESTORE_DIR, exist_ok=True)
+    dst = os.path.join(RESTORE_DIR, f"{safe[: -len(SUFFIX)]}-restaurado-{datetime.utcnow():%Y%m%d-%H%M%S}.db")
+    tmp = dst + ".part"
+    try:
+        with gzip.open(src, "rb") as fin, open(tmp, "wb") as fout:
+            shutil.copyfileobj(fin, fout, _CHUNK)
+        _integrity(tmp)
+    except Exception:
+        _remove_db(tmp)
+        raise
+    _remove_db(tmp, keep_main=True)
+    os.replace(tmp, dst)
+    return dst
@@ -1,14 +1,202 @@
 import os
-from sqlalchemy import create_engine
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import QueuePool
+
+from . import metrics
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
-DB_PATH = os.path.join(DATA_DIR, "setting.db")
+DB_PATH = os.getenv("DB_PATH", os.path.join(DATA_DIR, "setting.db"))
+
+# Pool pequeno para escrita (SQLite tem um único escritor por vez)
+# e pool maior para leitura (com WAL, leitores não bloqueiam o escritor).
+WRITE_POOL_SIZE = int(os.getenv("DB_WRITE_POOL_SIZE", "2"))
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Uma réplica de leitura futura entra aqui (READ_DATABASE_URL).
+READ_DATABASE_URL = os.getenv(
+    "READ_DATABASE_URL",
+    f"sqlite:///file:{Path(DB_PATH).as_posix()}?mode=ro&uri=true",
+)
+
+
+# ==============================================================================
+# MÉTRICAS DE POOL
+# ==============================================================================
+POOL_CHECKOUTS = metrics.counter(
+    "setting_db_pool_checkouts_total", "Conexões retiradas do pool.", ("pool",)
+)
+POOL_TIMEOUTS = metrics.counter(
+    "setting_db_pool_timeouts_total", "Esperas por conexão que estouraram o timeout.", ("pool",)
+)
+POOL_CONNECTS = metrics.counter(
+    "setting_db_pool_connects_total", "Conexões novas abertas no banco.", ("pool",)
+)
+POOL_IN_USE = metrics.gauge(
+    "setting_db_pool_in_use", "Conexões em uso no momento.", ("pool",)
+)
+POOL_WAIT = metrics.histogram(
+    "setting_db_pool_wait_seconds", "Tempo esperando por uma conexão do pool.", ("pool",)
+)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mede o tempo de espera por conexão."""
+
+    pool_name = "default"
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            POOL_TIMEOUTS.inc(pool=self.pool_name)
+            raise
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - t0, pool=self.pool_name)
+
+
+def _pool_class(name: str) -> type:
+    return type(f"TimedQueuePool_{name}", (TimedQueuePool,), {"pool_name": name})
+
+
+def _instrument(engine, name: str) -> None:
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, conn_record):
+        POOL_CONNECTS.inc(pool=name)
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+        POOL_CHECKOUTS.inc(pool=name)
+        POOL_IN_USE.inc(pool=name)
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn, conn_record):
+        POOL_IN_USE.dec(pool=name)
+
+
+# ==============================================================================
+# ENGINES (escrita / leitura)
+# ==============================================================================
+engine = create_engine(
+    f"sqlite:///{DB_PATH}",
+    connect_args={"check_same_thread": False},
+    poolclass=_pool_class("write"),
+    pool_size=WRITE_POOL_SIZE,
+    max_overflow=0,
+    pool_timeout=POOL_TIMEOUT,
+)
+
+
+@event.listens_for(engine, "connect")
+def _writer_pragmas(dbapi_conn, conn_record):
+    # Transações explícitas (BEGIN emitido pelo SQLAlchemy, abaixo):
+    # o pysqlite sozinho não lida bem com SAVEPOINT.
+    dbapi_conn.isolation_level = None
+    cur = dbapi_conn.cursor()
+    # só tem efeito em banco novo (antes da primeira tabela): libera espaço aos poucos
+    cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA busy_timeout=5000")
+    cur.close()
+
+
+@event.listens_for(engine, "begin")
+def _writer_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+
+read_engine = create_engine(
+    READ_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=_pool_class("read"),
+    pool_size=READ_POOL_SIZE,
+    max_overflow=0,
+    pool_timeout=POOL_TIMEOUT,
+)
+
+
+@event.listens_for(read_engine, "connect")
+def _reader_pragmas(dbapi_conn, conn_record):
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA query_only=ON")
+    cur.execute("PRAGMA busy_timeout=5000")
+    cur.close()
+
+
+_instrument(engine, "write")
+_instrument(read_engine, "read")
 
-engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+
+def pool_stats() -> dict:
+    """Resumo dos pools de escrita/leitura (para diagnóstico)."""
+    out = {}
+    for name, eng in (("write", engine), ("read", read_engine)):
+        pool = eng.pool
+        wait = POOL_WAIT.snapshot(pool=name)
+        out[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "wait_count": wait["count"],
+            "wait_seconds_total": wait["sum"],
+        }
+    return out
+
 
 class Base(DeclarativeBase):
     pass
+
+
+def ensure_indexes(bind, tables=None) -> None:
+    """
+    create_all só cria índices junto com tabelas novas; aqui os índices
+    declarados nos models são criados também em bancos já existentes.
+    """
+    for table in tables if tables is not None else Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+
+def ensure_autoincrement(bind, tables=None) -> list[str]:
+    """
+    Tabelas com sqlite_autoincrement=True criadas antes dele: recria com
+    AUTOINCREMENT (copiando as linhas) para que um id apagado nunca volte.
+    Sem isso o SQLite reaproveita o maior id depois de um DELETE, e quem lê
+    "id > último visto" perde linhas. Devolve as tabelas convertidas.
+    """
+    from sqlalchemy.schema import CreateTable
+
+    done = []
+    for table in tables if tables is not None else Base.metadata.sorted_tables:
+        if not table.dialect_options["sqlite"].get("autoincrement"):
+            continue
+        with bind.begin() as conn:
+            sql = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+            ).scalar()
+            if sql is None or "AUTOINCREMENT" in sql.upper():
+                continue
+            old_cols = {r[1] for r in conn.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+            cols = ", ".join(c.name for c in table.columns if c.name in old_cols)
+            tmp = f"{table.name}__autoinc"
+            # o DDL do model (sem os índices, criados depois) com outro nome
+            ddl = str(CreateTable(table).compile(bind)).replace(f"TABLE {table.name} (", f"TABLE {tmp} (", 1)
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {tmp}")
+            conn.exec_driver_sql(ddl)
+            conn.exec_driver_sql(f"INSERT INTO {tmp} ({cols}) SELECT {cols} FROM {table.name} ORDER BY rowid")
+            conn.exec_driver_sql(f"DROP TABLE {table.name}")
+            conn.exec_driver_sql(f"ALTER TABLE {tmp} RENAME TO {table.name}")
+        ensure_indexes(bind, [table])
+        done.append(table.name)
+    return done
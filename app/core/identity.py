@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from . import metrics
+
+# ==============================================================================
+# CACHE DE IDENTIDADE (user_id -> org, role, email)
+#
+# Evita ir ao banco em toda requisição e, ao mesmo tempo, faz mudanças de
+# papel (tornar/remover admin) valerem logo: as escritas chamam invalidate().
+# Cada invalidação recebe um número de sequência; uma leitura lenta que
+# começou antes dela não grava o valor velho no cache.
+# invalidate() só vale no processo que o chamou: com vários workers, os
+# outros seguem com o valor antigo até o TTL (IDENTITY_CACHE_TTL, 30s).
+# ==============================================================================
+
+TTL_SECONDS = float(os.getenv("IDENTITY_CACHE_TTL", "30"))
+MAX_ENTRIES = int(os.getenv("IDENTITY_CACHE_MAX", "10000"))
+
+LOOKUPS = metrics.counter(
+    "setting_identity_cache_lookups_total", "Buscas no cache de identidade.", ("result",)
+)
+
+
+@dataclass(frozen=True)
+class Identity:
+    user_id: int
+    org_id: int | None
+    role: str
+    email: str
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == "admin"
+
+
+class IdentityCache:
+    def __init__(self, ttl: float = TTL_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # user_id -> (identity | None, expira_em)
+        self._entries: dict[int, tuple[Identity | None, float]] = {}
+        # user_id -> sequência da última invalidação; quem não está aqui vale _floor
+        self._versions: dict[int, int] = {}
+        self._seq = 0
+        self._floor = 0
+
+    def get(self, user_id: int, loader: Callable[[int], Identity | None]) -> Identity | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                LOOKUPS.inc(result="hit")
+                return entry[0]
+            started = self._seq
+
+        LOOKUPS.inc(result="miss")
+        identity = loader(user_id)
+
+        with self._lock:
+            # invalidado durante a leitura: não grava
+            if self._versions.get(user_id, self._floor) <= started:
+                if len(self._entries) >= self.max_entries:
+                    self._evict_expired(now)
+                self._entries[user_id] = (identity, now + self.ttl)
+        return identity
+
+    def invalidate(self, user_id: int | None = None) -> None:
+        """Descarta um usuário (ou todos, com user_id=None)."""
+        with self._lock:
+            self._seq += 1
+            if user_id is None:
+                self._entries.clear()
+                self._prune_versions()
+                return
+            if len(self._versions) >= self.max_entries:
+                self._prune_versions()
+            self._versions[user_id] = self._seq
+            self._entries.pop(user_id, None)
+
+    def _prune_versions(self) -> None:
+        # esquece as sequências por usuário: leituras em andamento (de qualquer
+        # usuário) só deixam de gravar no cache, nunca gravam valor velho
+        self._floor = self._seq
+        self._versions.clear()
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [k for k, (_, exp) in self._entries.items() if exp <= now]
+        for k in expired:
+            del self._entries[k]
+        if len(self._entries) >= self.max_entries:
+            # ainda cheio: descarta os mais antigos (ordem de inserção)
+            for k in list(self._entries)[: len(self._entries) // 4 or 1]:
+                del self._entries[k]
+        self._prune_versions()
+
+
+identity_cache = IdentityCache()
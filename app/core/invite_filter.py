@@ -0,0 +1,244 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select
+
+from . import metrics, shards
+from .database import ReadSessionLocal
+
+# ==============================================================================
+# FILTRO DE CÓDIGOS DE CONVITE (signup público)
+#
+# - Bloom filter com todos os códigos existentes: código fora do filtro com
+#   certeza não existe e é recusado sem ir ao banco (tentativas aleatórias,
+#   enumeração). Falso positivo (INVITE_FILTER_FP) só custa a consulta normal.
+# - Cache positivo (curto) com o status dos códigos reais, para a página
+#   GET /signup. O POST continua conferindo tudo no banco.
+# - Montado no startup (com shards: pelo invite_code_index do catálogo) e
+#   atualizado de forma incremental a cada INVITE_FILTER_REFRESH segundos
+#   (códigos criados por outros workers); reconstruído por inteiro a cada
+#   INVITE_FILTER_REBUILD segundos ou quando passa da capacidade.
+# ==============================================================================
+
+ENABLED = os.getenv("INVITE_FILTER_ENABLED", "1") == "1"
+FP_RATE = float(os.getenv("INVITE_FILTER_FP", "0.001"))
+REFRESH_SECONDS = float(os.getenv("INVITE_FILTER_REFRESH", "5"))
+REBUILD_SECONDS = float(os.getenv("INVITE_FILTER_REBUILD", "3600"))
+CACHE_TTL = float(os.getenv("INVITE_CACHE_TTL", "30"))
+CACHE_MAX = int(os.getenv("INVITE_CACHE_MAX", "2000"))
+
+# folga para os códigos criados até a próxima reconstrução
+MIN_CAPACITY = 1024
+GROWTH = 2
+
+LOOKUPS = metrics.counter(
+    "setting_invite_filter_lookups_total", "Consultas de código de convite no signup.", ("result",)
+)
+FILTER_SIZE = metrics.gauge("setting_invite_filter_codes", "Códigos no filtro de convites.")
+
+
+class BloomFilter:
+    """Bloom filter simples (bytearray + hash duplo sobre blake2b)."""
+
+    def __init__(self, capacity: int, fp_rate: float = FP_RATE):
+        self.capacity = max(1, capacity)
+        bits = -self.capacity * math.log(fp_rate) / (math.log(2) ** 2)
+        self.size = max(64, int(math.ceil(bits)))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+@dataclass(frozen=True)
+class InviteSnapshot:
+    """Campos do convite que a página de signup mostra (cópia sem sessão)."""
+
+    code: str
+    organization_id: int
+    role: str
+    max_uses: int | None
+    uses: int
+    expires_at: datetime | None
+    revoked: bool
+
+    @classmethod
+    def of(cls, inv) -> "InviteSnapshot":
+        return cls(
+            code=inv.code,
+            organization_id=inv.organization_id,
+            role=inv.role,
+            max_uses=inv.max_uses,
+            uses=inv.uses or 0,
+            expires_at=inv.expires_at,
+            revoked=bool(inv.revoked),
+        )
+
+    def is_valid(self) -> bool:
+        if self.revoked:
+            return False
+        if self.expires_at and datetime.utcnow() > self.expires_at:
+            return False
+        if self.max_uses is not None and self.uses >= self.max_uses:
+            return False
+        return True
+
+
+def _source():
+    """
+    (modelo, coluna de ordem) de onde saem os códigos: catálogo com shards.
+    As duas tabelas são AUTOINCREMENT: id apagado (arquivo de convites) não
+    volta, então "id > último visto" pega todo código novo.
+    """
+    from ..models import InviteCode, InviteCodeIndex
+
+    if shards.ENABLED:
+        return InviteCodeIndex, InviteCodeIndex.id
+    return InviteCode, InviteCode.id
+
+
+class InviteCodeFilter:
+    def __init__(self, fp_rate: float = FP_RATE):
+        self.fp_rate = fp_rate
+        self._bloom: BloomFilter | None = None
+        self._last_seen = 0
+        self._refreshed_at = 0.0
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # código -> (snapshot, expira_em)
+        self._cache: dict[str, tuple[InviteSnapshot, float]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self._bloom is not None
+
+    # ---------- montagem ----------
+    def rebuild(self) -> int:
+        """Lê todos os códigos e troca o filtro de uma vez; devolve quantos entraram."""
+        model, order = _source()
+        db = ReadSessionLocal()
+        try:
+            rows = db.execute(select(order, model.code)).all()
+        finally:
+            db.close()
+
+        bloom = BloomFilter(max(MIN_CAPACITY, len(rows) * GROWTH), self.fp_rate)
+        last_seen = 0
+        for rowid, code in rows:
+            bloom.add(code)
+            last_seen = max(last_seen, rowid)
+
+        now = time.monotonic()
+        with self._lock:
+            self._bloom = bloom
+            self._last_seen = last_seen
+            self._refreshed_at = self._built_at = now
+            self._cache.clear()
+        FILTER_SIZE.set(bloom.count)
+        return bloom.count
+
+    def refresh(self) -> None:
+        """Acrescenta os códigos novos (id acima do último visto) de outros processos."""
+        model, order = _source()
+        db = ReadSessionLocal()
+        try:
+            rows = db.execute(select(order, model.code).where(order > self._last_seen)).all()
+        finally:
+            db.close()
+        with self._lock:
+            for rowid, code in rows:
+                self._bloom.add(code)
+                self._last_seen = max(self._last_seen, rowid)
+            self._refreshed_at = time.monotonic()
+        FILTER_SIZE.set(self._bloom.count)
+
+    def _maybe_refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._refreshed_at < REFRESH_SECONDS:
+            return
+        # uma thread atualiza; as outras seguem com o filtro atual
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            full = now - self._built_at >= REBUILD_SECONDS or self._bloom.count >= self._bloom.capacity
+            self.rebuild() if full else self.refresh()
+        finally:
+            self._refresh_lock.release()
+
+    # ---------- consulta ----------
+    def might_exist(self, code: str) -> bool:
+        """False = o código com certeza não existe (não precisa ir ao banco)."""
+        if not ENABLED or self._bloom is None:
+            return True
+        self._maybe_refresh()
+        if code in self._bloom:
+            return True
+        LOOKUPS.inc(result="rejected")
+        return False
+
+    def cached(self, code: str) -> InviteSnapshot | None:
+        if not ENABLED:
+            return None
+        entry = self._cache.get(code)
+        if entry is not None and entry[1] > time.monotonic():
+            LOOKUPS.inc(result="cache_hit")
+            return entry[0]
+        LOOKUPS.inc(result="db")
+        return None
+
+    def remember(self, inv) -> InviteSnapshot:
+        snapshot = InviteSnapshot.of(inv)
+        if ENABLED:
+            with self._lock:
+                if len(self._cache) >= CACHE_MAX:
+                    now = time.monotonic()
+                    for key in [k for k, (_, exp) in self._cache.items() if exp <= now]:
+                        del self._cache[key]
+                    if len(self._cache) >= CACHE_MAX:
+                        self._cache.clear()
+                self._cache[snapshot.code] = (snapshot, time.monotonic() + CACHE_TTL)
+        return snapshot
+
+    # ---------- escrita ----------
+    def add(self, code: str) -> None:
+        """Convite criado neste processo: já vale no signup, sem esperar o refresh."""
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(code)
+                FILTER_SIZE.set(self._bloom.count)
+
+    def invalidate(self, code: str | None = None) -> None:
+        """Status do convite mudou (revogado, usado): descarta do cache positivo."""
+        with self._lock:
+            if code is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(code, None)
+
+
+invite_filter = InviteCodeFilter()
+
+
+def start() -> None:
+    """Monta o filtro no startup (todos os códigos, de todos os shards)."""
+    invite_filter.rebuild()
@@ -0,0 +1,209 @@
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from .observability import route_name
+
+# ==============================================================================
+# LOGS ESTRUTURADOS (JSON) SEM BLOQUEAR A REQUISIÇÃO
+#
+# - As threads da aplicação só colocam o registro numa fila (QueueHandler);
+#   uma thread de fundo (QueueListener) formata e escreve no stderr.
+# - Cada requisição ganha um request_id (ou reaproveita o X-Request-ID que
+#   chegou), presente em todos os registros e devolvido no cabeçalho.
+# - Log de acesso com rota, status, latência e tempo de banco, com
+#   amostragem por rota (ACCESS_LOG_SAMPLE_ROUTES); erros e lentas sempre saem.
+# ==============================================================================
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+ACCESS_LOG = os.getenv("ACCESS_LOG", "1") == "1"
+ACCESS_LOG_SAMPLE = float(os.getenv("ACCESS_LOG_SAMPLE", "1.0"))
+# ex.: "/health=0,/metrics=0,/static=0.05" (rota ou prefixo de caminho = fração)
+ACCESS_LOG_SAMPLE_ROUTES = os.getenv("ACCESS_LOG_SAMPLE_ROUTES", "/health=0,/ready=0,/metrics=0,/static=0.05")
+ACCESS_LOG_SLOW_MS = float(os.getenv("ACCESS_LOG_SLOW_MS", "1000"))
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+access_log = logging.getLogger("setting.access")
+error_log = logging.getLogger("setting.error")
+
+_request_id: ContextVar[str | None] = ContextVar("setting_request_id", default=None)
+_VALID_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# atributos padrão de LogRecord: o resto (extra=...) vai para o JSON
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "color_message"}
+
+
+def current_request_id() -> str | None:
+    return _request_id.get()
+
+
+def _parse_rates(spec: str) -> list[tuple[str, float]]:
+    rates = []
+    for part in spec.split(","):
+        key, _, value = part.strip().partition("=")
+        if key and value:
+            rates.append((key, float(value)))
+    # prefixo mais longo primeiro
+    return sorted(rates, key=lambda kv: len(kv[0]), reverse=True)
+
+
+_RATES = _parse_rates(ACCESS_LOG_SAMPLE_ROUTES)
+
+
+def sample_rate(route: str, path: str) -> float:
+    for key, rate in _RATES:
+        if route == key or path.startswith(key):
+            return rate
+    return ACCESS_LOG_SAMPLE
+
+
+# ---------- formatação ----------
+class RequestIdFilter(logging.Filter):
+    """Roda na thread que gerou o registro (antes da fila): captura o request_id."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            out["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class LocalQueueHandler(QueueHandler):
+    """
+    QueueHandler para fila no mesmo processo. O prepare() padrão junta o
+    traceback em msg e apaga exc_info (pensado para fila entre processos);
+    aqui a exceção segue no registro e quem formata é a thread de escrita,
+    então o JSON sai com "exc" separado de "msg".
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # mensagem resolvida agora: os args podem mudar até a thread formatar
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        return record
+
+
+_listener: QueueListener | None = None
+
+
+def setup_logging() -> None:
+    """Troca os handlers do root por uma fila + thread de escrita (idempotente)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    handler = LocalQueueHandler(q)
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    # uvicorn passa pelo mesmo caminho; o access log dele é substituído pelo nosso
+    for name in ("uvicorn", "uvicorn.error"):
+        logging.getLogger(name).handlers[:] = []
+        logging.getLogger(name).propagate = True
+    uvicorn_access = logging.getLogger("uvicorn.access")
+    uvicorn_access.handlers[:] = []
+    uvicorn_access.propagate = not ACCESS_LOG
+
+    _listener = QueueListener(q, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Esvazia a fila e para a thread de escrita; o que vier depois sai direto."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger().handlers[:] = list(_listener.handlers)
+        _listener = None
+
+
+# ---------- middleware ----------
+class RequestIdMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        incoming = request.headers.get(REQUEST_ID_HEADER, "")
+        rid = incoming if _VALID_ID.match(incoming) else uuid.uuid4().hex
+        token = _request_id.set(rid)
+        request.state.request_id = rid
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        except Exception:
+            error_log.exception("unhandled error", extra={"method": request.method, "path": request.url.path})
+            raise
+        finally:
+            if ACCESS_LOG:
+                self._access(request, status, time.perf_counter() - start)
+            _request_id.reset(token)
+
+        response.headers[REQUEST_ID_HEADER] = rid
+        return response
+
+    @staticmethod
+    def _access(request: Request, status: int, elapsed: float) -> None:
+        route = route_name(request)
+        ms = elapsed * 1000
+        if status < 500 and ms < ACCESS_LOG_SLOW_MS:
+            rate = sample_rate(route, request.url.path)
+            if rate <= 0 or (rate < 1 and random.random() >= rate):
+                return
+
+        stats = getattr(request.state, "query_stats", None)
+        access_log.info(
+            "%s %s %d %.1fms",
+            request.method, request.url.path, status, ms,
+            extra={
+                "method": request.method,
+                "path": request.url.path,
+                "route": route,
+                "status": status,
+                "duration_ms": round(ms, 2),
+                "db_ms": round(stats.seconds * 1000, 2) if stats else None,
+                "db_queries": stats.count if stats else None,
+                "client": request.client.host if request.client else None,
+            },
+        )
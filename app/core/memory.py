@@ -0,0 +1,225 @@
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from . import metrics
+from .database import DATA_DIR
+from .observability import route_name
+
+# ==============================================================================
+# INSTRUMENTAÇÃO DE MEMÓRIA (opcional: MEMORY_PROFILING=1)
+#
+# - tracemalloc ligado desde o startup (custa CPU e memória: só para investigar)
+# - pico de alocação por rota, em uma fração das requisições (MEMORY_SAMPLE_RATE)
+# - RSS do processo amostrado a cada MEMORY_RSS_INTERVAL segundos
+# - snapshots do tracemalloc gravados em app/data/memory (comparar/baixar no admin)
+#
+# O pico do tracemalloc é global ao processo: só uma requisição por vez é
+# medida, mas alocações de requisições concorrentes entram na conta.
+# ==============================================================================
+
+ENABLED = os.getenv("MEMORY_PROFILING", "0") == "1"
+TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "10"))
+SAMPLE_RATE = float(os.getenv("MEMORY_SAMPLE_RATE", "0.1"))
+RSS_INTERVAL = float(os.getenv("MEMORY_RSS_INTERVAL", "15"))
+SNAPSHOT_DIR = os.getenv("MEMORY_SNAPSHOT_DIR", os.path.join(DATA_DIR, "memory"))
+MAX_SNAPSHOTS = int(os.getenv("MEMORY_MAX_SNAPSHOTS", "10"))
+
+RSS_HISTORY = 240  # pontos guardados para a página do admin
+
+ROUTE_PEAK = metrics.histogram(
+    "setting_route_peak_alloc_bytes",
+    "Pico de memória alocada (tracemalloc) durante a requisição, amostrado.",
+    ("route",),
+    buckets=tuple(2 ** n for n in range(14, 31, 2)),  # 16 KiB .. 1 GiB
+)
+RSS_BYTES = metrics.gauge("setting_process_rss_bytes", "Memória residente do processo.")
+TRACED_BYTES = metrics.gauge(
+    "setting_tracemalloc_traced_bytes",
+    "Memória rastreada pelo tracemalloc.",
+    func=lambda: tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0,
+)
+
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+# ---------- RSS ----------
+def current_rss() -> int:
+    """RSS atual em bytes (/proc no Linux; senão o máximo do getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        import sys
+
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class RssSampler:
+    def __init__(self, interval: float = RSS_INTERVAL, history: int = RSS_HISTORY):
+        self.interval = interval
+        self.points: deque = deque(maxlen=history)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def sample(self) -> int:
+        rss = current_rss()
+        RSS_BYTES.set(rss)
+        self.points.append((time.time(), rss))
+        return rss
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="setting-rss", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        self.sample()
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+rss_sampler = RssSampler()
+
+
+def start() -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACE_FRAMES)
+    rss_sampler.start()
+
+
+def stop() -> None:
+    rss_sampler.stop()
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+# ---------- pico por rota ----------
+_measuring = threading.Lock()
+route_max: dict[str, int] = {}
+
+
+class MemoryMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if random.random() >= SAMPLE_RATE or not tracemalloc.is_tracing():
+            return await call_next(request)
+        if not _measuring.acquire(blocking=False):
+            return await call_next(request)
+        try:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            response = await call_next(request)
+            peak = max(tracemalloc.get_traced_memory()[1] - base, 0)
+        finally:
+            _measuring.release()
+
+        route = route_name(request)
+        ROUTE_PEAK.observe(peak, route=route)
+        if peak > route_max.get(route, 0):
+            route_max[route] = peak
+        return response
+
+
+def route_peaks() -> list[dict]:
+    """Resumo por rota: amostras, média e máximo do pico (maior primeiro)."""
+    out = []
+    for s in ROUTE_PEAK.series():
+        route = s["labels"]["route"]
+        count = int(s["count"])
+        out.append({
+            "route": route,
+            "count": count,
+            "avg": s["sum"] / count if count else 0,
+            "max": route_max.get(route, 0),
+        })
+    out.sort(key=lambda r: r["max"], reverse=True)
+    return out
+
+
+# ---------- snapshots ----------
+def _snapshot_path(name: str) -> str | None:
+    if not name or not name.replace("_", "").isdigit():
+        return None
+    return os.path.join(SNAPSHOT_DIR, name + ".snap")
+
+
+def take_snapshot() -> str:
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    snap = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    name = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    snap.dump(_snapshot_path(name))
+
+    for old in list_snapshots()[MAX_SNAPSHOTS:]:
+        try:
+            os.remove(_snapshot_path(old["name"]))
+        except FileNotFoundError:
+            pass
+    return name
+
+
+def list_snapshots() -> list[dict]:
+    """Snapshots gravados, do mais novo para o mais antigo."""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    out = []
+    for fname in os.listdir(SNAPSHOT_DIR):
+        if fname.endswith(".snap"):
+            path = os.path.join(SNAPSHOT_DIR, fname)
+            out.append({"name": fname[:-5], "size": os.path.getsize(path)})
+    out.sort(key=lambda e: e["name"], reverse=True)
+    return out
+
+
+def snapshot_path(name: str) -> str | None:
+    path = _snapshot_path(name)
+    return path if path and os.path.exists(path) else None
+
+
+def _load(name: str) -> tracemalloc.Snapshot | None:
+    path = snapshot_path(name)
+    return tracemalloc.Snapshot.load(path) if path else None
+
+
+def top_stats(name: str, limit: int = 25, key_type: str = "lineno") -> list[str] | None:
+    snap = _load(name)
+    if snap is None:
+        return None
+    return [_fmt_stat(s) for s in snap.statistics(key_type)[:limit]]
+
+
+def compare(old: str, new: str, limit: int = 25, key_type: str = "lineno") -> list[str] | None:
+    a, b = _load(old), _load(new)
+    if a is None or b is None:
+        return None
+    return [_fmt_stat(s) for s in b.compare_to(a, key_type)[:limit]]
+
+
+def _fmt_stat(stat) -> str:
+    frame = stat.traceback[0]
+    line = f"{frame.filename}:{frame.lineno}  {stat.size / 1024:.1f} KiB  ({stat.count} blocos)"
+    size_diff = getattr(stat, "size_diff", None)
+    if size_diff is not None:
+        line += f"  Δ {size_diff / 1024:+.1f} KiB"
+    return line
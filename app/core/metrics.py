@@ -0,0 +1,182 @@
+import threading
+from bisect import bisect_left
+
+# ==============================================================================
+# MÉTRICAS EM MEMÓRIA (contadores, gauges e histogramas)
+# Registro simples, thread-safe, sem dependências externas.
+# ==============================================================================
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_lock = threading.Lock()
+REGISTRY: dict[str, "Metric"] = {}
+
+
+def _key(labelnames: tuple, labels: dict) -> tuple:
+    return tuple(str(labels.get(n, "")) for n in labelnames)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        with _lock:
+            items = list(self._values.items())
+        return [
+            (self.name, dict(zip(self.labelnames, k)), v)
+            for k, v in items
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        k = _key(self.labelnames, labels)
+        with _lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), func=None):
+        super().__init__(name, help, labelnames)
+        # func opcional: calcula o valor na hora da leitura (sem labels)
+        self._func = func
+
+    def set(self, value: float, **labels) -> None:
+        k = _key(self.labelnames, labels)
+        with _lock:
+            self._values[k] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        k = _key(self.labelnames, labels)
+        with _lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        if self._func is not None:
+            return [(self.name, {}, float(self._func()))]
+        return super().samples()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label-key -> [contagens por bucket..., +Inf, soma]
+        self._series: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        k = _key(self.labelnames, labels)
+        idx = bisect_left(self.buckets, value)
+        with _lock:
+            s = self._series.get(k)
+            if s is None:
+                s = [0.0] * (len(self.buckets) + 2)
+                self._series[k] = s
+            s[idx] += 1
+            s[-1] += value
+
+    def snapshot(self, **labels) -> dict:
+        """Retorna count/sum/buckets cumulativos de uma série."""
+        k = _key(self.labelnames, labels)
+        with _lock:
+            s = list(self._series.get(k) or [0.0] * (len(self.buckets) + 2))
+        cumulative, acc = [], 0.0
+        for i, b in enumerate(self.buckets):
+            acc += s[i]
+            cumulative.append((b, acc))
+        count = acc + s[len(self.buckets)]
+        return {"count": count, "sum": s[-1], "buckets": cumulative}
+
+    def series(self) -> list[dict]:
+        with _lock:
+            keys = list(self._series.keys())
+        out = []
+        for k in keys:
+            labels = dict(zip(self.labelnames, k))
+            out.append({"labels": labels, **self.snapshot(**labels)})
+        return out
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        out = []
+        for s in self.series():
+            for b, c in s["buckets"]:
+                out.append((f"{self.name}_bucket", {**s["labels"], "le": _fmt(b)}, c))
+            out.append((f"{self.name}_bucket", {**s["labels"], "le": "+Inf"}, s["count"]))
+            out.append((f"{self.name}_sum", s["labels"], s["sum"]))
+            out.append((f"{self.name}_count", s["labels"], s["count"]))
+        return out
+
+
+def _fmt(v: float) -> str:
+    return repr(float(v))
+
+
+def _register(metric: Metric) -> Metric:
+    with _lock:
+        existing = REGISTRY.get(metric.name)
+        if existing is not None:
+            return existing
+        REGISTRY[metric.name] = metric
+    return metric
+
+
+def counter(name: str, help: str, labelnames: tuple = ()) -> Counter:
+    return _register(Counter(name, help, labelnames))
+
+
+def gauge(name: str, help: str, labelnames: tuple = (), func=None) -> Gauge:
+    return _register(Gauge(name, help, labelnames, func=func))
+
+
+def histogram(name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help, labelnames, buckets=buckets))
+
+
+# ==============================================================================
+# EXPOSIÇÃO (formato texto do Prometheus)
+# ==============================================================================
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+    return "{" + inner + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == int(v):
+        return str(int(v))
+    return repr(float(v))
+
+
+def render_prometheus() -> str:
+    with _lock:
+        metrics = sorted(REGISTRY.values(), key=lambda m: m.name)
+    lines = []
+    for m in metrics:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        for name, labels, value in m.samples():
+            lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+    return "\n".join(lines) + "\n"
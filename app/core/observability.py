@@ -0,0 +1,44 @@
+import time
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from . import metrics
+
+# ==============================================================================
+# MÉTRICAS HTTP (latência por rota, requisições em andamento)
+# ==============================================================================
+REQUESTS = metrics.counter(
+    "setting_http_requests_total", "Requisições HTTP atendidas.", ("method", "route", "status")
+)
+LATENCY = metrics.histogram(
+    "setting_http_request_duration_seconds", "Latência das requisições HTTP.", ("method", "route")
+)
+IN_FLIGHT = metrics.gauge(
+    "setting_http_requests_in_flight", "Requisições em andamento.", ("method",)
+)
+
+
+def route_name(request: Request) -> str:
+    """Caminho-modelo da rota (ex.: /invites/{code}); evita um rótulo por URL."""
+    route = request.scope.get("route")
+    path = getattr(route, "path", None)
+    return path or "unmatched"
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        method = request.method
+        IN_FLIGHT.inc(method=method)
+        t0 = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - t0
+            IN_FLIGHT.dec(method=method)
+            route = route_name(request)
+            LATENCY.observe(elapsed, method=method, route=route)
+            REQUESTS.inc(method=method, route=route, status=status)
@@ -0,0 +1,274 @@
+import functools
+import inspect
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from .config import settings
+from .database import DATA_DIR
+from .observability import route_name
+
+# ==============================================================================
+# PROFILER POR AMOSTRAGEM, SOB DEMANDA (opcional: PROFILER_ENABLED=1)
+#
+# Um admin marca UMA requisição para ser perfilada (?_profile=1 ou cabeçalho
+# X-Setting-Profile com token assinado). Uma thread amostra a pilha da thread
+# que executa a rota a cada PROFILE_INTERVAL_MS e grava as pilhas no formato
+# "folded" (flamegraph.pl / speedscope) em app/data/profiles.
+# Desligado, nada é instalado: nem middleware, nem wrapper nas rotas.
+# ==============================================================================
+
+ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000.0
+MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+MAX_AGE_DAYS = float(os.getenv("PROFILE_MAX_AGE_DAYS", "7"))
+TOKEN_MAX_AGE = int(os.getenv("PROFILE_TOKEN_MAX_AGE", "3600"))
+
+HEADER = "x-setting-profile"
+QUERY_FLAG = "_profile"
+
+_token_serializer = URLSafeTimedSerializer(settings.secret_key, salt="setting-profile")
+_active: ContextVar["SamplingProfiler | None"] = ContextVar("setting_profiler", default=None)
+_SAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def make_token(user_id: int) -> str:
+    return _token_serializer.dumps({"uid": user_id})
+
+
+def check_token(token: str) -> bool:
+    try:
+        _token_serializer.loads(token, max_age=TOKEN_MAX_AGE)
+        return True
+    except BadSignature:
+        return False
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    for marker in ("site-packages" + os.sep, os.sep + "app" + os.sep):
+        idx = filename.rfind(marker)
+        if idx != -1:
+            filename = filename[idx + len(marker):] if "site-packages" in marker else "app/" + filename[idx + len(marker):]
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Amostra as pilhas das threads registradas (attach) até stop()."""
+
+    def __init__(self, interval: float = INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._threads: set[int] = set()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.started_at = 0.0
+        self.duration = 0.0
+
+    def attach(self, thread_id: int) -> None:
+        self._threads.add(thread_id)
+
+    def detach(self, thread_id: int) -> None:
+        self._threads.discard(thread_id)
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="setting-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for tid in list(self._threads):
+                if tid == me:
+                    continue
+                frame = frames.get(tid)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+# ---------- onde a rota roda (thread do threadpool ou do event loop) ----------
+def _wrap_endpoint(fn):
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            prof = _active.get()
+            if prof is None:
+                return await fn(*args, **kwargs)
+            tid = threading.get_ident()
+            prof.attach(tid)
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                prof.detach(tid)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        prof = _active.get()
+        if prof is None:
+            return fn(*args, **kwargs)
+        tid = threading.get_ident()
+        prof.attach(tid)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            prof.detach(tid)
+    return wrapper
+
+
+def instrument_routes(app) -> None:
+    """Envolve as rotas para saberem em qual thread rodam (só com ENABLED)."""
+    for route in app.routes:
+        dependant = getattr(route, "dependant", None)
+        if dependant is not None and dependant.call is not None:
+            dependant.call = _wrap_endpoint(dependant.call)
+
+
+# ---------- armazenamento ----------
+def _enforce_retention() -> None:
+    entries = list_profiles()
+    cutoff = time.time() - MAX_AGE_DAYS * 86400
+    for i, entry in enumerate(entries):
+        if i >= MAX_FILES or entry["mtime"] < cutoff:
+            for ext in (".folded", ".json"):
+                try:
+                    os.remove(os.path.join(PROFILE_DIR, entry["name"] + ext))
+                except FileNotFoundError:
+                    pass
+
+
+def save_profile(prof: SamplingProfiler, meta: dict) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    name = f"{stamp}_{_SAFE.sub('_', meta.get('route', 'req')).strip('_') or 'root'}"
+    with open(os.path.join(PROFILE_DIR, name + ".folded"), "w", encoding="utf-8") as f:
+        f.write(prof.folded())
+    with open(os.path.join(PROFILE_DIR, name + ".json"), "w", encoding="utf-8") as f:
+        json.dump({**meta, "samples": prof.samples, "duration_ms": round(prof.duration * 1000, 2)}, f)
+    _enforce_retention()
+    return name
+
+
+def list_profiles() -> list[dict]:
+    """Perfis salvos, do mais novo para o mais antigo."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for fname in os.listdir(PROFILE_DIR):
+        if not fname.endswith(".json"):
+            continue
+        path = os.path.join(PROFILE_DIR, fname)
+        try:
+            with open(path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        out.append({**meta, "name": fname[:-5], "mtime": os.path.getmtime(path)})
+    out.sort(key=lambda e: e["mtime"], reverse=True)
+    return out
+
+
+def profile_path(name: str) -> str | None:
+    if not name or _SAFE.search(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name + ".folded")
+    return path if os.path.exists(path) else None
+
+
+def call_tree(folded: str, min_pct: float = 1.0) -> list[tuple[int, float, str]]:
+    """(profundidade, % das amostras, função) a partir do formato folded."""
+    root: dict = {}
+    total = 0
+    for line in folded.splitlines():
+        stack, _, n = line.rpartition(" ")
+        if not stack:
+            continue
+        n = int(n)
+        total += n
+        node = root
+        for frame in stack.split(";"):
+            entry = node.setdefault(frame, [0, {}])
+            entry[0] += n
+            node = entry[1]
+
+    out: list[tuple[int, float, str]] = []
+
+    def walk(node: dict, depth: int) -> None:
+        for frame, (n, children) in sorted(node.items(), key=lambda kv: -kv[1][0]):
+            pct = 100.0 * n / total if total else 0.0
+            if pct < min_pct:
+                continue
+            out.append((depth, pct, frame))
+            walk(children, depth + 1)
+
+    walk(root, 0)
+    return out
+
+
+# ---------- middleware ----------
+class ProfilerMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        wants = request.query_params.get(QUERY_FLAG) == "1" or HEADER in request.headers
+        if not wants:
+            return await call_next(request)
+
+        # admin logado (sessão) e, se veio o cabeçalho, token válido
+        from ..deps import require_admin
+
+        token = request.headers.get(HEADER)
+        if not require_admin(request) or (token is not None and not check_token(token)):
+            return await call_next(request)
+
+        prof = SamplingProfiler()
+        ctx_token = _active.set(prof)
+        prof.start()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            _active.reset(ctx_token)
+            prof.stop()
+            name = save_profile(
+                prof,
+                {
+                    "method": request.method,
+                    "path": request.url.path,
+                    "route": route_name(request),
+                    "status": status,
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                },
+            )
+        response.headers["X-Setting-Profile-Id"] = name
+        return response
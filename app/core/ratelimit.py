@@ -0,0 +1,182 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request
+
+from . import metrics
+from .database import DATA_DIR
+
+# ==============================================================================
+# LIMITE DE TAXA (token bucket) PARA AS ROTAS PÚBLICAS
+#
+# Um balde por (rota, IP): cabe BURST fichas e ele se enche de novo em
+# SEGUNDOS. Cada requisição gasta uma ficha; sem ficha -> 429 + Retry-After.
+# - memory: dicionário LRU por processo (limite RATE_LIMIT_MAX_KEYS)
+# - sqlite: tabela compartilhada entre workers (RATE_LIMIT_BACKEND=sqlite)
+# Configuração por rota: RATE_LIMIT_<NOME>="<burst>/<segundos>", ex. "10/60".
+# ==============================================================================
+
+ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | sqlite
+MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", os.path.join(DATA_DIR, "ratelimit.db"))
+# Atrás de proxy (ex.: Render), o IP do cliente vem em X-Forwarded-For.
+# Valor = quantos proxies confiáveis há na frente do app (0 = ignora o cabeçalho).
+# Cada proxy acrescenta à DIREITA o IP de quem falou com ele; o que está à
+# esquerda disso foi mandado pelo próprio cliente e pode ser qualquer coisa.
+TRUST_PROXY_HEADERS = int(os.getenv("TRUST_PROXY_HEADERS", "0"))
+
+DEFAULT_LIMITS = {
+    "login": "10/60",
+    "signup": "20/60",
+    "solicitar_convite": "5/300",
+}
+
+RATE_LIMITED = metrics.counter(
+    "setting_rate_limited_total", "Requisições recusadas pelo limite de taxa.", ("limit",)
+)
+BUCKETS = metrics.gauge("setting_rate_limit_buckets", "Baldes de limite de taxa em memória.")
+
+
+def parse_limit(spec: str) -> tuple[float, float]:
+    """"10/60" -> (capacidade 10, reposição de 10 fichas a cada 60 s)."""
+    burst, _, seconds = spec.partition("/")
+    capacity = float(burst)
+    return capacity, capacity / float(seconds or 60)
+
+
+def _take(tokens: float, updated: float, now: float, capacity: float, rate: float) -> tuple[bool, float, float]:
+    """Regra do balde: (permitido, fichas restantes, segundos até a próxima ficha)."""
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1.0:
+        return True, tokens - 1.0, 0.0
+    return False, tokens, (1.0 - tokens) / rate
+
+
+class MemoryBackend:
+    """Baldes em memória (por processo), com LRU e descarte dos que já encheram."""
+
+    def __init__(self, max_keys: int = MAX_KEYS):
+        self.max_keys = max(1, max_keys)
+        # chave -> (fichas, atualizado em, cheio de novo em)
+        self._buckets: "OrderedDict[str, tuple[float, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, capacity: float, rate: float) -> tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.pop(key, (capacity, now, now))
+            allowed, tokens, retry = _take(tokens, updated, now, capacity, rate)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+
+            # balde que já encheu equivale a balde inexistente: sai da memória.
+            # Varre a partir do menos recente; o teto max_keys vale sempre.
+            while self._buckets:
+                oldest = next(iter(self._buckets.values()))
+                if oldest[2] > now and len(self._buckets) <= self.max_keys:
+                    break
+                self._buckets.popitem(last=False)
+            BUCKETS.set(len(self._buckets))
+        return allowed, retry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class SqliteBackend:
+    """Baldes numa tabela SQLite (WAL) compartilhada por todos os workers."""
+
+    IDLE_TTL = 3600.0
+
+    def __init__(self, path: str = RATE_LIMIT_DB):
+        self.path = path
+        self._local = threading.local()
+        self._hits = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, capacity: float, rate: float) -> tuple[bool, float]:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            allowed, tokens, retry = _take(tokens, updated, now, capacity, rate)
+            conn.execute(
+                "INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            self._hits += 1
+            if self._hits % 1000 == 0:
+                conn.execute("DELETE FROM rate_buckets WHERE updated < ?", (now - self.IDLE_TTL,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM rate_buckets")
+
+
+backend = SqliteBackend() if BACKEND == "sqlite" else MemoryBackend()
+
+
+def client_ip(request: Request, hops: int | None = None) -> str:
+    """
+    IP do cliente para o balde. Com N proxies confiáveis, é a N-ésima entrada
+    do X-Forwarded-For contando da direita (a que o proxy mais externo gravou);
+    trocar o começo do cabeçalho a cada requisição não muda o balde.
+    """
+    hops = TRUST_PROXY_HEADERS if hops is None else hops
+    if hops > 0:
+        # vários cabeçalhos X-Forwarded-For valem como uma lista só, na ordem
+        entries = [
+            e.strip()
+            for value in request.headers.getlist("x-forwarded-for")
+            for e in value.split(",")
+            if e.strip()
+        ]
+        if len(entries) >= hops:
+            return entries[-hops]
+    return request.client.host if request.client else "-"
+
+
+class RateLimit:
+    """Dependência de rota: Depends(RateLimit("login"))."""
+
+    def __init__(self, name: str):
+        self.name = name
+        spec = os.getenv(f"RATE_LIMIT_{name.upper()}", DEFAULT_LIMITS.get(name, "30/60"))
+        self.capacity, self.rate = parse_limit(spec)
+
+    def __call__(self, request: Request) -> None:
+        if not ENABLED:
+            return
+        allowed, retry = backend.hit(f"{self.name}:{client_ip(request)}", self.capacity, self.rate)
+        if not allowed:
+            RATE_LIMITED.inc(limit=self.name)
+            raise HTTPException(
+                status_code=429,
+                detail="Muitas tentativas. Aguarde um pouco e tente de novo.",
+                headers={"Retry-After": str(max(1, math.ceil(retry)))},
+            )
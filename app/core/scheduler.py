@@ -0,0 +1,250 @@
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import metrics
+from .database import SessionLocal
+from ..models import SchedulerLock, SchedulerRun
+
+# ==============================================================================
+# AGENDADOR DE TAREFAS PERIÓDICAS (em processo)
+#
+# - Uma thread por processo acorda na próxima tarefa devida; cada intervalo
+#   tem jitter (SCHEDULER_JITTER) para os workers não acordarem juntos.
+# - Execução única entre workers: antes de rodar, a tarefa pega um lock com
+#   prazo na tabela scheduler_locks (UPDATE condicional). O mesmo UPDATE
+#   confere se outro worker já rodou dentro do intervalo.
+# - Cada execução fica em scheduler_runs (status, duração, resumo).
+# ==============================================================================
+
+ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+INITIAL_DELAY = float(os.getenv("SCHEDULER_INITIAL_DELAY", "60"))
+JITTER = float(os.getenv("SCHEDULER_JITTER", "0.1"))
+HISTORY_KEEP = int(os.getenv("SCHEDULER_HISTORY_KEEP", "500"))
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+log = logging.getLogger("setting.scheduler")
+
+RUNS = metrics.counter("setting_scheduler_runs_total", "Execuções de tarefas agendadas.", ("job", "status"))
+DURATION = metrics.histogram(
+    "setting_scheduler_run_seconds",
+    "Duração das tarefas agendadas.",
+    ("job",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+)
+
+
+@dataclass
+class Job:
+    name: str
+    interval: float
+    fn: Callable[[], dict | None]
+    # prazo do lock: se o processo morrer no meio, outro assume depois disso
+    lease: float
+    next_run: float = field(default=0.0, compare=False)
+
+    def schedule(self, now: float, delay: float | None = None) -> None:
+        base = self.interval if delay is None else delay
+        self.next_run = now + base * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+class Scheduler:
+    def __init__(self):
+        self.jobs: dict[str, Job] = {}
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._running: set[str] = set()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, interval: float, fn: Callable[[], dict | None], lease: float | None = None) -> Job:
+        job = Job(name, interval, fn, lease or max(60.0, interval / 2))
+        self.jobs[name] = job
+        return job
+
+    def job(self, name: str, interval: float, lease: float | None = None):
+        """Decorador: @scheduler.job("nome", 3600)."""
+
+        def _register(fn):
+            self.add(name, interval, fn, lease)
+            return fn
+
+        return _register
+
+    # ---------- thread ----------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        now = time.monotonic()
+        for job in self.jobs.values():
+            job.schedule(now, delay=INITIAL_DELAY)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="setting-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            now = time.monotonic()
+            due = [j for j in self.jobs.values() if j.next_run <= now]
+            for job in due:
+                if self._stop.is_set():
+                    return
+                self.run(job.name)
+                job.schedule(time.monotonic())
+            wait = min((j.next_run for j in self.jobs.values()), default=now + 60) - time.monotonic()
+            self._stop.wait(max(0.5, wait))
+
+    # ---------- execução ----------
+    def _acquire(self, job: Job, force: bool) -> float | None:
+        """Pega o lock da tarefa; devolve o epoch de início ou None (outro worker / não devida)."""
+        now = time.time()
+        db = SessionLocal()
+        try:
+            db.execute(
+                sqlite_insert(SchedulerLock)
+                .values(name=job.name, owner="", locked_until=0.0, last_run_at=None)
+                .on_conflict_do_nothing(index_elements=[SchedulerLock.name])
+            )
+            conditions = [SchedulerLock.name == job.name, SchedulerLock.locked_until < now]
+            if not force:
+                # outro worker já rodou neste intervalo (descontando o jitter)
+                recent = now - job.interval * (1 - JITTER)
+                conditions.append(or_(SchedulerLock.last_run_at.is_(None), SchedulerLock.last_run_at <= recent))
+            got = db.execute(
+                update(SchedulerLock)
+                .where(*conditions)
+                .values(owner=OWNER, locked_until=now + job.lease)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            return now if got else None
+        finally:
+            db.close()
+
+    def _finish(self, job: Job, started: float, duration: float, status: str, details: str) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(SchedulerLock)
+                .where(SchedulerLock.name == job.name, SchedulerLock.owner == OWNER)
+                .values(locked_until=0.0, last_run_at=started)
+                .execution_options(synchronize_session=False)
+            )
+            db.add(SchedulerRun(
+                job=job.name,
+                owner=OWNER,
+                started_at=datetime.utcfromtimestamp(started),
+                duration_ms=round(duration * 1000, 2),
+                status=status,
+                details=details,
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def run(self, name: str, force: bool = False) -> str:
+        """
+        Roda a tarefa agora, se conseguir o lock.
+        force=True ignora o intervalo (botão "rodar agora"), mas não o lock.
+        Devolve "ok", "error", "skipped" ou "running".
+        """
+        job = self.jobs[name]
+        with self._lock:
+            if name in self._running:
+                return "running"
+            self._running.add(name)
+        try:
+            try:
+                started = self._acquire(job, force)
+            except Exception:
+                log.exception("scheduler lock failed", extra={"job": name})
+                return "error"
+            if started is None:
+                return "skipped"
+
+            t0 = time.perf_counter()
+            try:
+                result = job.fn() or {}
+                status, details = "ok", json.dumps(result, ensure_ascii=False, default=str)
+            except Exception as e:  # noqa: BLE001 - vai para o histórico
+                log.exception("scheduled job failed", extra={"job": name})
+                status, details = "error", f"{type(e).__name__}: {e}"
+            duration = time.perf_counter() - t0
+
+            RUNS.inc(job=name, status=status)
+            DURATION.observe(duration, job=name)
+            log.info("scheduled job %s %s in %.1fms", name, status, duration * 1000, extra={"job": name, "status": status})
+            self._finish(job, started, duration, status, details)
+            return status
+        finally:
+            with self._lock:
+                self._running.discard(name)
+
+    def run_in_background(self, name: str) -> None:
+        threading.Thread(target=self.run, args=(name, True), name=f"setting-job-{name}", daemon=True).start()
+
+    # ---------- consulta ----------
+    def history(self, limit: int = 50, job: str | None = None) -> list[SchedulerRun]:
+        db = SessionLocal()
+        try:
+            stmt = select(SchedulerRun).order_by(SchedulerRun.id.desc()).limit(limit)
+            if job:
+                stmt = stmt.where(SchedulerRun.job == job)
+            return db.execute(stmt).scalars().all()
+        finally:
+            db.close()
+
+    def locks(self) -> dict[str, SchedulerLock]:
+        db = SessionLocal()
+        try:
+            return {row.name: row for row in db.execute(select(SchedulerLock)).scalars()}
+        finally:
+            db.close()
+
+
+def prune_history(keep: int = HISTORY_KEEP) -> int:
+    """Mantém só as `keep` execuções mais recentes."""
+    db = SessionLocal()
+    try:
+        cutoff = db.execute(
+            select(SchedulerRun.id).order_by(SchedulerRun.id.desc()).offset(keep).limit(1)
+        ).scalar()
+        if cutoff is None:
+            return 0
+        deleted = db.execute(delete(SchedulerRun).where(SchedulerRun.id <= cutoff)).rowcount
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+
+scheduler = Scheduler()
+
+
+def start() -> None:
+    scheduler.start()
+
+
+def stop() -> None:
+    scheduler.stop()
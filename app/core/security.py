@@ -5,6 +5,9 @@ from .config import settings
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 serializer = URLSafeSerializer(settings.secret_key, salt="setting-session")
 
+# Conta sem senha (ex.: importada sem os hashes): nenhum hash confere com isso
+UNUSABLE_PASSWORD = "!"
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -0,0 +1,164 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from . import metrics
+from .database import Base, DATA_DIR, SessionLocal, ReadSessionLocal, ensure_autoincrement, ensure_indexes
+
+# ==============================================================================
+# SHARD POR ORGANIZAÇÃO (opcional: SHARD_PER_ORG=1)
+#
+# - Catálogo global (banco principal): organizations, users, invite_requests,
+#   invite_code_index (código -> organização, para o signup público).
+# - Um arquivo SQLite por organização com os dados da clínica
+#   (SHARD_TABLES abaixo). Assim cada org tem o seu próprio lock de escrita.
+# - Engines abertos ficam num cache LRU com limite de arquivos abertos.
+# ==============================================================================
+
+ENABLED = os.getenv("SHARD_PER_ORG", "0") == "1"
+SHARD_DIR = os.getenv("SHARD_DIR", os.path.join(DATA_DIR, "shards"))
+MAX_OPEN = int(os.getenv("SHARD_MAX_OPEN", "32"))
+SHARD_POOL_SIZE = int(os.getenv("SHARD_POOL_SIZE", "2"))
+
+SHARD_TABLES = (
+    "session_notes", "norm_cards", "norm_card_bands", "doc_templates", "invite_codes", "invite_codes_archive",
+)
+
+OPEN_SHARDS = metrics.gauge("setting_shards_open", "Engines de shard abertos no cache.")
+SHARD_LOOKUPS = metrics.counter(
+    "setting_shard_cache_lookups_total", "Buscas no cache de engines de shard.", ("result",)
+)
+SHARD_EVICTIONS = metrics.counter(
+    "setting_shard_cache_evictions_total", "Engines de shard fechados por LRU."
+)
+
+
+def shard_path(org_id: int) -> str:
+    return os.path.join(SHARD_DIR, f"org_{int(org_id)}.db")
+
+
+def shard_tables() -> list:
+    return [Base.metadata.tables[name] for name in SHARD_TABLES]
+
+
+def create_shard_engine(path: str, readonly: bool = False):
+    if readonly:
+        # como o read_engine do banco principal: arquivo aberto só para leitura
+        eng = create_engine(
+            f"sqlite:///file:{Path(path).as_posix()}?mode=ro&uri=true",
+            connect_args={"check_same_thread": False},
+            pool_size=SHARD_POOL_SIZE,
+            max_overflow=0,
+        )
+
+        @event.listens_for(eng, "connect")
+        def _reader_pragmas(dbapi_conn, conn_record):
+            cur = dbapi_conn.cursor()
+            cur.execute("PRAGMA query_only=ON")
+            cur.execute("PRAGMA busy_timeout=5000")
+            cur.close()
+
+        return eng
+
+    eng = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        pool_size=SHARD_POOL_SIZE,
+        max_overflow=0,
+    )
+
+    @event.listens_for(eng, "connect")
+    def _pragmas(dbapi_conn, conn_record):
+        dbapi_conn.isolation_level = None
+        cur = dbapi_conn.cursor()
+        # só tem efeito em banco novo (antes da primeira tabela): libera espaço aos poucos
+        cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA busy_timeout=5000")
+        cur.close()
+
+    @event.listens_for(eng, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    return eng
+
+
+class ShardEngineCache:
+    """
+    Cache LRU de engines por organização (escritor + leitor do mesmo arquivo),
+    com teto de organizações abertas.
+    """
+
+    def __init__(self, max_open: int = MAX_OPEN):
+        self.max_open = max(1, max_open)
+        self._engines: "OrderedDict[int, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, org_id: int, readonly: bool = False):
+        org_id = int(org_id)
+        with self._lock:
+            pair = self._engines.get(org_id)
+            if pair is not None:
+                self._engines.move_to_end(org_id)
+                SHARD_LOOKUPS.inc(result="hit")
+                return pair[1] if readonly else pair[0]
+
+            SHARD_LOOKUPS.inc(result="miss")
+            os.makedirs(SHARD_DIR, exist_ok=True)
+            path = shard_path(org_id)
+            eng = create_shard_engine(path)
+            Base.metadata.create_all(bind=eng, tables=shard_tables())
+            ensure_indexes(eng, shard_tables())
+            ensure_autoincrement(eng, shard_tables())
+            # o leitor só abre depois que o escritor criou o arquivo
+            pair = (eng, create_shard_engine(path, readonly=True))
+            self._engines[org_id] = pair
+
+            while len(self._engines) > self.max_open:
+                _, old = self._engines.popitem(last=False)
+                # conexões em uso continuam válidas e são fechadas ao voltar
+                for e in old:
+                    e.dispose()
+                SHARD_EVICTIONS.inc()
+
+            OPEN_SHARDS.set(len(self._engines))
+            return pair[1] if readonly else pair[0]
+
+    def dispose_all(self) -> None:
+        with self._lock:
+            for pair in self._engines.values():
+                for eng in pair:
+                    eng.dispose()
+            self._engines.clear()
+            OPEN_SHARDS.set(0)
+
+
+shard_engines = ShardEngineCache()
+
+
+def open_session(org_id: int | None = None, readonly: bool = False) -> Session:
+    """
+    Abre uma sessão para a organização.
+    Sem SHARD_PER_ORG (ou sem org) é a sessão normal do banco principal;
+    com shards, as tabelas da clínica são ligadas ao arquivo da org
+    (readonly: ao leitor do shard, que recusa escrita como o read_engine).
+
+    Uma sessão de escrita que mexe no shard e no catálogo faz dois commits
+    independentes: quem precisa das duas partes grava uma, depois a outra,
+    e desfaz a primeira se a segunda falhar (ver signup._redeem e
+    repositories.create_invites).
+    """
+    factory = ReadSessionLocal if readonly else SessionLocal
+    if not ENABLED or not org_id:
+        db = factory()
+    else:
+        eng = shard_engines.get(org_id, readonly=readonly)
+        db = factory(binds={t: eng for t in shard_tables()})
+    db.info["org_id"] = org_id
+    return db
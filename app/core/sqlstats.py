@@ -0,0 +1,122 @@
+import logging
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from . import metrics
+from .observability import route_name
+
+# ==============================================================================
+# CONTADOR DE SQL POR REQUISIÇÃO
+#
+# Conta os statements e o tempo total de banco de cada requisição, devolve
+# tudo no cabeçalho Server-Timing e registra no log:
+# - requisições com muitas queries (SQL_MAX_QUERIES)
+# - o mesmo statement repetido várias vezes (padrão N+1, SQL_N_PLUS_ONE)
+# - statements lentos (SQL_SLOW_MS)
+# ==============================================================================
+
+SLOW_MS = float(os.getenv("SQL_SLOW_MS", "100"))
+MAX_QUERIES = int(os.getenv("SQL_MAX_QUERIES", "20"))
+N_PLUS_ONE = int(os.getenv("SQL_N_PLUS_ONE", "5"))
+
+log = logging.getLogger("setting.sql")
+
+QUERIES_PER_REQUEST = metrics.histogram(
+    "setting_db_queries_per_request",
+    "Statements SQL por requisição.",
+    ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+DB_TIME_PER_REQUEST = metrics.histogram(
+    "setting_db_time_per_request_seconds", "Tempo de banco por requisição.", ("route",)
+)
+SLOW_QUERIES = metrics.counter(
+    "setting_db_slow_queries_total", "Statements acima de SQL_SLOW_MS.", ("route",)
+)
+
+
+class QueryStats:
+    __slots__ = ("request", "count", "seconds", "statements")
+
+    def __init__(self, request: Request | None = None):
+        self.request = request
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+
+    @property
+    def route(self) -> str:
+        return route_name(self.request) if self.request is not None else "-"
+
+    def repeated(self, threshold: int = N_PLUS_ONE) -> list[tuple[str, int]]:
+        return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("setting_query_stats", default=None)
+
+
+def current_stats() -> QueryStats | None:
+    return _current.get()
+
+
+# ---------- hooks globais (valem para todos os engines, inclusive shards) ----------
+@event.listens_for(Engine, "before_cursor_execute")
+def _before(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("setting_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("setting_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats.count += 1
+    stats.seconds += elapsed
+    stats.statements[statement] += 1
+    if elapsed * 1000 >= SLOW_MS:
+        SLOW_QUERIES.inc(route=stats.route)
+        log.warning(
+            "slow query %.1fms route=%s sql=%s",
+            elapsed * 1000, stats.route, " ".join(statement.split())[:500],
+        )
+
+
+class QueryStatsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        stats = QueryStats(request)
+        # visível para os middlewares de fora (log de acesso)
+        request.state.query_stats = stats
+        token = _current.set(stats)
+        try:
+            response = await call_next(request)
+        finally:
+            _current.reset(token)
+
+        route = stats.route
+        QUERIES_PER_REQUEST.observe(stats.count, route=route)
+        DB_TIME_PER_REQUEST.observe(stats.seconds, route=route)
+        response.headers.append(
+            "Server-Timing",
+            f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"',
+        )
+
+        if stats.count > MAX_QUERIES:
+            log.warning("too many queries route=%s count=%d db_ms=%.1f", route, stats.count, stats.seconds * 1000)
+        for statement, n in stats.repeated():
+            log.warning(
+                "possible N+1 route=%s repeated=%d sql=%s",
+                route, n, " ".join(statement.split())[:500],
+            )
+        return response
@@ -0,0 +1,181 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from sqlalchemy.orm import Session
+
+from . import metrics
+from . import shards
+from .shards import open_session
+
+# ==============================================================================
+# FILA DE ESCRITA COM GROUP COMMIT (opcional: WRITE_QUEUE=1)
+#
+# Uma única thread escritora junta as mutações que chegam dentro de poucos
+# milissegundos e grava todas numa só transação (um fsync). Cada mutação roda
+# dentro de um SAVEPOINT próprio: se falhar, só ela é desfeita e só o seu
+# chamador recebe a exceção. O chamador bloqueia até o COMMIT do lote, então
+# o redirect seguinte já enxerga o dado (read-your-writes).
+# ==============================================================================
+
+ENABLED = os.getenv("WRITE_QUEUE", "0") == "1"
+MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "64"))
+MAX_WAIT = float(os.getenv("WRITE_QUEUE_MAX_WAIT_MS", "5")) / 1000.0
+SUBMIT_TIMEOUT = float(os.getenv("WRITE_QUEUE_TIMEOUT", "30"))
+
+BATCH_SIZE = metrics.histogram(
+    "setting_write_queue_batch_size",
+    "Mutações por transação na fila de escrita.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+WAIT_TIME = metrics.histogram(
+    "setting_write_queue_wait_seconds",
+    "Tempo entre o envio da mutação e o início do lote.",
+)
+COMMIT_TIME = metrics.histogram(
+    "setting_write_queue_commit_seconds",
+    "Duração do lote (mutações + COMMIT).",
+)
+FAILURES = metrics.counter(
+    "setting_write_queue_failures_total",
+    "Mutações que falharam na fila de escrita.",
+)
+
+_STOP = object()
+
+
+class _Item:
+    __slots__ = ("fn", "org_id", "future", "enqueued_at")
+
+    def __init__(self, fn: Callable[[Session], Any], org_id: int | None = None):
+        self.fn = fn
+        self.org_id = org_id
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class WriteQueue:
+    def __init__(self, session_factory=open_session, max_batch: int = MAX_BATCH, max_wait: float = MAX_WAIT):
+        # session_factory(org_id) -> Session (shard da org, se houver)
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._q: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="setting-write-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if not self.running:
+            return
+        self._q.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, fn: Callable[[Session], Any], org_id: int | None = None, timeout: float = SUBMIT_TIMEOUT) -> Any:
+        """
+        Enfileira fn(db) e espera o COMMIT do lote.
+        Retorna o valor de fn ou relança a exceção dela.
+        fn deve devolver valores simples (ids, bools), não objetos ORM.
+        """
+        item = _Item(fn, org_id)
+        self._q.put(item)
+        return item.future.result(timeout=timeout)
+
+    # ------------------------------------------------------------------
+    def _collect(self, first: _Item) -> tuple[list[_Item], bool]:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._q.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._q.get()
+            if first is _STOP:
+                return
+            batch, stop = self._collect(first)
+            # com shards, cada organização tem o seu próprio arquivo/transação
+            groups: dict[int | None, list[_Item]] = {}
+            for item in batch:
+                key = item.org_id if shards.ENABLED else None
+                groups.setdefault(key, []).append(item)
+            for org_id, items in groups.items():
+                self._process(items, org_id)
+            if stop:
+                return
+
+    def _process(self, batch: list[_Item], org_id: int | None = None) -> None:
+        started = time.perf_counter()
+        for item in batch:
+            WAIT_TIME.observe(started - item.enqueued_at)
+        BATCH_SIZE.observe(len(batch))
+
+        outcomes: list[tuple[_Item, Any, BaseException | None]] = []
+        db = self.session_factory(org_id)
+        try:
+            for item in batch:
+                sp = db.begin_nested()
+                try:
+                    result = item.fn(db)
+                    db.flush()
+                    sp.commit()
+                    outcomes.append((item, result, None))
+                except BaseException as e:  # noqa: BLE001 - devolvido ao chamador
+                    sp.rollback()
+                    outcomes.append((item, None, e))
+            db.commit()
+        except BaseException as e:  # noqa: BLE001
+            db.rollback()
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            FAILURES.inc(len(batch))
+            return
+        finally:
+            db.close()
+            COMMIT_TIME.observe(time.perf_counter() - started)
+
+        for item, result, error in outcomes:
+            if error is not None:
+                FAILURES.inc()
+                item.future.set_exception(error)
+            else:
+                item.future.set_result(result)
+
+
+write_queue = WriteQueue()
+
+
+def run_write(db: Session, fn: Callable[[Session], Any]) -> Any:
+    """
+    Executa uma mutação pequena.
+    - WRITE_QUEUE=1: vai para a fila de group commit (fn roda na thread escritora)
+    - caso contrário: roda na sessão da requisição e faz commit na hora
+    """
+    if ENABLED and write_queue.running:
+        return write_queue.submit(fn, org_id=db.info.get("org_id"))
+    result = fn(db)
+    db.commit()
+    return result
@@ -1,46 +1,157 @@
-from fastapi import Request
+from fastapi import Depends, Request
 from sqlalchemy.orm import Session
 
-from .core.database import SessionLocal
+from .core.database import ReadSessionLocal
+from .core.identity import Identity, identity_cache
+from .core.shards import open_session
 from .models import User
+from .repositories import TenantRepo
+
+READ_METHODS = ("GET", "HEAD")
+_UNRESOLVED = object()
 
 
 # =========================
 # DB helper (se você usa em routers)
 # =========================
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    """
+    GET/HEAD usam o engine somente leitura (pool próprio, query_only);
+    os demais métodos usam o pool de escrita.
+    Com SHARD_PER_ORG=1 a sessão já vem ligada ao shard da organização.
+    """
+    db = open_session(
+        request.session.get("org_id"),
+        readonly=request.method in READ_METHODS,
+    )
     try:
         yield db
     finally:
         db.close()
 
 
+# =========================
+# Identidade (cache de processo)
+# =========================
+class AuthRedirect(Exception):
+    """Interrompe a rota e redireciona (tratado em main.py)."""
+
+    def __init__(self, url: str):
+        self.url = url
+
+
+def _load_identity(user_id: int) -> Identity | None:
+    db = ReadSessionLocal()
+    try:
+        row = (
+            db.query(User.id, User.organization_id, User.role, User.email)
+            .filter(User.id == user_id)
+            .first()
+        )
+    finally:
+        db.close()
+    if not row:
+        return None
+    return Identity(user_id=row.id, org_id=row.organization_id, role=row.role or "member", email=row.email)
+
+
+def current_identity(request: Request) -> Identity | None:
+    """
+    Resolve a identidade uma única vez por requisição (guardada em request.state).
+    Papel e organização vêm do banco (via cache), não do cookie; a sessão é
+    atualizada para continuar coerente com o banco.
+    """
+    cached = getattr(request.state, "identity", _UNRESOLVED)
+    if cached is not _UNRESOLVED:
+        return cached
+
+    user_id = request.session.get("user_id")
+    identity = identity_cache.get(user_id, _load_identity) if user_id else None
+
+    if identity is None:
+        if user_id:
+            # usuário removido: derruba a sessão
+            request.session.clear()
+    else:
+        if request.session.get("role") != identity.role:
+            request.session["role"] = identity.role
+        if request.session.get("org_id") != identity.org_id:
+            request.session["org_id"] = identity.org_id
+
+    request.state.identity = identity
+    return identity
+
+
+# =========================
+# Dependências de autenticação
+# =========================
+def get_identity(request: Request) -> Identity | None:
+    return current_identity(request)
+
+
+def require_user(request: Request) -> Identity:
+    """Usuário logado e com organização; senão redireciona."""
+    identity = current_identity(request)
+    if identity is None:
+        raise AuthRedirect("/login")
+    if not identity.org_id:
+        raise AuthRedirect("/logout")
+    return identity
+
+
+def require_admin_user(request: Request) -> Identity:
+    identity = require_user(request)
+    if not identity.is_admin:
+        raise AuthRedirect("/")
+    return identity
+
+
+# =========================
+# Repositório da organização (sessão aberta só depois do auth)
+# =========================
+def _open_repo(request: Request, identity: Identity):
+    db = open_session(identity.org_id, readonly=request.method in READ_METHODS)
+    try:
+        yield TenantRepo(db, identity)
+    finally:
+        db.close()
+
+
+def get_repo(request: Request, identity: Identity = Depends(require_user)):
+    yield from _open_repo(request, identity)
+
+
+def get_admin_repo(request: Request, identity: Identity = Depends(require_admin_user)):
+    yield from _open_repo(request, identity)
+
+
 # =========================
 # Auth helpers (novo padrão)
 # =========================
 def require_auth(request: Request) -> bool:
     """
-    Autenticação baseada em SessionMiddleware.
+    Autenticação baseada em SessionMiddleware + cache de identidade.
     """
-    return bool(request.session.get("user_id"))
+    return current_identity(request) is not None
 
 
 def require_admin(request: Request) -> bool:
-    return require_auth(request) and request.session.get("role") == "admin"
+    identity = current_identity(request)
+    return identity is not None and identity.is_admin
 
 
 def get_context(request: Request) -> dict:
+    identity = current_identity(request)
     return {
-        "user_id": request.session.get("user_id"),
-        "user_email": request.session.get("user_email"),
-        "org_id": request.session.get("org_id"),
-        "role": request.session.get("role"),
+        "user_id": identity.user_id if identity else None,
+        "user_email": identity.email if identity else None,
+        "org_id": identity.org_id if identity else None,
+        "role": identity.role if identity else None,
     }
 
 
 def get_current_user(db: Session, request: Request) -> User | None:
-    user_id = request.session.get("user_id")
-    if not user_id:
+    identity = current_identity(request)
+    if identity is None:
         return None
-    return db.query(User).filter(User.id == user_id).first()
+    return db.get(User, identity.user_id)
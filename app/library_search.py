@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from .core import metrics
+from .core.assets import asset_url
+from .core.database import DATA_DIR
+
+try:  # extração de texto dos PDFs (opcional: sem ela a busca fica desligada)
+    from pypdf import PdfReader
+except ImportError:  # pragma: no cover - depende do ambiente
+    PdfReader = None
+
+# ==============================================================================
+# BUSCA NO TEXTO DA BIBLIOTECA BASE (PDFs de app/static/biblioteca_base)
+#
+# - O texto de cada página é extraído uma vez (pypdf) e guardado em
+#   LIBRARY_TEXT_CACHE/<sha256 do PDF>.json: PDF novo ou alterado = hash novo;
+#   os demais não são lidos de novo. `python -m app.tools.library_index`
+#   faz isso no build.
+# - No startup, as páginas vão para uma tabela FTS5 em memória (por processo,
+#   alguns MB no máximo), sem acento e sem caixa.
+# - A busca devolve as páginas com trecho destacado e link #page=N.
+# ==============================================================================
+
+ENABLED = os.getenv("LIBRARY_SEARCH_ENABLED", "1") == "1"
+LIBRARY_DIR = os.path.join("app", "static", "biblioteca_base")
+CACHE_DIR = os.getenv("LIBRARY_TEXT_CACHE", os.path.join(DATA_DIR, "biblioteca_texto"))
+
+# títulos dos textos da biblioteca base; PDFs novos sem entrada aqui usam o título do arquivo
+TITLES = {
+    "psicoterapia_online_jovens.pdf": "A psicoterapia on-line e a geração Z: um ensaio sobre possibilidades",
+    "psicoterapia_online_ampliar_limitar.pdf": "Psicoterapia on-line: ampliações e limitações do setting terapêutico",
+    "origens_psicoterapia.pdf": "As origens das relações psicoterapêuticas on-line",
+}
+
+# marcadores do snippet (não aparecem em texto de PDF); o template escapa o resto
+_HL_START, _HL_END = "\x02", "\x03"
+
+log = logging.getLogger("setting.library")
+
+SEARCHES = metrics.counter("setting_library_searches_total", "Buscas na biblioteca.", ("result",))
+PAGES = metrics.gauge("setting_library_pages_indexed", "Páginas da biblioteca no índice de busca.")
+
+
+class LibrarySearchUnavailable(Exception):
+    pass
+
+
+@dataclass
+class Hit:
+    file: str
+    title: str
+    page: int
+    snippet: list[tuple[str, bool]]  # (texto, destacado)
+
+    @property
+    def url(self) -> str:
+        return f"{asset_url('biblioteca_base/' + self.file)}#page={self.page}"
+
+
+# ---------- extração com cache ----------
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _clean(text: str) -> str:
+    # hifenização de fim de linha e quebras do layout de coluna
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def extract_pages(path: str) -> list[str]:
+    if PdfReader is None:
+        raise LibrarySearchUnavailable("pypdf não está instalado.")
+    reader = PdfReader(path)
+    return [_clean(page.extract_text() or "") for page in reader.pages]
+
+
+def load_pages(path: str) -> tuple[list[str], bool]:
+    """Texto por página (do cache, se o PDF não mudou). Devolve (páginas, veio_do_cache)."""
+    cache = os.path.join(CACHE_DIR, f"{_sha256(path)}.json")
+    if os.path.exists(cache):
+        with open(cache, encoding="utf-8") as f:
+            return json.load(f)["pages"], True
+
+    pages = extract_pages(path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = cache + ".part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"file": os.path.basename(path), "pages": pages}, f, ensure_ascii=False)
+    os.replace(tmp, cache)
+    return pages, False
+
+
+def library_files() -> list[str]:
+    if not os.path.isdir(LIBRARY_DIR):
+        return []
+    return sorted(f for f in os.listdir(LIBRARY_DIR) if f.lower().endswith(".pdf"))
+
+
+def title_for(filename: str) -> str:
+    return TITLES.get(filename) or os.path.splitext(filename)[0].replace("_", " ").capitalize()
+
+
+# ---------- índice FTS5 ----------
+def _match_query(q: str) -> str:
+    """Texto livre -> consulta FTS5: cada palavra entre aspas (E), a última também como prefixo."""
+    words = re.findall(r"\w+", q)[:12]
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words[:-1]]
+    terms.append(f'"{words[-1]}"*')
+    return " ".join(terms)
+
+
+def _split_snippet(snippet: str) -> list[tuple[str, bool]]:
+    parts = []
+    for i, chunk in enumerate(re.split(f"[{_HL_START}{_HL_END}]", snippet)):
+        if chunk:
+            parts.append((chunk, i % 2 == 1))
+    return parts
+
+
+class LibraryIndex:
+    def __init__(self):
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self.documents: list[dict] = []
+        self.error: str | None = None
+        self.built_at: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._conn is not None
+
+    def build(self) -> dict:
+        """Extrai (ou lê do cache) e monta o índice; troca o anterior de uma vez."""
+        started = time.perf_counter()
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.execute(
+            "CREATE VIRTUAL TABLE pages USING fts5("
+            "text, file UNINDEXED, page UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        documents, cached, total, missing = [], 0, 0, None
+        for name in library_files():
+            try:
+                pages, from_cache = load_pages(os.path.join(LIBRARY_DIR, name))
+            except LibrarySearchUnavailable as e:
+                # sem pypdf: só os PDFs que já estão no cache entram
+                missing = e
+                continue
+            except Exception as e:  # noqa: BLE001 - um PDF ruim não derruba os outros
+                log.warning("library pdf failed: %s: %s", name, e)
+                continue
+            conn.executemany(
+                "INSERT INTO pages (text, file, page) VALUES (?, ?, ?)",
+                [(text, name, n) for n, text in enumerate(pages, 1) if text],
+            )
+            cached += from_cache
+            total += len(pages)
+            documents.append({"file": name, "title": title_for(name), "pages": len(pages)})
+        conn.commit()
+        if missing and not documents:
+            conn.close()
+            raise missing
+
+        with self._lock:
+            old, self._conn = self._conn, conn
+            self.documents = documents
+            self.built_at = time.time()
+            self.error = None
+        if old is not None:
+            old.close()
+        PAGES.set(total)
+        return {
+            "documentos": len(documents),
+            "paginas": total,
+            "do_cache": cached,
+            "segundos": round(time.perf_counter() - started, 2),
+        }
+
+    def search(self, q: str, limit: int = 20) -> list[Hit]:
+        match = _match_query(q)
+        if not match:
+            return []
+        with self._lock:
+            if self._conn is None:
+                raise LibrarySearchUnavailable(self.error or "Índice da biblioteca ainda não foi montado.")
+            rows = self._conn.execute(
+                "SELECT file, page, snippet(pages, 0, ?, ?, '…', 16) FROM pages "
+                "WHERE pages MATCH ? ORDER BY rank LIMIT ?",
+                (_HL_START, _HL_END, match, limit),
+            ).fetchall()
+        SEARCHES.inc(result="hit" if rows else "empty")
+        return [Hit(file, title_for(file), page, _split_snippet(snip)) for file, page, snip in rows]
+
+
+library_index = LibraryIndex()
+
+
+def _build_in_background() -> None:
+    try:
+        summary = library_index.build()
+        log.info("library index built", extra=summary)
+    except Exception as e:  # noqa: BLE001 - a busca avisa o motivo; o resto do app segue
+        library_index.error = str(e)
+        log.warning("library index unavailable: %s", e)
+
+
+def start() -> None:
+    """Monta o índice numa thread (extrair PDFs sem cache leva alguns segundos)."""
+    threading.Thread(target=_build_in_background, name="setting-library-index", daemon=True).start()
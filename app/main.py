@@ -1,7 +1,7 @@
 import os
 from datetime import datetime, timedelta
 
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -10,8 +10,16 @@ from starlette.middleware.base import BaseHTTPMiddleware
 
 # --- Configurações e Banco de Dados ---
 from .core.config import settings
-from .core.database import Base, engine, SessionLocal
-from .deps import require_auth
+from .core.database import Base, engine, SessionLocal, ensure_autoincrement, ensure_indexes
+from . import library_search
+from .core import assets, invite_filter, logs, memory, profiler, scheduler, shards, write_queue
+from .core.identity import identity_cache
+from .core.observability import MetricsMiddleware
+from .core.sqlstats import QueryStatsMiddleware
+from .core.identity import Identity
+from .deps import AuthRedirect, require_user
+
+from .models import dedupe_pending_invite_requests
 
 # --- Seeds ---
 from .seed import seed_doc_templates
@@ -29,6 +37,13 @@ from .routers import (
     invite_requests,
     org_users,
     pages,
+    health,
+    profiles,
+    memory_admin,
+    maintenance,
+    backups,
+    org_export,
+    assets as assets_router,
 )
 
 # ==============================================================================
@@ -87,40 +102,68 @@ class SessionTimeoutMiddleware(BaseHTTPMiddleware):
 # ==============================================================================
 app = FastAPI(title=settings.app_name)
 
+
+@app.exception_handler(AuthRedirect)
+def auth_redirect_handler(request: Request, exc: AuthRedirect):
+    return RedirectResponse(url=exc.url, status_code=303)
+
 # ==============================================================================
 # MIDDLEWARES (A ORDEM IMPORTA!)
 # O último adicionado é o primeiro a rodar na requisição.
 # ==============================================================================
 
 # 1. Timeout (Roda DEPOIS que a sessão é decodificada, mas ANTES da rota)
+# SESSION_TIMEOUT_MINUTES menor serve para testes de carga (ver app/tools/loadtest.py)
+SESSION_TIMEOUT_MINUTES = int(os.getenv("SESSION_TIMEOUT_MINUTES", "30"))
+
 PUBLIC_PREFIXES = (
     "/login",
     "/logout",
     "/signup",
     "/solicitar-convite",
     "/static",
+    "/assets",
     "/terms",
     "/politica",
     "/health",
+    "/ready",
+    "/metrics",  # sem sessão: protegido pelo METRICS_TOKEN (sem ele, 404)
     "/docs",    # Opcional: liberar docs sem timeout
     "/openapi", # Opcional
 )
 
 app.add_middleware(
     SessionTimeoutMiddleware,
-    timeout_minutes=30,  # Configuração de 30 minutos
+    timeout_minutes=SESSION_TIMEOUT_MINUTES,  # Padrão: 30 minutos
     public_prefixes=PUBLIC_PREFIXES,
 )
 
+# 1b. Profiler sob demanda (só com PROFILER_ENABLED=1; precisa da sessão para checar admin)
+if profiler.ENABLED:
+    app.add_middleware(profiler.ProfilerMiddleware)
+
+# 1c. Pico de memória por rota, amostrado (só com MEMORY_PROFILING=1)
+if memory.ENABLED:
+    app.add_middleware(memory.MemoryMiddleware)
+
 # 2. Session (Roda PRIMEIRO na requisição para criar o request.session)
 app.add_middleware(
     SessionMiddleware,
     secret_key=os.getenv("SECRET_KEY", "change-me-now"),
     same_site="lax",
     https_only=True,   # Mude para False se estiver testando em localhost sem HTTPS
-    max_age=60 * 30,   # Cookie também expira em 30 min para sincronizar
+    max_age=60 * SESSION_TIMEOUT_MINUTES,  # Cookie expira junto com o timeout
 )
 
+# 3. Contador de SQL por requisição (Server-Timing, N+1, queries lentas)
+app.add_middleware(QueryStatsMiddleware)
+
+# 4. Métricas (mede a requisição inteira)
+app.add_middleware(MetricsMiddleware)
+
+# 5. Request ID + log de acesso (mais externo: todo registro da requisição leva o id)
+app.add_middleware(logs.RequestIdMiddleware)
+
 
 # ==============================================================================
 # CONFIGURAÇÃO DE ARQUIVOS E TEMPLATES
@@ -132,6 +175,7 @@ app.mount(
 )
 
 templates = Jinja2Templates(directory="app/templates")
+assets.install(templates)
 
 
 # ==============================================================================
@@ -142,11 +186,20 @@ def on_startup():
     """
     Inicializa o banco de dados e executa seeds se necessário.
     """
+    # Logs estruturados via fila (thread de escrita em segundo plano)
+    logs.setup_logging()
+
+    # URLs com hash dos arquivos estáticos (compressão br/gzip numa thread)
+    assets.start()
+
     # Reset do DB apenas se variável de ambiente permitir
     if os.getenv("RESET_DB") == "1":
         Base.metadata.drop_all(bind=engine)
 
     Base.metadata.create_all(bind=engine)
+    dedupe_pending_invite_requests(engine)
+    ensure_indexes(engine)
+    ensure_autoincrement(engine)
 
     # Seeds iniciais
     db = SessionLocal()
@@ -156,6 +209,39 @@ def on_startup():
     finally:
         db.close()
 
+    # Filtro de códigos de convite (signup recusa código inexistente sem banco)
+    if invite_filter.ENABLED:
+        invite_filter.start()
+
+    # Índice de busca no texto da biblioteca base (montado numa thread)
+    if library_search.ENABLED:
+        library_search.start()
+
+    # Fila de escrita com group commit (opcional)
+    if write_queue.ENABLED:
+        write_queue.write_queue.start()
+
+    # tracemalloc + amostragem de RSS (só se ligado)
+    if memory.ENABLED:
+        memory.start()
+
+    # Tarefas periódicas (arquivo, retenção, ANALYZE/vacuum) com lock entre workers
+    if scheduler.ENABLED:
+        scheduler.start()
+
+    # Profiler: marca em qual thread cada rota roda (só se ligado)
+    if profiler.ENABLED:
+        profiler.instrument_routes(app)
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    scheduler.stop()
+    write_queue.write_queue.stop()
+    memory.stop()
+    shards.shard_engines.dispose_all()
+    logs.shutdown_logging()
+
 
 # ==============================================================================
 # ROTAS E ENDPOINTS
@@ -166,16 +252,14 @@ def on_startup():
 def logout(request: Request):
     session = request.scope.get("session")
     if session is not None:
+        if session.get("user_id"):
+            identity_cache.invalidate(session.get("user_id"))
         session.clear()
     return RedirectResponse(url="/login", status_code=303)
 
 # Home
 @app.get("/")
-def home(request: Request):
-    # Verifica autenticação manual (redundância de segurança)
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-
+def home(request: Request, user: Identity = Depends(require_user)):
     return templates.TemplateResponse(
         "home.html",
         {
@@ -195,3 +279,17 @@ app.include_router(signup.router)
 app.include_router(invite_requests.router)
 app.include_router(org_users.router)
 app.include_router(pages.router)
+app.include_router(health.router)
+app.include_router(profiles.router)
+app.include_router(memory_admin.router)
+app.include_router(maintenance.router)
+app.include_router(backups.router)
+app.include_router(org_export.router)
+app.include_router(assets_router.router)
+
+# asset_url() em todos os templates (cada router tem seu Jinja2Templates)
+for _router in (
+    auth, session_mode, norms, documents, library, invites, signup, invite_requests,
+    org_users, pages, profiles, memory_admin, maintenance, backups,
+):
+    assets.install(_router.templates)
@@ -0,0 +1,222 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, insert, literal, or_, select
+
+from . import norm_dedupe
+from .core import backup, invite_filter, shards
+from .core.database import ReadSessionLocal, engine
+from .core.scheduler import prune_history, scheduler
+from .models import (
+    InviteCode,
+    InviteCodeArchive,
+    InviteCodeIndex,
+    InviteRequest,
+    InviteRequestArchive,
+    NoteRetentionPolicy,
+    Organization,
+    SessionNote,
+)
+
+# ==============================================================================
+# TAREFAS DE MANUTENÇÃO (rodam no agendador, app/core/scheduler.py)
+#
+# Tudo em lotes pequenos (MAINTENANCE_BATCH linhas por transação, com uma
+# pausa entre lotes) para não segurar o lock de escrita do SQLite enquanto
+# as rotas trabalham.
+# ==============================================================================
+
+BATCH = int(os.getenv("MAINTENANCE_BATCH", "500"))
+MAX_BATCHES = int(os.getenv("MAINTENANCE_MAX_BATCHES", "200"))
+PAUSE = float(os.getenv("MAINTENANCE_PAUSE_MS", "20")) / 1000.0
+
+# convites mortos (revogados, expirados ou esgotados) criados há mais de N dias
+INVITE_ARCHIVE_DAYS = int(os.getenv("INVITE_ARCHIVE_DAYS", "30"))
+# solicitações atendidas/recusadas há mais de N dias
+REQUEST_ARCHIVE_DAYS = int(os.getenv("REQUEST_ARCHIVE_DAYS", "90"))
+# páginas liberadas por execução (só com auto_vacuum=INCREMENTAL)
+VACUUM_PAGES = int(os.getenv("MAINTENANCE_VACUUM_PAGES", "2000"))
+
+ARCHIVE_INTERVAL = float(os.getenv("JOB_ARCHIVE_INTERVAL", str(6 * 3600)))
+RETENTION_INTERVAL = float(os.getenv("JOB_RETENTION_INTERVAL", str(24 * 3600)))
+DB_INTERVAL = float(os.getenv("JOB_DB_MAINTENANCE_INTERVAL", str(24 * 3600)))
+BACKUP_INTERVAL = float(os.getenv("JOB_BACKUP_INTERVAL", str(24 * 3600)))
+NORM_INDEX_INTERVAL = float(os.getenv("JOB_NORM_INDEX_INTERVAL", str(6 * 3600)))
+
+
+def _org_ids() -> list[int | None]:
+    """Com shards, uma passada por organização; sem shards, uma só (None)."""
+    if not shards.ENABLED:
+        return [None]
+    db = ReadSessionLocal()
+    try:
+        return db.execute(select(Organization.id).order_by(Organization.id)).scalars().all()
+    finally:
+        db.close()
+
+
+def _move(org_id: int | None, model, archive, where, extra: dict) -> tuple[int, list]:
+    """
+    Copia para `archive` e apaga de `model` as linhas que casam com `where`,
+    BATCH por transação. Devolve (linhas movidas, códigos movidos se houver).
+    """
+    table = model.__table__
+    cols = [c.name for c in table.columns]
+    has_code = "code" in cols
+    moved, codes = 0, []
+    for _ in range(MAX_BATCHES):
+        db = shards.open_session(org_id)
+        try:
+            stmt = select(table.c.id, table.c.code if has_code else literal(None)).where(where)
+            if org_id is not None:
+                stmt = stmt.where(table.c.organization_id == org_id)
+            rows = db.execute(stmt.order_by(table.c.id).limit(BATCH)).all()
+            if not rows:
+                break
+            ids = [r[0] for r in rows]
+            db.execute(
+                insert(archive).from_select(
+                    cols + list(extra),
+                    select(*[table.c[c] for c in cols], *[literal(v) for v in extra.values()])
+                    .where(table.c.id.in_(ids)),
+                )
+            )
+            db.execute(delete(model).where(table.c.id.in_(ids)).execution_options(synchronize_session=False))
+            db.commit()
+        finally:
+            db.close()
+        moved += len(ids)
+        if has_code:
+            codes.extend(r[1] for r in rows)
+        if len(rows) < BATCH:
+            break
+        time.sleep(PAUSE)
+    return moved, codes
+
+
+@scheduler.job("arquivar_convites", ARCHIVE_INTERVAL)
+def archive_invites() -> dict:
+    """Convites mortos saem de invite_codes para invite_codes_archive."""
+    now = datetime.utcnow()
+    dead = and_(
+        InviteCode.created_at < now - timedelta(days=INVITE_ARCHIVE_DAYS),
+        or_(
+            InviteCode.revoked == True,  # noqa: E712
+            InviteCode.expires_at < now,
+            and_(InviteCode.max_uses.isnot(None), InviteCode.uses >= InviteCode.max_uses),
+        ),
+    )
+    total = 0
+    for org_id in _org_ids():
+        moved, codes = _move(org_id, InviteCode, InviteCodeArchive, dead, {"archived_at": now})
+        total += moved
+        if shards.ENABLED and codes:
+            # o catálogo não precisa mais apontar para eles
+            catalog = shards.open_session(None)
+            try:
+                for i in range(0, len(codes), BATCH):
+                    catalog.execute(delete(InviteCodeIndex).where(InviteCodeIndex.code.in_(codes[i:i + BATCH])))
+                    catalog.commit()
+            finally:
+                catalog.close()
+
+    if total and invite_filter.ENABLED and invite_filter.invite_filter.ready:
+        invite_filter.invite_filter.rebuild()
+    return {"convites_arquivados": total}
+
+
+@scheduler.job("arquivar_solicitacoes", ARCHIVE_INTERVAL)
+def archive_requests() -> dict:
+    """Solicitações atendidas há mais de REQUEST_ARCHIVE_DAYS vão para o arquivo (catálogo)."""
+    now = datetime.utcnow()
+    old = and_(
+        InviteRequest.handled == True,  # noqa: E712
+        InviteRequest.handled_at < now - timedelta(days=REQUEST_ARCHIVE_DAYS),
+    )
+    moved, _ = _move(None, InviteRequest, InviteRequestArchive, old, {"archived_at": now})
+    return {"solicitacoes_arquivadas": moved}
+
+
+@scheduler.job("retencao_notas", RETENTION_INTERVAL)
+def apply_note_retention() -> dict:
+    """Apaga notas de sessão mais antigas que a política de cada organização."""
+    db = ReadSessionLocal()
+    try:
+        policies = db.execute(
+            select(NoteRetentionPolicy.organization_id, NoteRetentionPolicy.note_days)
+            .where(NoteRetentionPolicy.note_days > 0)
+        ).all()
+    finally:
+        db.close()
+
+    now = datetime.utcnow()
+    deleted = {}
+    for org_id, days in policies:
+        cutoff = now - timedelta(days=days)
+        count = 0
+        for _ in range(MAX_BATCHES):
+            s = shards.open_session(org_id)
+            try:
+                ids = s.execute(
+                    select(SessionNote.id)
+                    .where(SessionNote.organization_id == org_id, SessionNote.created_at < cutoff)
+                    .limit(BATCH)
+                ).scalars().all()
+                if ids:
+                    s.execute(
+                        delete(SessionNote).where(SessionNote.id.in_(ids)).execution_options(synchronize_session=False)
+                    )
+                    s.commit()
+            finally:
+                s.close()
+            count += len(ids)
+            if len(ids) < BATCH:
+                break
+            time.sleep(PAUSE)
+        if count:
+            deleted[str(org_id)] = count
+    return {"notas_apagadas": sum(deleted.values()), "por_organizacao": deleted}
+
+
+def _maintain(eng) -> dict:
+    with eng.begin() as conn:
+        # ANALYZE amostrado (rápido em tabelas grandes) + otimizações sugeridas
+        conn.exec_driver_sql("PRAGMA analysis_limit=1000")
+        conn.exec_driver_sql("ANALYZE")
+        conn.exec_driver_sql("PRAGMA optimize")
+        free_before = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        incremental = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+        if incremental and free_before:
+            # cada passo libera uma página: consumir o cursor inteiro
+            conn.exec_driver_sql(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+        free_after = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+    return {"paginas_livres": free_after, "liberadas": free_before - free_after, "incremental": incremental}
+
+
+@scheduler.job("manutencao_banco", DB_INTERVAL)
+def database_maintenance() -> dict:
+    """ANALYZE/optimize e vacuum incremental no banco principal e em cada shard."""
+    out = {"principal": _maintain(engine)}
+    if shards.ENABLED:
+        for org_id in _org_ids():
+            out[f"org_{org_id}"] = _maintain(shards.shard_engines.get(org_id))
+    out["historico_apagado"] = prune_history()
+    return out
+
+
+@scheduler.job("backup", BACKUP_INTERVAL, lease=3600)
+def run_backup() -> dict:
+    """Backup online (comprimido e conferido) do banco principal e dos shards."""
+    return backup.backup_all()
+
+
+@scheduler.job("indice_normas", NORM_INDEX_INTERVAL)
+def index_norm_cards() -> dict:
+    """Põe no índice de quase-duplicatas as normas que ainda não estão nele."""
+    indexed = {}
+    for org_id in _org_ids():
+        n = norm_dedupe.backfill(org_id)
+        if n:
+            indexed[str(org_id or "todas")] = n
+    return {"normas_indexadas": sum(indexed.values()), "por_organizacao": indexed}
@@ -1,25 +1,48 @@
 from sqlalchemy import (
     String,
     Integer,
+    BigInteger,
+    SmallInteger,
     DateTime,
     Text,
     ForeignKey,
-    Boolean
+    Boolean,
+    Index,
+    Float,
+    desc,
+    text,
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import event
+from sqlalchemy.orm import Mapped, mapped_column, relationship, Session
 from datetime import datetime
 import secrets
 import string
 
 from .core.database import Base
+from .core import shards
 
 
 # =========================
 # Helpers
 # =========================
+INVITE_ALPHABET = string.ascii_uppercase + string.digits
+# maior múltiplo de 36 que cabe num byte: bytes acima disso são descartados (sem viés)
+_INVITE_BYTE_LIMIT = 256 - 256 % len(INVITE_ALPHABET)
+
+
+def generate_invite_codes(count: int, length: int = 10) -> list[str]:
+    """Sorteia `count` códigos de uma vez (um token_bytes por rodada, não um choice por caractere)."""
+    chars: list[str] = []
+    needed = count * length
+    while len(chars) < needed:
+        raw = secrets.token_bytes(needed - len(chars) + 16)
+        chars.extend(INVITE_ALPHABET[b % len(INVITE_ALPHABET)] for b in raw if b < _INVITE_BYTE_LIMIT)
+    del chars[needed:]
+    return ["".join(chars[i:i + length]) for i in range(0, needed, length)]
+
+
 def generate_invite_code(length: int = 10) -> str:
-    alphabet = string.ascii_uppercase + string.digits
-    return "".join(secrets.choice(alphabet) for _ in range(length))
+    return generate_invite_codes(1, length)[0]
 
 
 # =========================
@@ -55,6 +78,11 @@ class Organization(Base):
 class User(Base):
     __tablename__ = "users"
 
+    # listagem da clínica por data (admin de usuários)
+    __table_args__ = (
+        Index("ix_users_org_created", "organization_id", "created_at"),
+    )
+
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
@@ -99,6 +127,12 @@ class User(Base):
 class InviteCode(Base):
     __tablename__ = "invite_codes"
 
+    __table_args__ = (
+        Index("ix_invite_codes_org_created", "organization_id", "created_at"),
+        # ids nunca reaproveitados (o arquivo e o filtro de convites contam com isso)
+        {"sqlite_autoincrement": True},
+    )
+
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
@@ -165,12 +199,59 @@ class InviteCode(Base):
         return True
 
 
+# =========================
+# Índice de convites (catálogo)
+# Só é preenchido com SHARD_PER_ORG=1: o signup público recebe apenas o
+# código e precisa saber em qual shard (organização) ele está.
+# =========================
+class InviteCodeIndex(Base):
+    __tablename__ = "invite_code_index"
+    # id crescente: o filtro de convites lê só o que entrou depois da última leitura
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True
+    )
+
+    code: Mapped[str] = mapped_column(
+        String(32),
+        unique=True,
+        nullable=False,
+        index=True
+    )
+
+    organization_id: Mapped[int] = mapped_column(
+        ForeignKey("organizations.id"),
+        nullable=False,
+        index=True
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _index_new_invite_codes(session, flush_context, instances):
+    if not shards.ENABLED:
+        return
+    for obj in list(session.new):
+        if isinstance(obj, InviteCode):
+            session.add(InviteCodeIndex(code=obj.code, organization_id=obj.organization_id))
+
+
 # =========================
 # Sessões
 # =========================
 class SessionNote(Base):
     __tablename__ = "session_notes"
 
+    # modo sessão: filtro por clínica (e paciente), ordem paciente ASC, data DESC;
+    # também cobre a lista de apelidos distintos
+    __table_args__ = (
+        Index(
+            "ix_session_notes_org_patient_created",
+            "organization_id", "patient_alias", desc("created_at"),
+        ),
+    )
+
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
@@ -218,6 +299,10 @@ class SessionNote(Base):
 class NormCard(Base):
     __tablename__ = "norm_cards"
 
+    __table_args__ = (
+        Index("ix_norm_cards_org_created", "organization_id", "created_at"),
+    )
+
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
@@ -264,12 +349,31 @@ class NormCard(Base):
     organization = relationship("Organization")
 
 
+# =========================
+# Índice de quase-duplicatas das normas (MinHash/LSH, app/norm_dedupe.py)
+# Uma linha por (faixa, balde) de cada card; cards que caem no mesmo balde
+# em alguma faixa são candidatos a duplicata. band = -1 marca card já
+# indexado mas sem texto suficiente.
+# =========================
+class NormCardBand(Base):
+    __tablename__ = "norm_card_bands"
+
+    organization_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    band: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    bucket: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    card_id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+
+
 # =========================
 # Modelos de documentos
 # =========================
 class DocTemplate(Base):
     __tablename__ = "doc_templates"
 
+    __table_args__ = (
+        Index("ix_doc_templates_org_created", "organization_id", "created_at"),
+    )
+
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
@@ -355,9 +459,19 @@ from sqlalchemy import Boolean
 class InviteRequest(Base):
     __tablename__ = "invite_requests"
 
+    __table_args__ = (
+        # no máximo UMA solicitação pendente por e-mail (o submit é um upsert nela)
+        Index(
+            "ux_invite_requests_pending_email", "email",
+            unique=True, sqlite_where=text("handled = 0"),
+        ),
+        # filas pendente / atendida, paginadas por id (keyset)
+        Index("ix_invite_requests_handled_id", "handled", "id"),
+    )
+
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
 
     name: Mapped[str] = mapped_column(String(120), default="")
     email: Mapped[str] = mapped_column(String(255), index=True, nullable=False)
@@ -371,3 +485,95 @@ class InviteRequest(Base):
 
     # opcional: qual convite foi gerado
     invite_code: Mapped[str] = mapped_column(String(32), default="")
+
+
+
+# =========================
+# Arquivo (linhas frias tiradas das tabelas quentes pelo agendador)
+# Sem chaves estrangeiras: o id é o da linha original.
+# =========================
+class InviteCodeArchive(Base):
+    __tablename__ = "invite_codes_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    code: Mapped[str] = mapped_column(String(32), index=True, nullable=False)
+    organization_id: Mapped[int] = mapped_column(Integer, index=True, nullable=False)
+    role: Mapped[str] = mapped_column(String(20), default="member")
+    max_uses: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    uses: Mapped[int] = mapped_column(Integer, default=0)
+    expires_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    revoked: Mapped[bool] = mapped_column(Boolean, default=False)
+    created_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    created_by_user_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class InviteRequestArchive(Base):
+    __tablename__ = "invite_requests_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    created_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    name: Mapped[str] = mapped_column(String(120), default="")
+    email: Mapped[str] = mapped_column(String(255), index=True, nullable=False)
+    message: Mapped[str] = mapped_column(Text, default="")
+    handled: Mapped[bool] = mapped_column(Boolean, default=True)
+    handled_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    invite_code: Mapped[str] = mapped_column(String(32), default="")
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+# =========================
+# Retenção de notas por organização (opcional; sem linha = guarda tudo)
+# =========================
+class NoteRetentionPolicy(Base):
+    __tablename__ = "note_retention_policies"
+
+    organization_id: Mapped[int] = mapped_column(ForeignKey("organizations.id"), primary_key=True)
+    # notas de sessão mais antigas que isso são apagadas pelo agendador
+    note_days: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_by_user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True)
+
+
+# =========================
+# Agendador: lock entre workers e histórico de execuções
+# =========================
+class SchedulerLock(Base):
+    __tablename__ = "scheduler_locks"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    owner: Mapped[str] = mapped_column(String(120), default="")
+    # epoch (segundos): lock vale até aqui; last_run_at = início da última execução
+    locked_until: Mapped[float] = mapped_column(Float, default=0.0)
+    last_run_at: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+
+class SchedulerRun(Base):
+    __tablename__ = "scheduler_runs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    job: Mapped[str] = mapped_column(String(64), nullable=False)
+    owner: Mapped[str] = mapped_column(String(120), default="")
+    started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    duration_ms: Mapped[float] = mapped_column(Float, default=0.0)
+    status: Mapped[str] = mapped_column(String(16), default="ok")  # ok | error
+    # resumo em JSON (linhas movidas etc.) ou a mensagem de erro
+    details: Mapped[str] = mapped_column(Text, default="")
+
+
+def dedupe_pending_invite_requests(bind) -> int:
+    """
+    Antes de criar ux_invite_requests_pending_email num banco existente:
+    mantém só a solicitação pendente mais antiga de cada e-mail.
+    Devolve quantas linhas foram apagadas (0 se o índice já existe).
+    """
+    with bind.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_invite_requests_pending_email'"
+        ).first()
+        if exists:
+            return 0
+        return conn.exec_driver_sql(
+            "DELETE FROM invite_requests WHERE handled = 0 AND id NOT IN "
+            "(SELECT MIN(id) FROM invite_requests WHERE handled = 0 GROUP BY email)"
+        ).rowcount
@@ -0,0 +1,235 @@
+import hashlib
+import os
+import re
+import struct
+import time
+import unicodedata
+from typing import Iterable
+
+from sqlalchemy import and_, delete, exists, insert, select, union_all
+from sqlalchemy.orm import Session, aliased
+
+from .core import shards
+from .models import NormCard, NormCardBand
+
+# ==============================================================================
+# QUASE-DUPLICATAS DAS NORMAS (MinHash + LSH)
+#
+# - Texto do card (título + resumo) -> conjunto de trechos de 3 palavras ->
+#   assinatura MinHash de BANDS * ROWS números.
+# - LSH: a assinatura é cortada em BANDS faixas; cada faixa vira um balde
+#   (hash) gravado em norm_card_bands. Dois cards com Jaccard alto caem no
+#   mesmo balde em alguma faixa com alta probabilidade; os de Jaccard baixo
+#   quase nunca. Buscar candidatos = BANDS consultas de índice, sem comparar
+#   com todos os cards.
+# - Candidatos são conferidos com o Jaccard de verdade (>= THRESHOLD).
+# - Mantido junto com o card (criar/importar/apagar); a tarefa "indice_normas"
+#   indexa o que faltar (cards antigos).
+# ==============================================================================
+
+BANDS = int(os.getenv("NORM_DEDUPE_BANDS", "16"))
+ROWS = int(os.getenv("NORM_DEDUPE_ROWS", "4"))
+THRESHOLD = float(os.getenv("NORM_DEDUPE_THRESHOLD", "0.6"))
+# teto de pares candidatos lidos no relatório (baldes enormes = texto repetido demais)
+MAX_PAIRS = int(os.getenv("NORM_DEDUPE_MAX_PAIRS", "200000"))
+BACKFILL_BATCH = 500
+
+SHINGLE = 3
+NO_TEXT = -1  # band da linha-marcador "indexado, sem texto"
+
+# BANDS * ROWS funções de hash independentes: cada blake2b com sal diferente
+# devolve 16 delas de uma vez (64 bytes = 16 inteiros de 32 bits)
+_HASHES = BANDS * ROWS
+_HASHERS = [
+    hashlib.blake2b(digest_size=64, salt=i.to_bytes(16, "little"))
+    for i in range(-(-_HASHES // 16))
+]
+_UNPACK = struct.Struct("<16I").unpack
+
+_ORDINALS = str.maketrans("", "", "ºª°")
+
+
+def normalize_text(text: str) -> str:
+    # "nº", "n°" e "n" são a mesma coisa (o NFKD transformaria º em "o")
+    text = unicodedata.normalize("NFKD", (text or "").translate(_ORDINALS))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return re.sub(r"[\W_]+", " ", text).strip()
+
+
+def shingles(title: str, summary: str) -> set[str]:
+    words = normalize_text(f"{title} {summary}").split()
+    if len(words) < SHINGLE * 2:
+        # texto curto: palavras soltas comparam melhor que trechos
+        return set(words)
+    return {" ".join(words[i:i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def signature(sh: set[str]) -> list[int]:
+    """MinHash: para cada função de hash, o menor valor entre os trechos."""
+    values = []
+    for s in sh:
+        data = s.encode()
+        row = ()
+        for proto in _HASHERS:
+            h = proto.copy()
+            h.update(data)
+            row += _UNPACK(h.digest())
+        values.append(row)
+    # min por coluna (em C): coluna i = função de hash i
+    return [min(col) for col in zip(*values)][:_HASHES]
+
+
+def band_keys(sig: list[int]) -> list[tuple[int, int]]:
+    """(faixa, balde) de cada faixa; o balde é um inteiro de 64 bits com sinal (cabe no SQLite)."""
+    keys = []
+    for band in range(BANDS):
+        chunk = struct.pack(f"<{ROWS}I", *sig[band * ROWS:(band + 1) * ROWS])
+        keys.append((band, int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little", signed=True)))
+    return keys
+
+
+# ---------- manutenção do índice ----------
+def index_cards(s: Session, org_id: int, cards: Iterable[tuple[int, str, str]]) -> None:
+    """Indexa (id, título, resumo) na transação de `s`."""
+    rows = []
+    for card_id, title, summary in cards:
+        sh = shingles(title, summary)
+        keys = band_keys(signature(sh)) if sh else [(NO_TEXT, 0)]
+        rows.extend({"organization_id": org_id, "band": b, "bucket": k, "card_id": card_id} for b, k in keys)
+    if rows:
+        s.execute(insert(NormCardBand), rows)
+
+
+def unindex_cards(s: Session, card_ids: list[int]) -> None:
+    s.execute(
+        delete(NormCardBand).where(NormCardBand.card_id.in_(card_ids)).execution_options(synchronize_session=False)
+    )
+
+
+def backfill(org_id: int | None) -> int:
+    """Indexa os cards que ainda não estão no índice (criados antes dele). Devolve quantos."""
+    done = 0
+    while True:
+        s = shards.open_session(org_id)
+        try:
+            stmt = select(NormCard.id, NormCard.organization_id, NormCard.title, NormCard.practical_summary).where(
+                ~exists().where(NormCardBand.card_id == NormCard.id)
+            )
+            if org_id is not None:
+                stmt = stmt.where(NormCard.organization_id == org_id)
+            rows = s.execute(stmt.order_by(NormCard.id).limit(BACKFILL_BATCH)).all()
+            for org in {r.organization_id for r in rows}:
+                index_cards(s, org, [(r.id, r.title, r.practical_summary) for r in rows if r.organization_id == org])
+            s.commit()
+        finally:
+            s.close()
+        done += len(rows)
+        if len(rows) < BACKFILL_BATCH:
+            return done
+        time.sleep(0.02)
+
+
+# ---------- consultas ----------
+def suggest(db: Session, org_id: int, title: str, summary: str, limit: int = 10) -> list[dict]:
+    """Cards da organização parecidos com o texto (Jaccard >= THRESHOLD), do mais parecido ao menos."""
+    sh = shingles(title, summary)
+    if not sh:
+        return []
+    keys = band_keys(signature(sh))
+    # uma busca exata no índice por faixa (UNION ALL); com IN de tuplas ou OR,
+    # sem estatísticas o SQLite percorre todos os baldes da organização
+    candidates = sorted(set(db.execute(union_all(*(
+        select(NormCardBand.card_id).where(
+            NormCardBand.organization_id == org_id,
+            NormCardBand.band == band,
+            NormCardBand.bucket == bucket,
+        )
+        for band, bucket in keys
+    ))).scalars()))
+    if not candidates:
+        return []
+
+    out = []
+    for i in range(0, len(candidates), 500):
+        rows = db.execute(
+            select(NormCard.id, NormCard.title, NormCard.source, NormCard.practical_summary, NormCard.created_at)
+            .where(NormCard.organization_id == org_id, NormCard.id.in_(candidates[i:i + 500]))
+        ).all()
+        for r in rows:
+            score = jaccard(sh, shingles(r.title, r.practical_summary))
+            if score >= THRESHOLD:
+                out.append({
+                    "id": r.id,
+                    "title": r.title,
+                    "source": r.source,
+                    "summary": r.practical_summary,
+                    "created_at": r.created_at,
+                    "similarity": round(score, 3),
+                })
+    out.sort(key=lambda c: c["similarity"], reverse=True)
+    return out[:limit]
+
+
+def clusters(db: Session, org_id: int) -> dict:
+    """
+    Grupos de quase-duplicatas da organização.
+    Pares candidatos vêm do próprio índice (mesmo balde em alguma faixa);
+    só esses são conferidos, e pares já no mesmo grupo nem isso.
+    """
+    a, b = aliased(NormCardBand), aliased(NormCardBand)
+    pairs = db.execute(
+        select(a.card_id, b.card_id)
+        .join(b, and_(
+            b.organization_id == a.organization_id,
+            b.band == a.band,
+            b.bucket == a.bucket,
+            b.card_id > a.card_id,
+        ))
+        .where(a.organization_id == org_id, a.band >= 0)
+        .limit(MAX_PAIRS + 1)
+    ).all()
+    truncated = len(pairs) > MAX_PAIRS
+    # o mesmo par pode aparecer em várias faixas
+    pairs = list(dict.fromkeys(tuple(p) for p in pairs[:MAX_PAIRS]))
+
+    ids = sorted({i for p in pairs for i in p})
+    cards, sh = {}, {}
+    for i in range(0, len(ids), 500):
+        for r in db.execute(
+            select(NormCard.id, NormCard.title, NormCard.source, NormCard.practical_summary, NormCard.created_at)
+            .where(NormCard.organization_id == org_id, NormCard.id.in_(ids[i:i + 500]))
+        ):
+            cards[r.id] = r
+            sh[r.id] = shingles(r.title, r.practical_summary)
+
+    parent = {i: i for i in cards}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    checked = 0
+    for x, y in pairs:
+        if x not in cards or y not in cards:
+            continue
+        rx, ry = find(x), find(y)
+        if rx == ry:
+            continue
+        checked += 1
+        if jaccard(sh[x], sh[y]) >= THRESHOLD:
+            parent[max(rx, ry)] = min(rx, ry)
+
+    groups: dict[int, list] = {}
+    for i in cards:
+        groups.setdefault(find(i), []).append(cards[i])
+    out = [sorted(g, key=lambda r: r.id) for g in groups.values() if len(g) > 1]
+    out.sort(key=len, reverse=True)
+    return {"clusters": out, "pairs": len(pairs), "checked": checked, "truncated": truncated}
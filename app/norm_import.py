@@ -0,0 +1,207 @@
+import codecs
+import csv
+import hashlib
+import io
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import BinaryIO, Iterator
+
+from sqlalchemy import insert, select
+
+from .core.write_queue import run_write
+from .models import NormCard
+from .norm_dedupe import index_cards, normalize_text
+from .repositories import TenantRepo
+
+# ==============================================================================
+# IMPORTAÇÃO DE NORMAS EM LOTE (CSV ou JSON)
+#
+# - O arquivo é lido em streaming (linha a linha no CSV; objeto a objeto no
+#   JSON, seja lista ou um objeto por linha): nunca inteiro na memória.
+# - Duplicatas: chave = hash do (título, fonte) normalizados (sem acento,
+#   caixa, pontuação ou espaços extras), contra as normas já cadastradas e
+#   contra as linhas anteriores do próprio arquivo.
+# - Inserção em lotes de NORM_IMPORT_BATCH linhas, uma transação por lote
+#   (com o índice de quase-duplicatas, app/norm_dedupe.py).
+# ==============================================================================
+
+BATCH = int(os.getenv("NORM_IMPORT_BATCH", "200"))
+MAX_ROWS = int(os.getenv("NORM_IMPORT_MAX_ROWS", "20000"))
+
+_CHUNK = 64 * 1024
+
+# nomes aceitos no cabeçalho do CSV / nas chaves do JSON
+FIELDS = {
+    "title": ("title", "titulo", "título", "norma", "nome"),
+    "source": ("source", "fonte", "referencia", "referência", "link"),
+    "practical_summary": ("practical_summary", "resumo", "summary", "resumo_pratico", "resumo prático", "notas"),
+    "tags": ("tags", "etiquetas", "palavras-chave", "palavras_chave"),
+}
+_ALIASES = {alias: field for field, names in FIELDS.items() for alias in names}
+_LIMITS = {"title": 200, "source": 300, "tags": 300}
+
+
+class NormImportError(Exception):
+    pass
+
+
+@dataclass
+class RowResult:
+    line: int
+    status: str  # criada | duplicada | invalida
+    title: str = ""
+    reason: str = ""
+
+
+# ---------- chave de duplicata ----------
+def norm_key(title: str, source: str) -> bytes:
+    """Hash do (título, fonte) normalizados: 'Resolução CFP nº 9' == 'resolucao cfp n 9'."""
+    return hashlib.blake2b(f"{normalize_text(title)}\x1f{normalize_text(source)}".encode(), digest_size=16).digest()
+
+
+# ---------- leitura em streaming ----------
+def _encoding(raw: BinaryIO) -> str:
+    """UTF-8 ou, se o começo do arquivo não for, cp1252 (CSV salvo pelo Excel)."""
+    sample = raw.read(_CHUNK)
+    raw.seek(0)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return "cp1252"
+    return "utf-8-sig"
+
+
+def _iter_csv(raw: BinaryIO) -> Iterator[tuple[int, dict]]:
+    text = io.TextIOWrapper(raw, encoding=_encoding(raw), newline="")
+    sample = text.read(_CHUNK)
+    text.seek(0)
+    try:
+        # planilhas em português costumam sair com ';'
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(text, dialect=dialect)
+    if not reader.fieldnames:
+        raise NormImportError("CSV vazio.")
+    if not any(_ALIASES.get(h.strip().casefold()) == "title" for h in reader.fieldnames if h):
+        raise NormImportError("O CSV precisa de uma coluna 'titulo' (ou 'title').")
+    for row in reader:
+        yield reader.line_num, row
+    text.detach()
+
+
+def _iter_json(raw: BinaryIO) -> Iterator[tuple[int, dict]]:
+    """Lista JSON ([{...}, {...}]) ou um objeto por linha, decodificados um a um."""
+    text = io.TextIOWrapper(raw, encoding=_encoding(raw))
+    decoder = json.JSONDecoder()
+    buf, pos, item, eof = "", 0, 0, False
+    while True:
+        # pula espaços, vírgulas e os colchetes da lista
+        while pos < len(buf) and buf[pos] in " \t\r\n,[]":
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                break
+            buf, pos = text.read(_CHUNK), 0
+            eof = not buf
+            continue
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise NormImportError(f"JSON inválido perto do item {item + 1}.")
+            more = text.read(_CHUNK)
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+            continue
+        item += 1
+        pos = end
+        yield item, obj
+    text.detach()
+
+
+def _clean(obj) -> tuple[dict | None, str]:
+    if not isinstance(obj, dict):
+        return None, "item não é um objeto"
+    values = {field: "" for field in FIELDS}
+    for key, value in obj.items():
+        field = _ALIASES.get(str(key or "").strip().casefold())
+        if field and value is not None:
+            if isinstance(value, list):
+                value = ", ".join(str(v) for v in value)
+            values[field] = str(value).strip()
+    if not values["title"]:
+        return None, "sem título"
+    for field, limit in _LIMITS.items():
+        if len(values[field]) > limit:
+            return None, f"{field} passa de {limit} caracteres"
+    return values, ""
+
+
+# ---------- importação ----------
+def _existing_keys(repo: TenantRepo) -> set[bytes]:
+    stmt = (
+        select(NormCard.title, NormCard.source)
+        .where(NormCard.organization_id == repo.org_id)
+        .execution_options(yield_per=1000)
+    )
+    return {norm_key(t, s) for t, s in repo.db.execute(stmt)}
+
+
+def import_norms(repo: TenantRepo, raw: BinaryIO, filename: str = "") -> list[RowResult]:
+    """Importa normas de um CSV ou JSON; devolve o resultado de cada linha/item."""
+    is_json = filename.lower().endswith((".json", ".ndjson", ".jsonl"))
+    rows = _iter_json(raw) if is_json else _iter_csv(raw)
+
+    seen = _existing_keys(repo)
+    report: list[RowResult] = []
+    pending: list[dict] = []
+    org_id, user_id = repo.org_id, repo.user_id
+
+    def _flush():
+        if not pending:
+            return
+        batch = list(pending)
+        pending.clear()
+
+        def _insert(s):
+            ids = s.execute(insert(NormCard).returning(NormCard.id, sort_by_parameter_order=True), batch).scalars().all()
+            index_cards(s, org_id, [(i, r["title"], r["practical_summary"]) for i, r in zip(ids, batch)])
+
+        run_write(repo.db, _insert)
+
+    try:
+        for line, obj in rows:
+            if len(report) >= MAX_ROWS:
+                report.append(RowResult(line, "invalida", "", f"limite de {MAX_ROWS} linhas: o restante não foi lido"))
+                break
+            values, reason = _clean(obj)
+            if values is None:
+                title = str(obj.get("title") or obj.get("titulo") or "") if isinstance(obj, dict) else ""
+                report.append(RowResult(line, "invalida", title[:80], reason))
+                continue
+            key = norm_key(values["title"], values["source"])
+            if key in seen:
+                reason = "mesmo título e fonte de uma norma cadastrada ou de linha anterior"
+                report.append(RowResult(line, "duplicada", values["title"], reason))
+                continue
+            seen.add(key)
+            pending.append({
+                **values,
+                "organization_id": org_id,
+                "owner_id": user_id,
+                "created_at": datetime.utcnow(),
+            })
+            report.append(RowResult(line, "criada", values["title"]))
+            if len(pending) >= BATCH:
+                _flush()
+    except (NormImportError, UnicodeDecodeError, csv.Error) as e:
+        reason = str(e) if isinstance(e, NormImportError) else f"arquivo ilegível ({type(e).__name__})"
+        if not report:
+            raise NormImportError(reason)
+        # erro no meio do arquivo: o que veio antes fica, o resto não é lido
+        report.append(RowResult(len(report) + 1, "invalida", "", reason))
+    _flush()
+    return report
@@ -0,0 +1,321 @@
+import io
+import json
+import os
+import zipfile
+from contextlib import ExitStack
+from datetime import datetime
+from typing import BinaryIO, Iterator
+
+from sqlalchemy import DateTime, delete, insert, select
+
+from . import norm_dedupe
+from .core import shards
+from .core.database import SessionLocal, read_engine
+from .core.security import UNUSABLE_PASSWORD
+from .models import (
+    DocTemplate,
+    InviteCode,
+    InviteCodeIndex,
+    NormCard,
+    NormCardBand,
+    Organization,
+    SessionNote,
+    User,
+    generate_invite_codes,
+)
+
+# ==============================================================================
+# EXPORTAÇÃO / IMPORTAÇÃO DE UMA ORGANIZAÇÃO (ZIP com NDJSON)
+#
+# - Exportar: cada tabela é lida em blocos (yield_per) e vira uma entrada
+#   <tabela>.ndjson (uma linha JSON por registro) de um ZIP montado durante o
+#   download. Memória constante, qualquer que seja o tamanho da clínica.
+# - Importar: lê o mesmo ZIP linha a linha e insere em lotes, criando uma
+#   organização NOVA; ids são renumerados (usuários via mapa antigo -> novo).
+#   Se algo falhar no meio, o que já entrou é apagado.
+# - Hashes de senha só saem com include_password_hashes (CLI --com-senhas,
+#   para migrar a instância). Sem eles, os usuários importados ficam com uma
+#   senha que nenhum login aceita.
+# ==============================================================================
+
+FORMAT = 1
+EXPORT_BATCH = int(os.getenv("ORG_EXPORT_BATCH", "1000"))
+IMPORT_BATCH = int(os.getenv("ORG_IMPORT_BATCH", "500"))
+
+# ordem importa: usuários antes de quem aponta para eles
+TABLES = (
+    ("organizations", Organization),
+    ("users", User),
+    ("invite_codes", InviteCode),
+    ("session_notes", SessionNote),
+    ("norm_cards", NormCard),
+    ("doc_templates", DocTemplate),
+)
+# tabelas cujo dono (owner_id) precisa ser renumerado
+OWNED = ("session_notes", "norm_cards", "doc_templates")
+# colunas que só saem com include_password_hashes
+SECRET_COLUMNS = {"users": ("password_hash",)}
+
+
+class TransferError(Exception):
+    pass
+
+
+# ---------- exportação ----------
+class _Sink:
+    """Destino sem seek para o ZipFile: acumula bytes até o próximo drain()."""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _encode(row) -> str:
+    return json.dumps(
+        {k: v.isoformat() if isinstance(v, datetime) else v for k, v in row.items()},
+        ensure_ascii=False,
+    )
+
+
+def _org_filter(table, org_id: int):
+    return table.c.id == org_id if table.name == "organizations" else table.c.organization_id == org_id
+
+
+def export_org(org_id: int, include_password_hashes: bool = False) -> Iterator[bytes]:
+    """
+    Gera o ZIP em pedaços (para StreamingResponse ou arquivo).
+    Cada banco é lido numa transação só: retrato consistente do catálogo e,
+    com shards, do arquivo da organização.
+    Os hashes de senha ficam de fora, a não ser com include_password_hashes
+    (migração da instância pela linha de comando; nunca pelo download web).
+    """
+    sink = _Sink()
+    counts = {}
+    with ExitStack() as stack:
+        conns = {}
+
+        def _conn(table_name: str):
+            if shards.ENABLED and table_name in shards.SHARD_TABLES:
+                eng = shards.shard_engines.get(org_id, readonly=True)
+            else:
+                eng = read_engine
+            if eng not in conns:
+                conn = stack.enter_context(eng.connect())
+                # o leitor não abre transação sozinho; sem ela cada SELECT vê um momento diferente
+                conn.exec_driver_sql("BEGIN")
+                conns[eng] = conn
+            return conns[eng]
+
+        zf = stack.enter_context(zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED))
+        for name, model in TABLES:
+            table = model.__table__
+            hidden = () if include_password_hashes else SECRET_COLUMNS.get(name, ())
+            stmt = (
+                select(*[c for c in table.columns if c.name not in hidden])
+                .where(_org_filter(table, org_id))
+                .order_by(table.c.id)
+                .execution_options(yield_per=EXPORT_BATCH)
+            )
+            n = 0
+            with zf.open(f"{name}.ndjson", "w", force_zip64=True) as entry:
+                for part in _conn(name).execute(stmt).mappings().partitions():
+                    entry.write("".join(_encode(r) + "\n" for r in part).encode("utf-8"))
+                    n += len(part)
+                    yield sink.drain()
+            counts[name] = n
+
+        zf.writestr("manifest.json", json.dumps({
+            "format": FORMAT,
+            "organization_id": org_id,
+            "exported_at": datetime.utcnow().isoformat(),
+            "password_hashes": include_password_hashes,
+            "counts": counts,
+        }, indent=2))
+    yield sink.drain()
+
+
+# ---------- importação ----------
+def _rows(zf: zipfile.ZipFile, name: str) -> Iterator[list[dict]]:
+    """Lotes de IMPORT_BATCH registros, lidos em streaming da entrada do ZIP."""
+    try:
+        raw = zf.open(f"{name}.ndjson")
+    except KeyError:
+        raise TransferError(f"Arquivo sem {name}.ndjson.")
+    batch = []
+    with io.TextIOWrapper(raw, encoding="utf-8") as lines:
+        for lineno, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                batch.append(json.loads(line))
+            except ValueError:
+                raise TransferError(f"{name}.ndjson, linha {lineno}: JSON inválido.")
+            if len(batch) >= IMPORT_BATCH:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _decode(table, row: dict) -> dict:
+    """Só colunas conhecidas, sem o id antigo; datas de volta para datetime."""
+    out = {}
+    for col in table.columns:
+        if col.name == "id" or col.name not in row:
+            continue
+        value = row[col.name]
+        if value is not None and isinstance(col.type, DateTime):
+            value = datetime.fromisoformat(value)
+        out[col.name] = value
+    return out
+
+
+def _taken_codes(s, codes) -> set[str]:
+    col = InviteCodeIndex.code if shards.ENABLED else InviteCode.code
+    return set(s.execute(select(col).where(col.in_(codes))).scalars())
+
+
+def _purge(org_id: int) -> None:
+    """Desfaz uma importação que parou no meio."""
+    s = shards.open_session(org_id)
+    try:
+        for model in (DocTemplate, NormCardBand, NormCard, SessionNote, InviteCode, InviteCodeIndex, User):
+            s.execute(delete(model).where(model.organization_id == org_id))
+        s.execute(delete(Organization).where(Organization.id == org_id))
+        s.commit()
+    finally:
+        s.close()
+
+
+def import_org(source: str | BinaryIO, name: str | None = None) -> dict:
+    """
+    Importa um ZIP de export_org() como organização nova; devolve um resumo.
+    E-mails já cadastrados nesta instância impedem a importação (nada é gravado);
+    códigos de convite que já existem aqui são trocados por novos.
+    """
+    with zipfile.ZipFile(source) as zf:
+        try:
+            manifest = json.loads(zf.read("manifest.json"))
+        except (KeyError, ValueError):
+            raise TransferError("Arquivo sem manifest.json válido.")
+        if manifest.get("format") != FORMAT:
+            raise TransferError(f"Formato {manifest.get('format')!r} não suportado (esperado {FORMAT}).")
+
+        org_row = next((r for batch in _rows(zf, "organizations") for r in batch), None)
+        if not org_row:
+            raise TransferError("Arquivo sem organização.")
+        name = (name or org_row["name"]).strip()
+
+        # conferências antes de gravar qualquer coisa
+        db = SessionLocal()
+        try:
+            if db.execute(select(Organization.id).where(Organization.name == name)).first():
+                raise TransferError(f"Já existe uma organização chamada {name!r} (use outro nome).")
+            conflicts = []
+            for batch in _rows(zf, "users"):
+                emails = [r["email"] for r in batch]
+                conflicts += db.execute(select(User.email).where(User.email.in_(emails))).scalars().all()
+            if conflicts:
+                raise TransferError("E-mails já cadastrados nesta instância: " + ", ".join(sorted(conflicts)[:10]))
+
+            org = Organization(name=name, created_at=_decode(Organization.__table__, org_row).get("created_at"))
+            db.add(org)
+            db.commit()
+            org_id = org.id
+        finally:
+            db.close()
+
+        counts = {"organizations": 1}
+        renamed = 0
+        s = shards.open_session(org_id)
+        try:
+            # usuários: o único mapa de ids (pequeno); o resto só aponta para eles
+            user_map: dict[int, int] = {}
+            table = User.__table__
+            n = 0
+            without_password = 0
+            for batch in _rows(zf, "users"):
+                values = [{**_decode(table, r), "organization_id": org_id} for r in batch]
+                for v in values:
+                    if not v.get("password_hash"):
+                        # exportado sem senha: conta sem login até alguém definir uma senha
+                        v["password_hash"] = UNUSABLE_PASSWORD
+                        without_password += 1
+                new_ids = s.execute(
+                    insert(table).returning(table.c.id, sort_by_parameter_order=True), values
+                ).scalars().all()
+                user_map.update(zip((r["id"] for r in batch), new_ids))
+                s.commit()
+                n += len(batch)
+            counts["users"] = n
+
+            table = InviteCode.__table__
+            n = 0
+            for batch in _rows(zf, "invite_codes"):
+                values = [
+                    {
+                        **_decode(table, r),
+                        "organization_id": org_id,
+                        "created_by_user_id": user_map.get(r.get("created_by_user_id")),
+                    }
+                    for r in batch
+                ]
+                taken = _taken_codes(s, [v["code"] for v in values])
+                while taken:
+                    # código já usado nesta instância: sorteia outro
+                    fresh = iter(generate_invite_codes(len(taken)))
+                    for v in values:
+                        if v["code"] in taken:
+                            v["code"] = next(fresh)
+                            renamed += 1
+                    taken = _taken_codes(s, [v["code"] for v in values])
+                s.execute(insert(table), values)
+                if shards.ENABLED:
+                    s.execute(insert(InviteCodeIndex), [{"code": v["code"], "organization_id": org_id} for v in values])
+                s.commit()
+                n += len(batch)
+            counts["invite_codes"] = n
+
+            for tname, model in TABLES:
+                if tname not in OWNED:
+                    continue
+                table = model.__table__
+                n = 0
+                for batch in _rows(zf, tname):
+                    values = []
+                    for r in batch:
+                        owner = user_map.get(r.get("owner_id"))
+                        if owner is None:
+                            raise TransferError(f"{tname}: registro {r.get('id')} aponta para usuário ausente.")
+                        values.append({**_decode(table, r), "organization_id": org_id, "owner_id": owner})
+                    s.execute(insert(table), values)
+                    s.commit()
+                    n += len(batch)
+                counts[tname] = n
+            s.close()
+            # o índice de quase-duplicatas não vai no arquivo: é refeito aqui
+            norm_dedupe.backfill(org_id)
+        except Exception:
+            s.rollback()
+            s.close()
+            _purge(org_id)
+            raise
+
+    return {
+        "organization_id": org_id,
+        "name": name,
+        "counts": counts,
+        "codigos_trocados": renamed,
+        "usuarios_sem_senha": without_password,
+    }
@@ -0,0 +1,221 @@
+from datetime import datetime
+
+from sqlalchemy import select, update, delete, func, insert, lambda_stmt
+from sqlalchemy.orm import Session
+
+from .core import shards
+from .core.database import SessionLocal
+from .core.identity import Identity
+from .core.write_queue import run_write
+from .models import InviteCode, InviteCodeIndex, generate_invite_codes
+
+
+# =========================
+# Repositório por organização (tenant)
+# =========================
+def _where_eq(stmt, col, value):
+    # uma closure por filtro: no laço, todas as lambdas veriam o último col/value
+    return stmt + (lambda s: s.where(col == value))
+
+
+class TenantRepo:
+    """
+    Acesso aos dados de UMA organização.
+
+    - O filtro organization_id é aplicado em toda consulta (não dá pra esquecer).
+    - Leituras usam lambda_stmt: o SQL compilado fica em cache por formato de
+      consulta, sem remontar o select() a cada requisição.
+    - Escritas passam por run_write (fila de group commit, se ligada).
+    """
+
+    def __init__(self, db: Session, identity: Identity):
+        self.db = db
+        self.identity = identity
+
+    @property
+    def org_id(self) -> int:
+        return self.identity.org_id
+
+    @property
+    def user_id(self) -> int:
+        return self.identity.user_id
+
+    # ---------- leitura ----------
+    def _scoped(self, model, equals: dict):
+        org_id = self.org_id
+        stmt = lambda_stmt(lambda: select(model).where(model.organization_id == org_id))
+        for name, value in equals.items():
+            stmt = _where_eq(stmt, getattr(model, name), value)
+        return stmt
+
+    def list(self, model, *order_by, limit: int | None = None, **equals) -> list:
+        stmt = self._scoped(model, equals)
+        if order_by:
+            stmt += lambda s: s.order_by(*order_by)
+        if limit:
+            stmt += lambda s: s.limit(limit)
+        return self.db.execute(stmt).scalars().all()
+
+    def first_by(self, model, **equals):
+        stmt = self._scoped(model, equals)
+        stmt += lambda s: s.limit(1)
+        return self.db.execute(stmt).scalars().first()
+
+    def get(self, model, obj_id: int):
+        return self.first_by(model, id=obj_id)
+
+    def count(self, model, **equals) -> int:
+        org_id = self.org_id
+        stmt = lambda_stmt(
+            lambda: select(func.count()).select_from(model).where(model.organization_id == org_id)
+        )
+        for name, value in equals.items():
+            stmt = _where_eq(stmt, getattr(model, name), value)
+        return self.db.execute(stmt).scalar_one()
+
+    def distinct(self, column, exclude=None) -> list:
+        """Valores distintos de uma coluna (ordenados), opcionalmente sem `exclude`."""
+        model = column.class_
+        org_id = self.org_id
+        stmt = lambda_stmt(lambda: select(column).where(model.organization_id == org_id))
+        if exclude is not None:
+            stmt += lambda s: s.where(column != exclude)
+        stmt += lambda s: s.distinct().order_by(column.asc())
+        return self.db.execute(stmt).scalars().all()
+
+    # ---------- escrita ----------
+    def add(self, obj) -> int | None:
+        """Grava obj na organização atual (e com o usuário atual como dono)."""
+        obj.organization_id = self.org_id
+        if hasattr(obj, "owner_id") and obj.owner_id is None:
+            obj.owner_id = self.user_id
+
+        def _add(s):
+            s.add(obj)
+            s.flush()
+            return obj.id
+
+        return run_write(self.db, _add)
+
+    def update(self, model, obj_id: int, **values) -> bool:
+        stmt = (
+            update(model)
+            .where(model.id == obj_id, model.organization_id == self.org_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        return bool(run_write(self.db, lambda s: s.execute(stmt).rowcount))
+
+    def delete(self, model, obj_id: int) -> bool:
+        stmt = (
+            delete(model)
+            .where(model.id == obj_id, model.organization_id == self.org_id)
+            .execution_options(synchronize_session=False)
+        )
+        return bool(run_write(self.db, lambda s: s.execute(stmt).rowcount))
+
+
+# =========================
+# Convites em lote
+# =========================
+INVITE_BATCH = 500
+
+
+def _draw_codes(s: Session, count: int, taken_col) -> list[str]:
+    """Sorteia `count` códigos que não estão em `taken_col` (uma consulta por lote)."""
+    codes: list[str] = []
+    while len(codes) < count:
+        wanted = min(INVITE_BATCH, count - len(codes))
+        candidates = set(generate_invite_codes(wanted))
+        taken = set(s.execute(select(taken_col).where(taken_col.in_(candidates))).scalars())
+        codes.extend(sorted(candidates - taken - set(codes)))
+    return codes
+
+
+def insert_invite_codes(
+    s: Session,
+    org_id: int,
+    count: int = 0,
+    role: str = "member",
+    max_uses: int | None = 1,
+    expires_at: datetime | None = None,
+    created_by_user_id: int | None = None,
+    codes: list[str] | None = None,
+) -> list[str]:
+    """
+    Cria `count` convites na transação de `s` e devolve os códigos.
+
+    Sorteia em lotes; cada lote custa UMA consulta (code IN (...)) para
+    descartar colisões e um INSERT em lote (executemany). Roda dentro da
+    transação de escrita, então ninguém grava o mesmo código no meio.
+    Com `codes`, grava esses (já reservados no catálogo, ver create_invites).
+    """
+    if codes is None:
+        codes = _draw_codes(s, count, InviteCode.code)
+    now = datetime.utcnow()
+    for i in range(0, len(codes), INVITE_BATCH):
+        s.execute(insert(InviteCode), [
+            {
+                "code": code,
+                "organization_id": org_id,
+                "role": role,
+                "max_uses": max_uses,
+                "uses": 0,
+                "expires_at": expires_at,
+                "revoked": False,
+                "created_at": now,
+                "created_by_user_id": created_by_user_id,
+            }
+            for code in codes[i:i + INVITE_BATCH]
+        ])
+    return codes
+
+
+def reserve_invite_codes(s: Session, org_id: int, count: int) -> list[str]:
+    """Com shards: sorteia e grava no invite_code_index (catálogo) códigos únicos entre todas as orgs."""
+    codes = _draw_codes(s, count, InviteCodeIndex.code)
+    for i in range(0, len(codes), INVITE_BATCH):
+        s.execute(insert(InviteCodeIndex), [{"code": c, "organization_id": org_id} for c in codes[i:i + INVITE_BATCH]])
+    return codes
+
+
+def store_reserved_codes(db: Session, org_id: int, codes: list[str], undo=None, **fields) -> None:
+    """
+    Segunda metade com shards: grava no shard os convites já reservados no
+    catálogo. Se falhar, desfaz a reserva (e o que `undo(s)` fizer no
+    catálogo) e relança: não sobra código no índice sem convite no shard.
+    """
+    try:
+        run_write(db, lambda s: insert_invite_codes(s, org_id, codes=codes, **fields))
+    except BaseException:
+        catalog = SessionLocal()
+        try:
+            def _release(s):
+                s.execute(delete(InviteCodeIndex).where(InviteCodeIndex.code.in_(codes)))
+                if undo is not None:
+                    undo(s)
+
+            run_write(catalog, _release)
+        finally:
+            catalog.close()
+        raise
+
+
+def create_invites(db: Session, org_id: int, count: int, **fields) -> list[str]:
+    """
+    Cria `count` convites (com commit) e devolve os códigos.
+
+    Sem shards é uma transação só. Com shards, índice (catálogo) e convites
+    (shard) estão em arquivos diferentes: primeiro reserva os códigos no
+    catálogo, onde fica a unicidade global, depois grava no shard; se o shard
+    falhar, a reserva é desfeita (store_reserved_codes).
+    """
+    if not shards.ENABLED:
+        return run_write(db, lambda s: insert_invite_codes(s, org_id, count, **fields))
+    catalog = SessionLocal()
+    try:
+        codes = run_write(catalog, lambda s: reserve_invite_codes(s, org_id, count))
+    finally:
+        catalog.close()
+    store_reserved_codes(db, org_id, codes, **fields)
+    return codes
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import FileResponse, Response
+
+from ..core.assets import CACHE_CONTROL, URL_PREFIX, choose_variant, manifest
+
+router = APIRouter(tags=["Arquivos estáticos"])
+
+
+@router.api_route(URL_PREFIX + "/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def fingerprinted_asset(path: str, request: Request):
+    """
+    Arquivo de app/static pela URL com hash (ver app/core/assets.py).
+    A URL muda quando o conteúdo muda, então o navegador guarda por um ano sem revalidar.
+    """
+    asset = manifest.lookup(path)
+    if asset is None:
+        # hash antigo (deploy novo) ou nome inventado: nada de cache longo
+        return Response(status_code=404, headers={"Cache-Control": "no-store"})
+
+    encoding, file = choose_variant(asset, request.headers.get("accept-encoding", ""))
+    etag = f'"{asset.digest}-{encoding}"' if encoding else f'"{asset.digest}"'
+    headers = {"Cache-Control": CACHE_CONTROL, "ETag": etag}
+    if asset.variants:
+        headers["Vary"] = "Accept-Encoding"
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return FileResponse(file, media_type=asset.media_type, headers=headers)
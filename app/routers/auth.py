@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Request, Form
+from fastapi import APIRouter, Request, Form, Depends
 from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
 from werkzeug.security import check_password_hash
 
 from ..core.config import settings
 from ..core.database import SessionLocal
+from ..core.identity import identity_cache
+from ..core.ratelimit import RateLimit
 from ..models import User
 
 router = APIRouter()
@@ -23,7 +25,7 @@ def login_page(request: Request):
     )
 
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(RateLimit("login"))])
 def login(
     request: Request,
     email: str = Form(...),
@@ -62,6 +64,7 @@ def login(
         request.session["user_email"] = user.email
         request.session["org_id"] = user.organization_id
         request.session["role"] = user.role or "member"
+        identity_cache.invalidate(user.id)
 
         return RedirectResponse(url="/", status_code=303)
 
@@ -71,5 +74,8 @@ def login(
 
 @router.get("/logout")
 def logout(request: Request):
+    user_id = request.session.get("user_id")
+    if user_id:
+        identity_cache.invalidate(user_id)
     request.session.clear()
     return RedirectResponse(url="/login", status_code=303)
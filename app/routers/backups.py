@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Request, Form, Depends
+from fastapi.responses import RedirectResponse
+from fastapi.templating import Jinja2Templates
+
+from .. import maintenance  # noqa: F401 - registra a tarefa "backup" no agendador
+from ..core import backup
+from ..core.identity import Identity
+from ..core.scheduler import scheduler
+from ..deps import require_admin_user
+
+router = APIRouter(tags=["Backups"])
+templates = Jinja2Templates(directory="app/templates")
+
+# Sem rota de download: o backup tem os dados de todas as organizações.
+
+
+def _page(request: Request, restored: str | None = None, error: str | None = None):
+    runs = scheduler.history(10, job="backup")
+    return templates.TemplateResponse(
+        "admin_backups.html",
+        {
+            "request": request,
+            "backups": backup.list_backups(),
+            "restores": backup.list_restores(),
+            "runs": runs,
+            "backup_dir": backup.BACKUP_DIR,
+            "keep": backup.KEEP,
+            "restored": restored,
+            "error": error,
+        },
+    )
+
+
+@router.get("/admin/backups")
+def backups_page(request: Request, user: Identity = Depends(require_admin_user)):
+    return _page(request)
+
+
+@router.post("/admin/backups/agora")
+def backup_now(user: Identity = Depends(require_admin_user)):
+    # em segundo plano e com o lock do agendador: dois cliques não geram dois backups
+    scheduler.run_in_background("backup")
+    return RedirectResponse("/admin/backups", status_code=303)
+
+
+@router.post("/admin/backups/restaurar")
+def restore_backup(request: Request, name: str = Form(...), user: Identity = Depends(require_admin_user)):
+    try:
+        path = backup.restore(name)
+    except backup.BackupError as e:
+        return _page(request, error=str(e))
+    return _page(request, restored=path)
@@ -1,48 +1,39 @@
 import os
+import time
 from datetime import datetime
 
 from fastapi import APIRouter, Request, Form, Depends
 from fastapi.responses import RedirectResponse, FileResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
 from fpdf import FPDF
 
-from ..deps import get_db, require_auth
+from ..core import metrics
+from ..core.identity import Identity
+from ..deps import get_repo, require_user
 from ..models import DocTemplate
+from ..repositories import TenantRepo
 
 router = APIRouter(prefix="/documentos", tags=["Documentos"])
 templates = Jinja2Templates(directory="app/templates")
 
-# Pasta para PDFs/TXTs gerados
-GENERATED_DIR = os.path.join(
-    os.path.dirname(os.path.dirname(__file__)), "data", "generated"
+# Pasta para PDFs/TXTs gerados (bench/loadtest apontam para uma pasta temporária)
+GENERATED_DIR = os.getenv(
+    "GENERATED_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "generated"),
 )
 os.makedirs(GENERATED_DIR, exist_ok=True)
 
-
-def _org_id(request: Request) -> int | None:
-    return request.session.get("org_id")
-
-
-def _user_id(request: Request) -> int | None:
-    return request.session.get("user_id")
+PDF_RENDERS = metrics.counter(
+    "setting_pdf_renders_total", "PDFs gerados.", ("tipo",)
+)
+PDF_RENDER_TIME = metrics.histogram(
+    "setting_pdf_render_seconds", "Tempo para gerar um PDF."
+)
 
 
 @router.get("")
-def docs_home(request: Request, db: Session = Depends(get_db)):
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-
-    org_id = _org_id(request)
-    if not org_id:
-        return RedirectResponse(url="/logout", status_code=303)
-
-    docs = (
-        db.query(DocTemplate)
-        .filter(DocTemplate.organization_id == org_id)
-        .order_by(DocTemplate.created_at.desc())
-        .all()
-    )
+def docs_home(request: Request, repo: TenantRepo = Depends(get_repo)):
+    docs = repo.list(DocTemplate, DocTemplate.created_at.desc())
 
     return templates.TemplateResponse(
         "documents.html",
@@ -55,25 +46,9 @@ def add_doc(
     request: Request,
     name: str = Form(...),
     body: str = Form(""),
-    db: Session = Depends(get_db),
+    repo: TenantRepo = Depends(get_repo),
 ):
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-
-    org_id = _org_id(request)
-    user_id = _user_id(request)
-    if not org_id or not user_id:
-        return RedirectResponse(url="/logout", status_code=303)
-
-    db.add(
-        DocTemplate(
-            name=name.strip(),
-            body=body,
-            owner_id=user_id,
-            organization_id=org_id,
-        )
-    )
-    db.commit()
+    repo.add(DocTemplate(name=name.strip(), body=body))
     return RedirectResponse(url="/documentos", status_code=303)
 
 
@@ -83,24 +58,9 @@ def update_doc(
     doc_id: int = Form(...),
     name: str = Form(...),
     body: str = Form(""),
-    db: Session = Depends(get_db),
+    repo: TenantRepo = Depends(get_repo),
 ):
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-
-    org_id = _org_id(request)
-    if not org_id:
-        return RedirectResponse(url="/logout", status_code=303)
-
-    obj = (
-        db.query(DocTemplate)
-        .filter(DocTemplate.id == doc_id, DocTemplate.organization_id == org_id)
-        .first()
-    )
-    if obj:
-        obj.name = name.strip()
-        obj.body = body
-        db.commit()
+    repo.update(DocTemplate, doc_id, name=name.strip(), body=body)
 
     return RedirectResponse(url="/documentos", status_code=303)
 
@@ -109,23 +69,9 @@ def update_doc(
 def delete_doc(
     request: Request,
     doc_id: int = Form(...),
-    db: Session = Depends(get_db),
+    repo: TenantRepo = Depends(get_repo),
 ):
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-
-    org_id = _org_id(request)
-    if not org_id:
-        return RedirectResponse(url="/logout", status_code=303)
-
-    obj = (
-        db.query(DocTemplate)
-        .filter(DocTemplate.id == doc_id, DocTemplate.organization_id == org_id)
-        .first()
-    )
-    if obj:
-        db.delete(obj)
-        db.commit()
+    repo.delete(DocTemplate, doc_id)
 
     return RedirectResponse(url="/documentos", status_code=303)
 
@@ -142,23 +88,12 @@ def render_doc(
     pagamento_regras: str = Form(""),
     reagendamento_regras: str = Form(""),
     janela_contato: str = Form(""),
-    db: Session = Depends(get_db),
+    repo: TenantRepo = Depends(get_repo),
 ):
     """
     Renderiza uma página HTML com o texto preenchido (para copiar).
     """
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-
-    org_id = _org_id(request)
-    if not org_id:
-        return RedirectResponse(url="/logout", status_code=303)
-
-    obj = (
-        db.query(DocTemplate)
-        .filter(DocTemplate.id == doc_id, DocTemplate.organization_id == org_id)
-        .first()
-    )
+    obj = repo.get(DocTemplate, doc_id)
     if not obj:
         return RedirectResponse(url="/documentos", status_code=303)
 
@@ -195,23 +130,12 @@ def render_doc_txt(
     pagamento_regras: str = Form(""),
     reagendamento_regras: str = Form(""),
     janela_contato: str = Form(""),
-    db: Session = Depends(get_db),
+    repo: TenantRepo = Depends(get_repo),
 ):
     """
     Baixa um .txt preenchido a partir de um DocTemplate (modelo criado pelo usuário).
     """
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-
-    org_id = _org_id(request)
-    if not org_id:
-        return RedirectResponse(url="/logout", status_code=303)
-
-    obj = (
-        db.query(DocTemplate)
-        .filter(DocTemplate.id == doc_id, DocTemplate.organization_id == org_id)
-        .first()
-    )
+    obj = repo.get(DocTemplate, doc_id)
     if not obj:
         return RedirectResponse(url="/documentos", status_code=303)
 
@@ -254,10 +178,8 @@ def gerar_documento_txt(
     crp: str = Form(""),
     cidade_uf: str = Form(""),
     data_emissao: str = Form(""),
+    user: Identity = Depends(require_user),
 ):
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-
     paciente = paciente.strip() or "__________"
     profissional = profissional.strip() or "__________"
     crp = crp.strip() or "__________"
@@ -384,11 +306,8 @@ def gerar_documento_pdf(
     crp: str = Form(""),
     cidade_uf: str = Form(""),
     data_emissao: str = Form(""),
-    db: Session = Depends(get_db),
+    user: Identity = Depends(require_user),
 ):
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-
     paciente = paciente.strip() or "__________"
     profissional = profissional.strip() or "__________"
     crp = crp.strip() or "__________"
@@ -446,6 +365,9 @@ def gerar_documento_pdf(
         download_name = "Recibo_Setting.pdf"
 
     else:
+        # qualquer outro valor gera a declaração; o rótulo da métrica segue o que foi
+        # gerado (senão cada valor enviado no formulário abriria uma série em /metrics)
+        tipo = "declaracao"
         titulo = "DECLARAÇÃO DE COMPARECIMENTO"
         corpo = (
             f"Declaro, para os devidos fins, que {paciente} compareceu a atendimento psicológico na data de {data_emissao}.\n\n"
@@ -453,6 +375,7 @@ def gerar_documento_pdf(
         )
         download_name = "Declaracao_Comparecimento_Setting.pdf"
 
+    t0 = time.perf_counter()
     path = criar_pdf_documento(
         titulo=titulo,
         corpo=corpo,
@@ -461,5 +384,7 @@ def gerar_documento_pdf(
         cidade_uf=cidade_uf,
         data_emissao=data_emissao,
     )
+    PDF_RENDER_TIME.observe(time.perf_counter() - t0)
+    PDF_RENDERS.inc(tipo=tipo)
 
     return FileResponse(path, filename=download_name, media_type="application/pdf")
@@ -0,0 +1,84 @@
+import hmac
+import os
+import time
+
+from anyio import to_thread
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
+
+from ..core import metrics
+from ..core.database import engine, read_engine
+
+router = APIRouter(tags=["Saúde"])
+
+# /metrics exige "Authorization: Bearer <METRICS_TOKEN>"; sem token definido
+# a rota não existe (as métricas mostram tráfego, backups e agendador)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+THREADPOOL_BUSY = metrics.gauge(
+    "setting_threadpool_busy_threads", "Threads do pool de rotas síncronas em uso."
+)
+THREADPOOL_SIZE = metrics.gauge(
+    "setting_threadpool_size", "Tamanho do pool de threads de rotas síncronas."
+)
+THREADPOOL_WAITING = metrics.gauge(
+    "setting_threadpool_waiting_tasks", "Tarefas esperando uma thread livre."
+)
+READY_DB_LATENCY = metrics.gauge(
+    "setting_ready_db_latency_seconds", "Latência do último ping de prontidão.", ("engine",)
+)
+
+
+def _sample_threadpool() -> None:
+    limiter = to_thread.current_default_thread_limiter()
+    stats = limiter.statistics()
+    THREADPOOL_BUSY.set(stats.borrowed_tokens)
+    THREADPOOL_SIZE.set(stats.total_tokens)
+    THREADPOOL_WAITING.set(stats.tasks_waiting)
+
+
+def _ping(eng) -> float:
+    t0 = time.perf_counter()
+    with eng.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return time.perf_counter() - t0
+
+
+@router.get("/health")
+async def health():
+    """Liveness: o processo está de pé (sem tocar no banco)."""
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready():
+    """Readiness: consegue falar com o banco (escrita e leitura)?"""
+    checks, ok = {}, True
+    for name, eng in (("write", engine), ("read", read_engine)):
+        try:
+            latency = await run_in_threadpool(_ping, eng)
+            READY_DB_LATENCY.set(latency, engine=name)
+            checks[name] = {"ok": True, "latency_ms": round(latency * 1000, 2)}
+        except Exception as e:  # noqa: BLE001
+            ok = False
+            checks[name] = {"ok": False, "error": type(e).__name__}
+    return JSONResponse(
+        {"status": "ok" if ok else "unavailable", "db": checks},
+        status_code=200 if ok else 503,
+    )
+
+
+@router.get("/metrics")
+async def metrics_endpoint(request: Request):
+    if not METRICS_TOKEN:
+        return PlainTextResponse("not found\n", status_code=404)
+    given = request.headers.get("authorization", "").encode()
+    if not hmac.compare_digest(given, f"Bearer {METRICS_TOKEN}".encode()):
+        return PlainTextResponse("forbidden\n", status_code=403)
+    _sample_threadpool()
+    return PlainTextResponse(
+        metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
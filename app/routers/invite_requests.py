@@ -3,23 +3,23 @@ from datetime import datetime, timedelta
 from fastapi import APIRouter, Request, Form, Depends
 from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
-from ..deps import get_db, require_auth, require_admin
-from ..models import InviteRequest, InviteCode, generate_invite_code
+from ..core import shards
+from ..core.database import SessionLocal
+from ..core.invite_filter import invite_filter
+from ..core.ratelimit import RateLimit
+from ..core.write_queue import run_write
+from ..deps import get_db, get_admin_repo
+from ..models import InviteRequest
+from ..repositories import TenantRepo, insert_invite_codes, reserve_invite_codes, store_reserved_codes
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
 
-def _org_id(request: Request) -> int | None:
-    return request.session.get("org_id")
-
-
-def _user_id(request: Request) -> int | None:
-    return request.session.get("user_id")
-
-
 # -------------------------
 # Público: solicitar convite
 # -------------------------
@@ -31,7 +31,7 @@ def request_invite_page(request: Request):
     )
 
 
-@router.post("/solicitar-convite")
+@router.post("/solicitar-convite", dependencies=[Depends(RateLimit("solicitar_convite"))])
 def request_invite_submit(
     request: Request,
     name: str = Form(""),
@@ -49,21 +49,22 @@ def request_invite_submit(
             {"request": request, "error": "Informe um e-mail válido."},
         )
 
-    # ✅ Anti-spam: evita várias solicitações pendentes do mesmo e-mail
-    existing = (
-        db.query(InviteRequest)
-        .filter(InviteRequest.email == email, InviteRequest.handled == False)  # noqa: E712
-        .first()
-    )
-    if existing:
-        # Mantém UX: "pedido enviado" sem criar duplicata
-        return templates.TemplateResponse(
-            "request_invite_done.html",
-            {"request": request, "email": email},
+    # ✅ Anti-spam: no máximo uma solicitação pendente por e-mail.
+    # Um único INSERT ... ON CONFLICT DO NOTHING sobre o índice parcial
+    # (se já existir, mantém UX: "pedido enviado" sem criar duplicata)
+    stmt = (
+        sqlite_insert(InviteRequest)
+        .values(name=name, email=email, message=message, handled=False, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(
+            index_elements=[InviteRequest.email],
+            index_where=InviteRequest.handled == False,  # noqa: E712
         )
+    )
 
-    db.add(InviteRequest(name=name, email=email, message=message))
-    db.commit()
+    def _submit(s):
+        s.execute(stmt)
+
+    run_write(db, _submit)
 
     return templates.TemplateResponse(
         "request_invite_done.html",
@@ -74,26 +75,117 @@ def request_invite_submit(
 # -------------------------
 # Admin: ver solicitações
 # -------------------------
+PAGE_SIZE = 50
+BULK_MAX = 200
+STATUS_VIEWS = {"pendentes": False, "atendidas": True}
+
+
 @router.get("/admin/solicitacoes")
-def admin_requests(request: Request, db: Session = Depends(get_db)):
-    if not require_auth(request):
-        return RedirectResponse("/login", status_code=303)
-    if not require_admin(request):
-        return RedirectResponse("/", status_code=303)
-
-    reqs = (
-        db.query(InviteRequest)
-        .order_by(InviteRequest.created_at.desc())
-        .limit(100)
-        .all()
-    )
+def admin_requests(
+    request: Request,
+    status: str = "pendentes",
+    antes: int | None = None,
+    repo: TenantRepo = Depends(get_admin_repo),
+):
+    """
+    Fila pendente (padrão) ou atendidas, da mais nova para a mais antiga.
+    Paginação por keyset (?antes=<id>): usa o índice (handled, id), sem OFFSET.
+    """
+    # solicitações não pertencem a uma organização (vêm do formulário público)
+    db = repo.db
+    if status not in STATUS_VIEWS:
+        status = "pendentes"
+    handled = STATUS_VIEWS[status]
+
+    stmt = select(InviteRequest).where(InviteRequest.handled == handled)
+    if antes:
+        stmt = stmt.where(InviteRequest.id < antes)
+    rows = db.execute(stmt.order_by(InviteRequest.id.desc()).limit(PAGE_SIZE + 1)).scalars().all()
+
+    next_before = rows[PAGE_SIZE - 1].id if len(rows) > PAGE_SIZE else None
+    pending = db.execute(
+        select(func.count()).select_from(InviteRequest).where(InviteRequest.handled == False)  # noqa: E712
+    ).scalar_one()
 
     return templates.TemplateResponse(
         "admin_requests.html",
-        {"request": request, "reqs": reqs},
+        {
+            "request": request,
+            "reqs": rows[:PAGE_SIZE],
+            "status": status,
+            "next_before": next_before,
+            "first_page": not antes,
+            "pending": pending,
+        },
     )
 
 
+def _approve(db, org_id: int, user_id: int, ids: list[int], role: str, max_uses: int, expires_days: int) -> list[str]:
+    """
+    Gera um convite para cada solicitação pendente em `ids` (com commit).
+    Sem shards é uma transação só. Com shards, as solicitações e o índice de
+    códigos ficam no catálogo e os convites no shard: o catálogo vai primeiro
+    (marca as solicitações e reserva os códigos juntos) e é desfeito se o
+    shard falhar, para não sobrar solicitação atendida sem convite.
+    """
+    fields = {
+        "role": role,
+        "max_uses": max_uses,
+        "expires_at": datetime.utcnow() + timedelta(days=expires_days),
+        "created_by_user_id": user_id,
+    }
+
+    def _claim(s) -> list[str]:
+        pending = s.execute(
+            select(InviteRequest.id)
+            .where(InviteRequest.id.in_(ids), InviteRequest.handled == False)  # noqa: E712
+            .order_by(InviteRequest.id)
+        ).scalars().all()
+        if not pending:
+            return []
+        if shards.ENABLED:
+            codes = reserve_invite_codes(s, org_id, len(pending))
+        else:
+            codes = insert_invite_codes(s, org_id, len(pending), **fields)
+        now = datetime.utcnow()
+        # UPDATE em lote por chave primária (executemany)
+        s.execute(
+            update(InviteRequest),
+            [{"id": rid, "handled": True, "handled_at": now, "invite_code": code} for rid, code in zip(pending, codes)],
+        )
+        return codes
+
+    if not shards.ENABLED:
+        return run_write(db, _claim)
+
+    catalog = SessionLocal()
+    try:
+        codes = run_write(catalog, _claim)
+    finally:
+        catalog.close()
+    if codes:
+        def _reopen(s):
+            s.execute(
+                update(InviteRequest)
+                .where(InviteRequest.invite_code.in_(codes))
+                .values(handled=False, handled_at=None, invite_code="")
+                .execution_options(synchronize_session=False)
+            )
+
+        store_reserved_codes(db, org_id, codes, undo=_reopen, **fields)
+    return codes
+
+
+def _reject(s, ids: list[int]) -> int:
+    """Marca como atendidas, sem convite (recusadas)."""
+    return s.execute(
+        update(InviteRequest)
+        .where(InviteRequest.id.in_(ids), InviteRequest.handled == False)  # noqa: E712
+        .values(handled=True, handled_at=datetime.utcnow(), invite_code="")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
 # -------------------------
 # Admin: aprovar (gera convite)
 # -------------------------
@@ -104,45 +196,35 @@ def approve_request(
     expires_days: int = Form(7),
     max_uses: int = Form(1),
     role: str = Form("member"),
-    db: Session = Depends(get_db),
+    repo: TenantRepo = Depends(get_admin_repo),
 ):
-    if not require_auth(request):
-        return RedirectResponse("/login", status_code=303)
-    if not require_admin(request):
-        return RedirectResponse("/", status_code=303)
-
-    org_id = _org_id(request)
-    user_id = _user_id(request)
-    if not org_id or not user_id:
-        return RedirectResponse("/logout", status_code=303)
-
-    req = db.query(InviteRequest).filter(InviteRequest.id == request_id).first()
-    if not req:
-        return RedirectResponse("/admin/solicitacoes", status_code=303)
-
-    # ✅ Se já estiver atendida, não gerar outro convite
-    if req.handled and req.invite_code:
-        return RedirectResponse("/admin/solicitacoes", status_code=303)
-
-    code = generate_invite_code(10)
-    expires_at = datetime.utcnow() + timedelta(days=expires_days)
-
-    inv = InviteCode(
-        code=code,
-        organization_id=org_id,
-        role=role,
-        max_uses=max_uses,
-        uses=0,
-        expires_at=expires_at,
-        revoked=False,
-        created_by_user_id=user_id,
-    )
-    db.add(inv)
+    # ✅ Se já estiver atendida, não gera outro convite (_approve só pega pendentes)
+    codes = _approve(repo.db, repo.org_id, repo.user_id, [request_id], role, max_uses, expires_days)
+    for code in codes:
+        invite_filter.add(code)
+
+    return RedirectResponse("/admin/solicitacoes", status_code=303)
 
-    req.handled = True
-    req.handled_at = datetime.utcnow()
-    req.invite_code = code
 
-    db.commit()
+# -------------------------
+# Admin: aprovar / recusar em lote
+# -------------------------
+@router.post("/admin/solicitacoes/lote")
+def bulk_requests(
+    request: Request,
+    acao: str = Form(...),
+    request_ids: list[int] = Form([]),
+    expires_days: int = Form(7),
+    max_uses: int = Form(1),
+    role: str = Form("member"),
+    repo: TenantRepo = Depends(get_admin_repo),
+):
+    ids = request_ids[:BULK_MAX]
+    if ids and acao == "aprovar":
+        codes = _approve(repo.db, repo.org_id, repo.user_id, ids, role, max_uses, expires_days)
+        for code in codes:
+            invite_filter.add(code)
+    elif ids and acao == "recusar":
+        run_write(repo.db, lambda s: _reject(s, ids))
 
     return RedirectResponse("/admin/solicitacoes", status_code=303)
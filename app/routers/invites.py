@@ -1,44 +1,26 @@
+import csv
+import io
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Request, Form, Depends
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
 
-from ..deps import get_db, require_auth, require_admin
-from ..models import InviteCode, generate_invite_code
+from ..core.invite_filter import invite_filter
+from ..deps import get_admin_repo
+from ..models import InviteCode
+from ..repositories import TenantRepo, create_invites
 
 router = APIRouter(prefix="/invites", tags=["Convites"])
 templates = Jinja2Templates(directory="app/templates")
 
-
-def _org_id(request: Request) -> int | None:
-    return request.session.get("org_id")
-
-
-def _user_id(request: Request) -> int | None:
-    return request.session.get("user_id")
+# teto por envio do formulário em lote (uma transação)
+BULK_MAX = 1000
 
 
 @router.get("")
-def invites_home(request: Request, db: Session = Depends(get_db)):
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-
-    if not require_admin(request):
-        return RedirectResponse(url="/", status_code=303)
-
-    org_id = _org_id(request)
-    if not org_id:
-        return RedirectResponse(url="/logout", status_code=303)
-
-    invites = (
-        db.query(InviteCode)
-        .filter(InviteCode.organization_id == org_id)
-        .order_by(InviteCode.created_at.desc())
-        .limit(50)
-        .all()
-    )
+def invites_home(request: Request, repo: TenantRepo = Depends(get_admin_repo)):
+    invites = repo.list(InviteCode, InviteCode.created_at.desc(), limit=50)
 
     return templates.TemplateResponse(
         "invites.html",
@@ -52,85 +34,76 @@ def create_invite(
     role: str = Form("member"),
     max_uses: int = Form(1),
     expires_days: int = Form(7),
-    db: Session = Depends(get_db),
+    repo: TenantRepo = Depends(get_admin_repo),
 ):
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-    if not require_admin(request):
-        return RedirectResponse(url="/", status_code=303)
+    expires_at = datetime.utcnow() + timedelta(days=expires_days)
 
-    org_id = _org_id(request)
-    user_id = _user_id(request)
+    codes = create_invites(
+        repo.db, repo.org_id, 1, role=role, max_uses=max_uses,
+        expires_at=expires_at, created_by_user_id=repo.user_id,
+    )
+    invite_filter.add(codes[0])
+
+    return RedirectResponse(url="/invites", status_code=303)
 
-    if not org_id or not user_id:
-        return RedirectResponse(url="/logout", status_code=303)
 
-    code = generate_invite_code(10)
+@router.post("/bulk")
+def create_invites_bulk(
+    request: Request,
+    count: int = Form(...),
+    role: str = Form("member"),
+    max_uses: int = Form(1),
+    expires_days: int = Form(30),
+    repo: TenantRepo = Depends(get_admin_repo),
+):
+    """
+    Gera vários convites de uma vez (turma, instituição) e devolve um CSV.
+    Todos entram numa única transação.
+    """
+    count = max(1, min(count, BULK_MAX))
     expires_at = datetime.utcnow() + timedelta(days=expires_days)
 
-    invite = InviteCode(
-        code=code,
-        organization_id=org_id,
-        role=role,
-        max_uses=max_uses,
-        uses=0,
-        expires_at=expires_at,
-        revoked=False,
-        created_by_user_id=user_id,
+    codes = create_invites(
+        repo.db, repo.org_id, count, role=role, max_uses=max_uses,
+        expires_at=expires_at, created_by_user_id=repo.user_id,
+    )
+    for code in codes:
+        invite_filter.add(code)
+
+    base = str(request.base_url).rstrip("/")
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["codigo", "link", "papel", "max_usos", "expira_em"])
+    for code in codes:
+        writer.writerow([code, f"{base}/signup?code={code}", role, max_uses, expires_at.strftime("%Y-%m-%d")])
+
+    filename = f"convites-{datetime.utcnow():%Y%m%d-%H%M%S}.csv"
+    return Response(
+        content=buf.getvalue(),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
-
-    db.add(invite)
-    db.commit()
-
-    return RedirectResponse(url="/invites", status_code=303)
 
 
 @router.post("/revoke")
 def revoke_invite(
     request: Request,
     invite_id: int = Form(...),
-    db: Session = Depends(get_db),
+    repo: TenantRepo = Depends(get_admin_repo),
 ):
     """
     Revoga um convite (admin only).
     """
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-    if not require_admin(request):
-        return RedirectResponse(url="/", status_code=303)
-
-    org_id = _org_id(request)
-    if not org_id:
-        return RedirectResponse(url="/logout", status_code=303)
-
-    inv = (
-        db.query(InviteCode)
-        .filter(InviteCode.id == invite_id, InviteCode.organization_id == org_id)
-        .first()
-    )
-    if inv:
-        inv.revoked = True
-        db.commit()
+    invite = repo.get(InviteCode, invite_id)
+    if invite and repo.update(InviteCode, invite_id, revoked=True):
+        invite_filter.invalidate(invite.code)
 
     return RedirectResponse(url="/invites", status_code=303)
 
 
 @router.get("/{code}")
-def show_invite(code: str, request: Request, db: Session = Depends(get_db)):
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-    if not require_admin(request):
-        return RedirectResponse(url="/", status_code=303)
-
-    org_id = _org_id(request)
-    if not org_id:
-        return RedirectResponse(url="/logout", status_code=303)
-
-    invite = (
-        db.query(InviteCode)
-        .filter(InviteCode.code == code, InviteCode.organization_id == org_id)
-        .first()
-    )
+def show_invite(code: str, request: Request, repo: TenantRepo = Depends(get_admin_repo)):
+    invite = repo.first_by(InviteCode, code=code)
     if not invite:
         return RedirectResponse(url="/invites", status_code=303)
 
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Request, Depends
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse
 from fastapi.templating import Jinja2Templates
 
-from ..deps import require_auth
+from .. import library_search
+from ..core.identity import Identity
+from ..deps import require_user
 
 router = APIRouter(prefix="/biblioteca", tags=["Biblioteca"])
 templates = Jinja2Templates(directory="app/templates")
 
 
 @router.get("")
-def biblioteca_home(request: Request):
+def biblioteca_home(request: Request, user: Identity = Depends(require_user)):
     """
     Biblioteca formativa do Setting.
 
@@ -19,12 +21,58 @@ def biblioteca_home(request: Request):
     - Nenhum armazenamento de documentos do usuário
     """
 
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-
     return templates.TemplateResponse(
         "biblioteca.html",
         {
             "request": request
         }
     )
+
+
+@router.get("/buscar")
+def biblioteca_buscar(
+    request: Request,
+    q: str = "",
+    formato: str = "html",
+    user: Identity = Depends(require_user),
+):
+    """
+    Busca no texto dos PDFs da biblioteca base (índice em memória, app/library_search.py).
+    Cada resultado é uma página, com trecho e link direto (#page=N).
+    """
+    q = q.strip()[:200]
+    hits, error = [], ""
+    if q:
+        try:
+            hits = library_search.library_index.search(q)
+        except library_search.LibrarySearchUnavailable as e:
+            error = str(e)
+
+    if formato == "json":
+        return JSONResponse(
+            {
+                "q": q,
+                "erro": error or None,
+                "resultados": [
+                    {
+                        "arquivo": h.file,
+                        "titulo": h.title,
+                        "pagina": h.page,
+                        "url": h.url,
+                        "trecho": "".join(text for text, _ in h.snippet),
+                    }
+                    for h in hits
+                ],
+            },
+            status_code=503 if error else 200,
+        )
+
+    return templates.TemplateResponse(
+        "biblioteca_busca.html",
+        {
+            "request": request,
+            "q": q,
+            "hits": hits,
+            "error": error,
+        }
+    )
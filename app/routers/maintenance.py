@@ -0,0 +1,77 @@
+import time
+from datetime import datetime
+
+from fastapi import APIRouter, Request, Form, Depends
+from fastapi.responses import RedirectResponse
+from fastapi.templating import Jinja2Templates
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .. import maintenance  # noqa: F401 - registra as tarefas no agendador
+from ..core import scheduler as sched
+from ..core.scheduler import scheduler
+from ..core.write_queue import run_write
+from ..deps import get_admin_repo
+from ..models import NoteRetentionPolicy
+from ..repositories import TenantRepo
+
+router = APIRouter(tags=["Manutenção"])
+templates = Jinja2Templates(directory="app/templates")
+
+
+@router.get("/admin/manutencao")
+def maintenance_page(request: Request, repo: TenantRepo = Depends(get_admin_repo)):
+    locks = scheduler.locks()
+    now = time.time()  # mesma base de locked_until (epoch), qualquer que seja o fuso do servidor
+    jobs = []
+    for job in scheduler.jobs.values():
+        lock = locks.get(job.name)
+        last = datetime.utcfromtimestamp(lock.last_run_at) if lock and lock.last_run_at else None
+        jobs.append({
+            "name": job.name,
+            "doc": (job.fn.__doc__ or "").strip(),
+            "interval_h": job.interval / 3600,
+            "last_run": last,
+            "locked": bool(lock and lock.locked_until > now),
+        })
+
+    policy = repo.db.get(NoteRetentionPolicy, repo.org_id)
+    return templates.TemplateResponse(
+        "admin_maintenance.html",
+        {
+            "request": request,
+            "enabled": sched.ENABLED,
+            "running": scheduler.running,
+            "jobs": jobs,
+            "runs": scheduler.history(50),
+            "note_days": policy.note_days if policy else None,
+        },
+    )
+
+
+@router.post("/admin/manutencao/rodar")
+def run_job(job: str = Form(...), repo: TenantRepo = Depends(get_admin_repo)):
+    # roda em segundo plano (com o mesmo lock entre workers); o resultado aparece no histórico
+    if job in scheduler.jobs:
+        scheduler.run_in_background(job)
+    return RedirectResponse("/admin/manutencao", status_code=303)
+
+
+@router.post("/admin/manutencao/retencao")
+def set_retention(note_days: int = Form(0), repo: TenantRepo = Depends(get_admin_repo)):
+    """Retenção das notas de sessão da organização (0 = guardar tudo)."""
+    org_id, user_id = repo.org_id, repo.user_id
+
+    def _save(s):
+        if note_days <= 0:
+            s.execute(delete(NoteRetentionPolicy).where(NoteRetentionPolicy.organization_id == org_id))
+            return
+        values = {"note_days": note_days, "updated_at": datetime.utcnow(), "updated_by_user_id": user_id}
+        s.execute(
+            sqlite_insert(NoteRetentionPolicy)
+            .values(organization_id=org_id, **values)
+            .on_conflict_do_update(index_elements=[NoteRetentionPolicy.organization_id], set_=values)
+        )
+
+    run_write(repo.db, _save)
+    return RedirectResponse("/admin/manutencao", status_code=303)
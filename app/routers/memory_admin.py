@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Request, Depends
+from fastapi.responses import FileResponse, PlainTextResponse, RedirectResponse
+from fastapi.templating import Jinja2Templates
+
+from ..core import memory
+from ..core.identity import Identity
+from ..deps import require_admin_user
+
+router = APIRouter(tags=["Memória"])
+templates = Jinja2Templates(directory="app/templates")
+
+
+@router.get("/admin/memoria")
+def memory_page(
+    request: Request,
+    snap: str | None = None,
+    base: str | None = None,
+    user: Identity = Depends(require_admin_user),
+):
+    # snap sozinho: maiores alocações; snap + base: o que cresceu de base para snap
+    report = None
+    if snap and base:
+        report = memory.compare(base, snap)
+    elif snap:
+        report = memory.top_stats(snap)
+
+    return templates.TemplateResponse(
+        "admin_memory.html",
+        {
+            "request": request,
+            "enabled": memory.ENABLED,
+            "rss": [
+                (datetime.fromtimestamp(ts).strftime("%H:%M:%S"), rss / 1024 / 1024)
+                for ts, rss in memory.rss_sampler.points
+            ],
+            "routes": memory.route_peaks(),
+            "snapshots": memory.list_snapshots(),
+            "snap": snap,
+            "base": base,
+            "report": report,
+        },
+    )
+
+
+@router.post("/admin/memoria/snapshot")
+def take_snapshot(user: Identity = Depends(require_admin_user)):
+    if not memory.ENABLED:
+        return RedirectResponse(url="/admin/memoria", status_code=303)
+    name = memory.take_snapshot()
+    return RedirectResponse(url=f"/admin/memoria?snap={name}", status_code=303)
+
+
+@router.get("/admin/memoria/{name}/baixar")
+def download_snapshot(name: str, user: Identity = Depends(require_admin_user)):
+    """Arquivo para tracemalloc.Snapshot.load()."""
+    path = memory.snapshot_path(name)
+    if not path:
+        return PlainTextResponse("Snapshot não encontrado", status_code=404)
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{name}.snap")
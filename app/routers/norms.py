@@ -1,39 +1,23 @@
-from fastapi import APIRouter, Request, Form, Depends
-from fastapi.responses import RedirectResponse
+from dataclasses import asdict
+
+from fastapi import APIRouter, Request, Form, Depends, File, UploadFile
+from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from sqlalchemy import delete
 
-from ..deps import get_db, require_auth
+from .. import norm_dedupe, norm_import
+from ..core.write_queue import run_write
+from ..deps import get_repo
 from ..models import NormCard
+from ..repositories import TenantRepo
 
 router = APIRouter(prefix="/normas", tags=["Normas"])
 templates = Jinja2Templates(directory="app/templates")
 
 
-def _org_id(request: Request) -> int | None:
-    return request.session.get("org_id")
-
-
-def _user_id(request: Request) -> int | None:
-    return request.session.get("user_id")
-
-
 @router.get("")
-def norms_home(request: Request, db: Session = Depends(get_db)):
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-
-    org_id = _org_id(request)
-    if not org_id:
-        return RedirectResponse(url="/logout", status_code=303)
-
-    cards = (
-        db.query(NormCard)
-        .filter(NormCard.organization_id == org_id)
-        .order_by(NormCard.created_at.desc())
-        .limit(100)
-        .all()
-    )
+def norms_home(request: Request, repo: TenantRepo = Depends(get_repo)):
+    cards = repo.list(NormCard, NormCard.created_at.desc(), limit=100)
 
     return templates.TemplateResponse(
         "norms.html",
@@ -48,26 +32,26 @@ def add_card(
     source: str = Form(""),
     practical_summary: str = Form(""),
     tags: str = Form(""),
-    db: Session = Depends(get_db),
+    repo: TenantRepo = Depends(get_repo),
 ):
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
-
-    org_id = _org_id(request)
-    user_id = _user_id(request)
-    if not org_id or not user_id:
-        return RedirectResponse(url="/logout", status_code=303)
-
-    card = NormCard(
-        owner_id=user_id,
-        organization_id=org_id,
-        title=title.strip(),
-        source=source.strip(),
-        practical_summary=practical_summary.strip(),
-        tags=tags.strip(),
-    )
-    db.add(card)
-    db.commit()
+    org_id, user_id = repo.org_id, repo.user_id
+    title, summary = title.strip(), practical_summary.strip()
+
+    def _add(s):
+        card = NormCard(
+            organization_id=org_id,
+            owner_id=user_id,
+            title=title,
+            source=source.strip(),
+            practical_summary=summary,
+            tags=tags.strip(),
+        )
+        s.add(card)
+        s.flush()
+        norm_dedupe.index_cards(s, org_id, [(card.id, title, summary)])
+        return card.id
+
+    run_write(repo.db, _add)
 
     return RedirectResponse(url="/normas", status_code=303)
 
@@ -76,22 +60,97 @@ def add_card(
 def delete_card(
     request: Request,
     card_id: int = Form(...),
-    db: Session = Depends(get_db),
+    voltar: str = Form(""),
+    repo: TenantRepo = Depends(get_repo),
 ):
-    if not require_auth(request):
-        return RedirectResponse(url="/login", status_code=303)
+    org_id = repo.org_id
+
+    def _delete(s):
+        gone = s.execute(
+            delete(NormCard)
+            .where(NormCard.id == card_id, NormCard.organization_id == org_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if gone:
+            norm_dedupe.unindex_cards(s, [card_id])
+        return gone
+
+    run_write(repo.db, _delete)
 
-    org_id = _org_id(request)
-    if not org_id:
-        return RedirectResponse(url="/logout", status_code=303)
+    # a tela de duplicatas apaga e volta para ela
+    back = "/normas/duplicatas" if voltar == "duplicatas" else "/normas"
+    return RedirectResponse(url=back, status_code=303)
 
-    obj = (
-        db.query(NormCard)
-        .filter(NormCard.id == card_id, NormCard.organization_id == org_id)
-        .first()
+
+@router.get("/importar")
+def import_page(request: Request, repo: TenantRepo = Depends(get_repo)):
+    return templates.TemplateResponse(
+        "norms_import.html",
+        {"request": request, "total": repo.count(NormCard), "batch": norm_import.BATCH, "max_rows": norm_import.MAX_ROWS},
     )
-    if obj:
-        db.delete(obj)
-        db.commit()
 
-    return RedirectResponse(url="/normas", status_code=303)
+
+@router.post("/importar")
+def import_cards(
+    request: Request,
+    file: UploadFile = File(...),
+    formato: str = Form("html"),
+    repo: TenantRepo = Depends(get_repo),
+):
+    """CSV ou JSON com título, fonte, resumo e tags; devolve o resultado de cada linha."""
+    error, rows = None, []
+    try:
+        rows = norm_import.import_norms(repo, file.file, file.filename or "")
+    except norm_import.NormImportError as e:
+        error = str(e)
+
+    summary = {status: sum(1 for r in rows if r.status == status) for status in ("criada", "duplicada", "invalida")}
+    if formato == "json":
+        return JSONResponse(
+            {"erro": error, "resumo": summary, "linhas": [asdict(r) for r in rows]},
+            status_code=400 if error else 200,
+        )
+    return templates.TemplateResponse(
+        "norms_import.html",
+        {
+            "request": request,
+            "total": repo.count(NormCard),
+            "batch": norm_import.BATCH,
+            "max_rows": norm_import.MAX_ROWS,
+            "filename": file.filename,
+            "error": error,
+            "summary": summary,
+            "rows": rows,
+        },
+        status_code=400 if error else 200,
+    )
+
+
+@router.get("/duplicatas")
+def duplicates_page(request: Request, titulo: str = "", resumo: str = "", repo: TenantRepo = Depends(get_repo)):
+    """Grupos de normas quase iguais (e, com titulo/resumo, as parecidas com um texto novo)."""
+    report = norm_dedupe.clusters(repo.db, repo.org_id)
+    suggestions = norm_dedupe.suggest(repo.db, repo.org_id, titulo, resumo) if (titulo or resumo) else None
+    return templates.TemplateResponse(
+        "norms_duplicates.html",
+        {
+            "request": request,
+            "report": report,
+            "threshold": norm_dedupe.THRESHOLD,
+            "titulo": titulo,
+            "resumo": resumo,
+            "suggestions": suggestions,
+        },
+    )
+
+
+@router.get("/duplicatas/sugerir")
+def suggest_duplicates(titulo: str = "", resumo: str = "", repo: TenantRepo = Depends(get_repo)):
+    """Para o formulário de nova norma: cards parecidos com o texto digitado."""
+    found = norm_dedupe.suggest(repo.db, repo.org_id, titulo, resumo)
+    return {
+        "sugestoes": [
+            {"id": c["id"], "titulo": c["title"], "fonte": c["source"], "similaridade": c["similarity"]}
+            for c in found
+        ]
+    }
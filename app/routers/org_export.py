@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from .. import org_transfer
+from ..core.identity import Identity
+from ..deps import require_admin_user
+
+router = APIRouter(tags=["Exportação"])
+
+
+@router.get("/admin/exportar")
+def export_organization(user: Identity = Depends(require_admin_user)):
+    """
+    ZIP com os dados da organização (um .ndjson por tabela), gerado durante o download.
+    Importação: python -m app.tools.org_transfer import <arquivo.zip> (na instância de destino).
+    """
+    filename = f"organizacao_{user.org_id}_{datetime.utcnow():%Y%m%d-%H%M}.zip"
+    return StreamingResponse(
+        org_transfer.export_org(user.org_id),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
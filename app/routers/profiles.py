@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Request, Depends
+from fastapi.responses import FileResponse, PlainTextResponse
+from fastapi.templating import Jinja2Templates
+
+from ..core import profiler
+from ..core.identity import Identity
+from ..deps import require_admin_user
+
+router = APIRouter(tags=["Perfis"])
+templates = Jinja2Templates(directory="app/templates")
+
+
+def _render(request: Request, user: Identity, selected: str | None = None, tree: list | None = None):
+    return templates.TemplateResponse(
+        "admin_profiles.html",
+        {
+            "request": request,
+            "enabled": profiler.ENABLED,
+            "profiles": profiler.list_profiles(),
+            "token": profiler.make_token(user.user_id) if profiler.ENABLED else None,
+            "token_minutes": profiler.TOKEN_MAX_AGE // 60,
+            "header": profiler.HEADER,
+            "selected": selected,
+            "tree": tree or [],
+        },
+    )
+
+
+@router.get("/admin/perfis")
+def list_profiles(request: Request, user: Identity = Depends(require_admin_user)):
+    return _render(request, user)
+
+
+@router.get("/admin/perfis/{name}")
+def show_profile(request: Request, name: str, user: Identity = Depends(require_admin_user)):
+    path = profiler.profile_path(name)
+    if not path:
+        return PlainTextResponse("Perfil não encontrado", status_code=404)
+    with open(path, encoding="utf-8") as f:
+        tree = profiler.call_tree(f.read())
+    return _render(request, user, selected=name, tree=tree)
+
+
+@router.get("/admin/perfis/{name}/folded")
+def download_profile(name: str, user: Identity = Depends(require_admin_user)):
+    """Pilhas no formato folded (flamegraph.pl, speedscope)."""
+    path = profiler.profile_path(name)
+    if not path:
+        return PlainTextResponse("Perfil não encontrado", status_code=404)
+    return FileResponse(path, media_type="text/plain", filename=f"{name}.folded")
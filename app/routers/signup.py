@@ -1,19 +1,29 @@
 from datetime import datetime
 
-from fastapi import APIRouter, Request, Form
+from fastapi import APIRouter, Request, Form, Depends
 from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash
 
-from ..core.database import SessionLocal
-from ..models import InviteCode, User
+from ..core import shards
+from ..core.database import ReadSessionLocal, SessionLocal
+from ..core.identity import identity_cache
+from ..core.invite_filter import invite_filter
+from ..core.ratelimit import RateLimit
+from ..core.write_queue import run_write
+from ..models import InviteCode, InviteCodeIndex, User
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
+# GET e POST dividem o mesmo balde (tentativa de código = tentativa)
+signup_limit = RateLimit("signup")
 
-def _invite_status(inv: InviteCode) -> dict:
-    """Retorna info amigável para a UI."""
+
+def _invite_status(inv) -> dict:
+    """Retorna info amigável para a UI (InviteCode ou InviteSnapshot do cache)."""
     now = datetime.utcnow()
     expires_at = inv.expires_at
     expired = bool(expires_at and now > expires_at)
@@ -34,43 +44,129 @@ def _invite_status(inv: InviteCode) -> dict:
     }
 
 
-@router.get("/signup")
+def _invite_session(code: str, readonly: bool = False):
+    """
+    Sessão onde o convite mora: o banco principal ou, com SHARD_PER_ORG=1,
+    o shard da organização dona do código (via invite_code_index).
+    """
+    org_id = None
+    if shards.ENABLED and code:
+        catalog = ReadSessionLocal()
+        try:
+            org_id = catalog.execute(
+                select(InviteCodeIndex.organization_id).where(InviteCodeIndex.code == code)
+            ).scalar()
+        finally:
+            catalog.close()
+    return shards.open_session(org_id, readonly=readonly)
+
+
+@router.get("/signup", dependencies=[Depends(signup_limit)])
 def signup_page(request: Request, code: str = ""):
     code = (code or "").strip()
 
-    db = SessionLocal()
-    try:
-        inv = db.query(InviteCode).filter(InviteCode.code == code).first() if code else None
-
-        invite = None
-        error = None
-
-        if code and not inv:
-            error = "Convite não encontrado. Verifique o código."
-        elif inv:
-            invite = _invite_status(inv)
-            if invite["revoked"]:
-                error = "Este convite foi revogado."
-            elif invite["expired"]:
-                error = "Este convite expirou."
-            elif invite["remaining"] == 0:
-                error = "Este convite já foi utilizado."
-            # se válido, não mostra erro
-
-        return templates.TemplateResponse(
-            "signup.html",
-            {
-                "request": request,
-                "code": code,
-                "invite": invite,   # pode ser None
-                "error": error,     # pode ser None
-            },
+    # código que com certeza não existe / status recente em cache: sem banco
+    inv = None
+    if code and invite_filter.might_exist(code):
+        inv = invite_filter.cached(code)
+        if inv is None:
+            db = _invite_session(code, readonly=True)
+            try:
+                found = db.query(InviteCode).filter(InviteCode.code == code).first()
+                inv = invite_filter.remember(found) if found else None
+            finally:
+                db.close()
+
+    invite = None
+    error = None
+
+    if code and not inv:
+        error = "Convite não encontrado. Verifique o código."
+    elif inv:
+        invite = _invite_status(inv)
+        if invite["revoked"]:
+            error = "Este convite foi revogado."
+        elif invite["expired"]:
+            error = "Este convite expirou."
+        elif invite["remaining"] == 0:
+            error = "Este convite já foi utilizado."
+        # se válido, não mostra erro
+
+    return templates.TemplateResponse(
+        "signup.html",
+        {
+            "request": request,
+            "code": code,
+            "invite": invite,   # pode ser None
+            "error": error,     # pode ser None
+        },
+    )
+
+
+def _claim_stmt(code: str):
+    """Gasta um uso só se o convite ainda vale (a checagem e o +1 são um único UPDATE)."""
+    uses = func.coalesce(InviteCode.uses, 0)
+    return (
+        update(InviteCode)
+        .where(
+            InviteCode.code == code,
+            InviteCode.revoked == False,  # noqa: E712
+            or_(InviteCode.expires_at.is_(None), InviteCode.expires_at > datetime.utcnow()),
+            or_(InviteCode.max_uses.is_(None), uses < InviteCode.max_uses),
         )
+        .values(uses=uses + 1)
+        .returning(InviteCode.organization_id, InviteCode.role)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _release_stmt(code: str):
+    """Devolve o uso gasto por _claim_stmt (compensação com shards)."""
+    return (
+        update(InviteCode)
+        .where(InviteCode.code == code, InviteCode.uses > 0)
+        .values(uses=InviteCode.uses - 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _redeem(db, code: str, email: str, password_hash: str) -> int | None:
+    """
+    Resgata o convite e cria o usuário.
+    Devolve o id do usuário, None se o convite não está disponível, ou
+    levanta IntegrityError se o e-mail já existe (sem consulta prévia).
+    """
+
+    def _add_user(s, org_id: int, role: str | None) -> int:
+        user = User(email=email, password_hash=password_hash, organization_id=org_id, role=role or "member")
+        s.add(user)
+        s.flush()
+        return user.id
+
+    if not shards.ENABLED:
+        # uma transação: e-mail repetido desfaz também o uso gasto
+        def _tx(s):
+            claimed = s.execute(_claim_stmt(code)).first()
+            return _add_user(s, *claimed) if claimed else None
+
+        return run_write(db, _tx)
+
+    # com shards, convite (shard da org) e usuário (catálogo) estão em arquivos
+    # diferentes: gasta o uso primeiro e devolve se o usuário não for criado
+    claimed = run_write(db, lambda s: tuple(s.execute(_claim_stmt(code)).first() or ()))
+    if not claimed:
+        return None
+    catalog = SessionLocal()
+    try:
+        return run_write(catalog, lambda s: _add_user(s, *claimed))
+    except BaseException:
+        run_write(db, lambda s: s.execute(_release_stmt(code)).rowcount)
+        raise
     finally:
-        db.close()
+        catalog.close()
 
 
-@router.post("/signup")
+@router.post("/signup", dependencies=[Depends(signup_limit)])
 def signup_with_code(
     request: Request,
     code: str = Form(...),
@@ -80,8 +176,32 @@ def signup_with_code(
     code = (code or "").strip()
     email = (email or "").strip().lower()
 
-    db = SessionLocal()
+    # código fora do filtro: nem abre sessão. Os demais conferem tudo no banco.
+    if not invite_filter.might_exist(code):
+        return templates.TemplateResponse(
+            "signup.html",
+            {"request": request, "code": code, "invite": None, "error": "Convite não encontrado."},
+        )
+
+    # hash fora da transação: é a parte lenta e não precisa do lock de escrita
+    password_hash = generate_password_hash(password)
+
+    db = _invite_session(code)
     try:
+        try:
+            user_id = _redeem(db, code, email, password_hash)
+        except IntegrityError:
+            user_id, error = None, "Este e-mail já está cadastrado. Faça login."
+        else:
+            error = None
+
+        if user_id is not None:
+            identity_cache.invalidate(user_id)
+            invite_filter.invalidate(code)
+            return RedirectResponse(url="/login", status_code=303)
+
+        # não criou: só agora lê o convite, para explicar o motivo
+        db.rollback()
         inv = db.query(InviteCode).filter(InviteCode.code == code).first()
         if not inv:
             return templates.TemplateResponse(
@@ -90,46 +210,20 @@ def signup_with_code(
             )
 
         invite = _invite_status(inv)
-
-        if not inv.is_valid():
+        if error is None:
             # mensagem mais clara
             if invite["revoked"]:
-                msg = "Este convite foi revogado."
+                error = "Este convite foi revogado."
             elif invite["expired"]:
-                msg = "Este convite expirou."
+                error = "Este convite expirou."
             elif invite["remaining"] == 0:
-                msg = "Este convite já foi utilizado."
+                error = "Este convite já foi utilizado."
             else:
-                msg = "Convite inválido."
-            return templates.TemplateResponse(
-                "signup.html",
-                {"request": request, "code": code, "invite": invite, "error": msg},
-            )
-
-        exists = db.query(User).filter(User.email == email).first()
-        if exists:
-            return templates.TemplateResponse(
-                "signup.html",
-                {
-                    "request": request,
-                    "code": code,
-                    "invite": invite,
-                    "error": "Este e-mail já está cadastrado. Faça login.",
-                },
-            )
-
-        user = User(
-            email=email,
-            password_hash=generate_password_hash(password),
-            organization_id=inv.organization_id,
-            role=inv.role or "member",
+                error = "Convite inválido."
+        return templates.TemplateResponse(
+            "signup.html",
+            {"request": request, "code": code, "invite": invite, "error": error},
         )
-        db.add(user)
-
-        inv.uses = (inv.uses or 0) + 1
-        db.commit()
-
-        return RedirectResponse(url="/login", status_code=303)
 
     finally:
         db.close()
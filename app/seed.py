@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 
+from .core import shards
 from .models import DocTemplate, Organization, User
 
 DEFAULT_DOC_TEMPLATES = [
@@ -111,6 +112,7 @@ def seed_doc_templates(db: Session) -> int:
     Cria modelos padrão PARA CADA ORGANIZAÇÃO, apenas se ainda não existirem
     (por organization_id + name). Preenche owner_id com o admin da org.
     Retorna quantos foram criados no total.
+    Com SHARD_PER_ORG=1 cada organização é gravada no próprio shard.
     """
     created = 0
 
@@ -125,29 +127,36 @@ def seed_doc_templates(db: Session) -> int:
             # sem admin, não dá pra setar owner_id com segurança
             continue
 
-        for tpl in DEFAULT_DOC_TEMPLATES:
-            exists = (
-                db.query(DocTemplate)
-                .filter(
-                    DocTemplate.organization_id == org.id,
-                    DocTemplate.name == tpl["name"],
+        org_db = shards.open_session(org.id) if shards.ENABLED else db
+        try:
+            org_created = 0
+            for tpl in DEFAULT_DOC_TEMPLATES:
+                exists = (
+                    org_db.query(DocTemplate)
+                    .filter(
+                        DocTemplate.organization_id == org.id,
+                        DocTemplate.name == tpl["name"],
+                    )
+                    .first()
                 )
-                .first()
-            )
-            if exists:
-                continue
-
-            db.add(
-                DocTemplate(
-                    owner_id=admin.id,
-                    organization_id=org.id,
-                    name=tpl["name"],
-                    body=tpl["body"],
+                if exists:
+                    continue
+
+                org_db.add(
+                    DocTemplate(
+                        owner_id=admin.id,
+                        organization_id=org.id,
+                        name=tpl["name"],
+                        body=tpl["body"],
+                    )
                 )
-            )
-            created += 1
-
-    if created:
-        db.commit()
+                org_created += 1
+
+            if org_created:
+                org_db.commit()
+            created += org_created
+        finally:
+            if org_db is not db:
+                org_db.close()
 
     return created
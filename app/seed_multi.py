@@ -1,8 +1,14 @@
 import os
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from werkzeug.security import generate_password_hash
 
-from .models import Organization, User
+from .core import shards
+from .models import DocTemplate, NormCard, Organization, SessionNote, User
+from .seed import DEFAULT_DOC_TEMPLATES
 
 
 def seed_org_and_admin(db: Session):
@@ -50,3 +56,116 @@ def seed_org_and_admin(db: Session):
 
     if changed:
         db.commit()
+
+
+# =========================
+# Dados sintéticos (benchmarks)
+# =========================
+SYNTHETIC_PASSWORD = "bench"
+_CHUNK = 2000
+
+
+def synthetic_email(org_index: int, user_index: int) -> str:
+    return f"bench{org_index}_{user_index}@bench.local"
+
+
+def _bulk(db: Session, model, rows: list[dict]) -> None:
+    for i in range(0, len(rows), _CHUNK):
+        db.execute(insert(model), rows[i:i + _CHUNK])
+
+
+def seed_synthetic(
+    db: Session,
+    orgs: int = 5,
+    users_per_org: int = 5,
+    notes_per_org: int = 2000,
+    cards_per_org: int = 200,
+    templates_per_org: int = 20,
+    patients_per_org: int = 50,
+    seed: int = 42,
+) -> list[int]:
+    """
+    Cria organizações "Bench <n>" com usuários, notas, cards e modelos,
+    em INSERTs em lote (executemany). Organizações que já existem são puladas.
+    Todos os usuários usam a senha SYNTHETIC_PASSWORD.
+    Retorna os ids das organizações sintéticas.
+    """
+    rnd = random.Random(seed)
+    # hash uma vez só: o werkzeug é lento de propósito
+    password_hash = generate_password_hash(SYNTHETIC_PASSWORD)
+    now = datetime.utcnow()
+    body = "\n\n".join(t["body"] for t in DEFAULT_DOC_TEMPLATES)
+    org_ids = []
+
+    for o in range(1, orgs + 1):
+        name = f"Bench {o}"
+        org = db.query(Organization).filter(Organization.name == name).first()
+        if org:
+            org_ids.append(org.id)
+            continue
+
+        org = Organization(name=name)
+        db.add(org)
+        db.flush()
+        _bulk(db, User, [
+            {
+                "email": synthetic_email(o, u),
+                "password_hash": password_hash,
+                "organization_id": org.id,
+                "role": "admin" if u == 1 else "member",
+                "created_at": now,
+            }
+            for u in range(1, users_per_org + 1)
+        ])
+        db.commit()
+        org_ids.append(org.id)
+
+        user_ids = [
+            r[0] for r in db.query(User.id).filter(User.organization_id == org.id).order_by(User.id)
+        ]
+        patients = [f"P{p:04d}" for p in range(1, patients_per_org + 1)]
+
+        def ago() -> datetime:
+            return now - timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+
+        tenant = shards.open_session(org.id) if shards.ENABLED else db
+        try:
+            _bulk(tenant, SessionNote, [
+                {
+                    "owner_id": rnd.choice(user_ids),
+                    "organization_id": org.id,
+                    "created_at": ago(),
+                    "patient_alias": rnd.choice(patients),
+                    "stage": rnd.choice(("pre", "during", "post")),
+                    "content": f"Nota sintética {n}. " * rnd.randint(5, 40),
+                }
+                for n in range(notes_per_org)
+            ])
+            _bulk(tenant, NormCard, [
+                {
+                    "owner_id": rnd.choice(user_ids),
+                    "organization_id": org.id,
+                    "created_at": ago(),
+                    "title": f"Norma sintética {n}",
+                    "source": f"Resolução CFP {rnd.randint(1, 30):03d}/{rnd.randint(2000, 2025)}",
+                    "practical_summary": "Resumo prático. " * rnd.randint(5, 30),
+                    "tags": ",".join(rnd.sample(("sigilo", "online", "registro", "ética", "documentos"), 2)),
+                }
+                for n in range(cards_per_org)
+            ])
+            _bulk(tenant, DocTemplate, [
+                {
+                    "owner_id": user_ids[0],
+                    "organization_id": org.id,
+                    "created_at": ago(),
+                    "name": f"Modelo sintético {n}",
+                    "body": body,
+                }
+                for n in range(templates_per_org)
+            ])
+            tenant.commit()
+        finally:
+            if tenant is not db:
+                tenant.close()
+
+    return org_ids
@@ -0,0 +1 @@
+"""Ferramentas de linha de comando (python -m app.tools.<nome>)."""
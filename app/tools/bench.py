@@ -0,0 +1,343 @@
+"""
+Benchmark das rotas mais usadas, dentro do processo (sem servidor HTTP).
+
+Uso:
+    python -m app.tools.bench                          # banco temporário, escala padrão
+    python -m app.tools.bench --orgs 20 --notes 20000 --out bench.json
+    python -m app.tools.bench --compare bench_antes.json --fail-over 15
+
+Cria (ou reaproveita, com --db) um banco com dados sintéticos em lote
+(seed_multi.seed_synthetic), faz login como o admin da "Bench 1" e mede
+cada rota chamando o app ASGI diretamente. Saída em JSON com p50/p95/p99 e
+requisições por segundo; --compare mostra a variação contra outra execução
+e --check-plans confere os planos de consulta (app.tools.query_plans).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from . import query_plans
+
+
+# ==============================================================================
+# CLIENTE ASGI MÍNIMO (cookies à mão; sem httpx)
+# ==============================================================================
+class AsgiClient:
+    def __init__(self, app, host: str = "bench.local"):
+        self.app = app
+        self.host = host
+        self.cookies: dict[str, str] = {}
+
+    async def request(self, method: str, path: str, data: dict | None = None) -> tuple[int, dict, bytes]:
+        path, _, query = path.partition("?")
+        body = urlencode(data).encode() if data is not None else b""
+        headers = [(b"host", self.host.encode())]
+        if data is not None:
+            headers.append((b"content-type", b"application/x-www-form-urlencoded"))
+            headers.append((b"content-length", str(len(body)).encode()))
+        if self.cookies:
+            cookie = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+            headers.append((b"cookie", cookie.encode()))
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "https",  # cookie de sessão é https_only
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 50000),
+            "server": (self.host, 443),
+        }
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.sleep(3600)
+            return {"type": "http.disconnect"}
+
+        status, resp_headers, chunks = 0, {}, []
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for k, v in message.get("headers", []):
+                    k, v = k.decode().lower(), v.decode()
+                    if k == "set-cookie":
+                        for name, morsel in SimpleCookie(v).items():
+                            if morsel.value and morsel["max-age"] != "0":
+                                self.cookies[name] = morsel.value
+                            else:
+                                self.cookies.pop(name, None)
+                    resp_headers[k] = v
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return status, resp_headers, b"".join(chunks)
+
+
+# ==============================================================================
+# CENÁRIOS
+# ==============================================================================
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def scenarios(email: str, password: str, doc_id: int, patient: str) -> list[tuple[str, str, str, dict | None, int]]:
+    """(nome, método, caminho, formulário, status esperado)"""
+    pdf_form = {"tipo": "declaracao", "paciente": "Paciente", "profissional": "Profissional", "crp": "00/0000"}
+    return [
+        ("login", "POST", "/login", {"email": email, "password": password}, 303),
+        ("modo_sessao", "GET", "/modo-sessao", None, 200),
+        ("modo_sessao_paciente", "GET", f"/modo-sessao?patient={patient}", None, 200),
+        ("normas", "GET", "/normas", None, 200),
+        ("documentos", "GET", "/documentos", None, 200),
+        ("documentos_render", "POST", "/documentos/render", {"doc_id": doc_id, "paciente_nome": "Paciente"}, 200),
+        ("gerar_txt", "POST", "/documentos/gerar-documento-txt", pdf_form, 200),
+        ("gerar_pdf", "POST", "/documentos/gerar-documento-pdf", pdf_form, 200),
+    ]
+
+
+def prepare(args) -> dict:
+    """Cria o schema e os dados sintéticos; devolve o que os cenários precisam."""
+    from ..core import shards
+    from ..core.database import Base, SessionLocal, engine
+    from ..models import DocTemplate
+    from ..seed_multi import SYNTHETIC_PASSWORD, seed_synthetic, synthetic_email
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        org_ids = seed_synthetic(
+            db,
+            orgs=args.orgs,
+            users_per_org=args.users,
+            notes_per_org=args.notes,
+            cards_per_org=args.cards,
+            templates_per_org=args.templates,
+            patients_per_org=args.patients,
+        )
+        seed_seconds = time.perf_counter() - t0
+    finally:
+        db.close()
+
+    tenant = shards.open_session(org_ids[0], readonly=True)
+    try:
+        doc_id = (
+            tenant.query(DocTemplate.id)
+            .filter(DocTemplate.organization_id == org_ids[0])
+            .order_by(DocTemplate.id)
+            .limit(1)
+            .scalar()
+        )
+    finally:
+        tenant.close()
+
+    return {
+        "email": synthetic_email(1, 1),
+        "password": SYNTHETIC_PASSWORD,
+        "doc_id": doc_id or 0,
+        "patient": "P0001",
+        "seed_seconds": round(seed_seconds, 3),
+    }
+
+
+async def run(app, ctx: dict, requests: int, warmup: int, only: set[str] | None, capture=None) -> dict:
+    client = AsgiClient(app)
+    await app.router.startup()
+    try:
+        if capture is not None:
+            capture.route = "login"
+        status, _, _ = await client.request("POST", "/login", {"email": ctx["email"], "password": ctx["password"]})
+        if status != 303:
+            raise SystemExit(f"Login do benchmark falhou (status {status})")
+
+        results = {}
+        for name, method, path, data, expected in scenarios(ctx["email"], ctx["password"], ctx["doc_id"], ctx["patient"]):
+            if only and name not in only:
+                continue
+            if capture is not None:
+                capture.route = name
+            # login é caro de propósito (hash): menos repetições
+            n = max(1, requests // 10) if name == "login" else requests
+            for _ in range(warmup):
+                await client.request(method, path, data)
+
+            timings, errors = [], 0
+            started = time.perf_counter()
+            for _ in range(n):
+                t0 = time.perf_counter()
+                status, _, _ = await client.request(method, path, data)
+                timings.append(time.perf_counter() - t0)
+                if status != expected:
+                    errors += 1
+            elapsed = time.perf_counter() - started
+
+            ms = [t * 1000 for t in timings]
+            results[name] = {
+                "n": n,
+                "errors": errors,
+                "mean_ms": round(statistics.fmean(ms), 3),
+                "p50_ms": round(_percentile(ms, 50), 3),
+                "p95_ms": round(_percentile(ms, 95), 3),
+                "p99_ms": round(_percentile(ms, 99), 3),
+                "rps": round(n / elapsed, 2) if elapsed else 0.0,
+            }
+            print(
+                f"{name:<22} p50={results[name]['p50_ms']:>8.2f}ms "
+                f"p95={results[name]['p95_ms']:>8.2f}ms p99={results[name]['p99_ms']:>8.2f}ms "
+                f"{results[name]['rps']:>8.1f} req/s",
+                file=sys.stderr,
+            )
+        return results
+    finally:
+        await app.router.shutdown()
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(base: dict, current: dict, fail_over: float | None) -> int:
+    """Imprime a variação de p50/p95 por rota; 1 se alguma p95 piorar além de fail_over %."""
+    worst = 0.0
+    print(f"{'rota':<22} {'p50 antes':>10} {'p50 agora':>10} {'Δ%':>7} {'p95 antes':>10} {'p95 agora':>10} {'Δ%':>7}")
+    for name, cur in current["routes"].items():
+        old = base.get("routes", {}).get(name)
+        if not old:
+            continue
+        d50 = 100.0 * (cur["p50_ms"] - old["p50_ms"]) / old["p50_ms"] if old["p50_ms"] else 0.0
+        d95 = 100.0 * (cur["p95_ms"] - old["p95_ms"]) / old["p95_ms"] if old["p95_ms"] else 0.0
+        worst = max(worst, d95)
+        print(
+            f"{name:<22} {old['p50_ms']:>10.2f} {cur['p50_ms']:>10.2f} {d50:>+7.1f} "
+            f"{old['p95_ms']:>10.2f} {cur['p95_ms']:>10.2f} {d95:>+7.1f}"
+        )
+    if fail_over is not None and worst > fail_over:
+        print(f"Regressão: p95 piorou {worst:.1f}% (limite {fail_over}%)", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="arquivo SQLite (padrão: temporário, apagado no fim)")
+    parser.add_argument("--orgs", type=int, default=5)
+    parser.add_argument("--users", type=int, default=5, help="usuários por organização")
+    parser.add_argument("--notes", type=int, default=2000, help="notas por organização")
+    parser.add_argument("--cards", type=int, default=200, help="cards de normas por organização")
+    parser.add_argument("--templates", type=int, default=20, help="modelos de documento por organização")
+    parser.add_argument("--patients", type=int, default=50, help="apelidos de paciente por organização")
+    parser.add_argument("--requests", type=int, default=200, help="requisições medidas por rota")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--only", help="rotas separadas por vírgula (ex.: normas,gerar_pdf)")
+    parser.add_argument("--out", help="grava o resultado em JSON (senão vai para stdout)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior")
+    parser.add_argument("--fail-over", type=float, help="com --compare: sai com 1 se alguma p95 piorar mais que isso (%%)")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="confere o EXPLAIN QUERY PLAN das consultas executadas (ver query_plans)")
+    args = parser.parse_args(argv)
+
+    # DB_PATH precisa estar definido antes de importar o app
+    tmpdir = tempfile.TemporaryDirectory(prefix="setting-bench-")
+    if args.db:
+        os.environ["DB_PATH"] = os.path.abspath(args.db)
+    else:
+        os.environ["DB_PATH"] = os.path.join(tmpdir.name, "bench.db")
+        os.environ.setdefault("SHARD_DIR", os.path.join(tmpdir.name, "shards"))
+    # gerar_txt/gerar_pdf gravam arquivos: fora da árvore do projeto
+    os.environ.setdefault("GENERATED_DIR", os.path.join(tmpdir.name, "generated"))
+
+    # sem log de acesso: milhares de requisições sintéticas só poluem a saída
+    os.environ.setdefault("ACCESS_LOG", "0")
+    # todas as requisições vêm do mesmo "IP": o limite de taxa pararia o login
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    # ANALYZE/arquivamento no meio da medição distorceriam os números
+    os.environ.setdefault("SCHEDULER_ENABLED", "0")
+
+    try:
+        from ..main import app
+
+        ctx = prepare(args)
+        only = set(args.only.split(",")) if args.only else None
+        capture = query_plans.SqlCapture() if args.check_plans else None
+        with capture or nullcontext():
+            routes = asyncio.run(run(app, ctx, args.requests, args.warmup, only, capture))
+
+        result = {
+            "meta": {
+                "commit": _git_commit(),
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "scale": {
+                    "orgs": args.orgs, "users": args.users, "notes": args.notes,
+                    "cards": args.cards, "templates": args.templates, "patients": args.patients,
+                },
+                "seed_seconds": ctx["seed_seconds"],
+            },
+            "routes": routes,
+        }
+        text = json.dumps(result, indent=2, ensure_ascii=False)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+
+        status = 0
+        if args.check_plans:
+            from ..core import shards
+            from ..core.database import DB_PATH, engine
+
+            if shards.ENABLED:
+                print("--check-plans ignorado com SHARD_PER_ORG=1 (rode sem shards)", file=sys.stderr)
+            elif query_plans.check(engine, DB_PATH, capture):
+                status = 1
+
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as f:
+                status = compare(json.load(f), result, args.fail_over) or status
+        return status
+    finally:
+        from ..core import shards
+        from ..core.database import engine, read_engine
+
+        shards.shard_engines.dispose_all()
+        engine.dispose()
+        read_engine.dispose()
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,37 @@
+"""
+Extrai o texto dos PDFs da biblioteca base para o cache da busca.
+
+Uso:
+    python -m app.tools.library_index                    # extrai o que faltar no cache
+    python -m app.tools.library_index --buscar "setting" # e testa uma busca
+
+O cache (LIBRARY_TEXT_CACHE, um .json por PDF, nomeado pelo sha256 do
+arquivo) é o mesmo que o app lê no startup: rodado no build, o app sobe sem
+abrir nenhum PDF. PDF alterado = hash novo = extraído de novo; os outros
+não são relidos. Precisa do pypdf (requirements.txt).
+"""
+import argparse
+import json
+
+from .. import library_search
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buscar", help="consulta de teste depois de montar o índice")
+    args = parser.parse_args()
+
+    try:
+        summary = library_search.library_index.build()
+    except library_search.LibrarySearchUnavailable as e:
+        raise SystemExit(f"busca da biblioteca indisponível: {e}")
+    print(json.dumps(summary, ensure_ascii=False))
+
+    if args.buscar:
+        for h in library_search.library_index.search(args.buscar):
+            text = "".join(f"[{t}]" if hl else t for t, hl in h.snippet)
+            print(f"{h.file} p.{h.page}: {text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Teste de carga: um "dia de trabalho" de vários clínicos ao mesmo tempo,
+contra um servidor de verdade (uvicorn local).
+
+Uso:
+    # 1) banco com dados sintéticos (uma vez)
+    python -m app.tools.loadtest --seed-db app/data/loadtest.db --orgs 10 --users 10
+    # 2) servidor apontando para ele (PDFs/TXTs gerados numa pasta temporária)
+    DB_PATH=app/data/loadtest.db GENERATED_DIR=/tmp/setting-loadtest SESSION_TIMEOUT_MINUTES=1 \
+        RATE_LIMIT_ENABLED=0 uvicorn app.main:app --port 8000
+    # 3) rampa de concorrência
+    python -m app.tools.loadtest --url http://127.0.0.1:8000 --stages 1,2,4,8,16,32 --stage-seconds 30
+
+Cada clínico (thread) faz login e repete: abre /modo-sessao, salva uma nota,
+filtra por paciente, navega em /normas, renderiza um modelo e baixa um PDF,
+com pausas de "pensamento" entre os passos. Com --idle-seconds, no fim do
+estágio fica parado (passe do SESSION_TIMEOUT_MINUTES do servidor), confere
+que a sessão expirou e faz login de novo.
+
+Relatório: percentis por passo, taxa de erro e vazão por estágio, e o ponto
+de saturação (primeiro estágio em que a vazão para de crescer, a p95 passa
+do --slo-ms ou os erros passam de --max-error-rate).
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from .bench import _percentile
+
+_DOC_ID = re.compile(r'name="doc_id" value="(\d+)"')
+
+
+# ==============================================================================
+# CLIENTE HTTP (um por clínico: keep-alive + cookies à mão)
+# ==============================================================================
+class Client:
+    """
+    http.client sem seguir redirects. Os cookies são guardados à mão porque o
+    cookie de sessão é "Secure" e o teste normalmente roda em http://.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if self.https else 80)
+        self.timeout = timeout
+        self.cookies: dict[str, str] = {}
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._conn = cls(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def request(self, method: str, path: str, data: dict | None = None) -> tuple[int, dict, bytes]:
+        body = urlencode(data) if data is not None else None
+        headers = {"Accept-Encoding": "identity"}
+        if body is not None:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+
+        for attempt in (1, 2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                payload = resp.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # conexão keep-alive fechada pelo servidor: tenta de novo uma vez
+                self.close()
+                if attempt == 2:
+                    raise
+
+        for value in resp.headers.get_all("set-cookie") or []:
+            for name, morsel in SimpleCookie(value).items():
+                if morsel.value and morsel["max-age"] != "0":
+                    self.cookies[name] = morsel.value
+                else:
+                    self.cookies.pop(name, None)
+        return resp.status, dict(resp.headers.items()), payload
+
+
+# ==============================================================================
+# REGISTRO DOS RESULTADOS
+# ==============================================================================
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def record(self, step: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.timings[step].append(seconds)
+            if not ok:
+                self.errors[step] += 1
+
+
+# ==============================================================================
+# CENÁRIO: UM CLÍNICO
+# ==============================================================================
+class Clinician(threading.Thread):
+    def __init__(self, args, email: str, recorder: Recorder, stop_at: float, idle_seconds: float):
+        super().__init__(daemon=True)
+        self.args = args
+        self.email = email
+        self.recorder = recorder
+        self.stop_at = stop_at
+        self.idle_seconds = idle_seconds
+        self.rnd = random.Random(email)
+        self.client = Client(args.url)
+        self.doc_id = None
+
+    def step(self, name: str, method: str, path: str, data: dict | None = None, expect: tuple = (200,)):
+        t0 = time.perf_counter()
+        try:
+            status, headers, body = self.client.request(method, path, data)
+            ok = status in expect
+        except Exception:  # noqa: BLE001 - erro de rede conta como erro do passo
+            status, headers, body, ok = 0, {}, b"", False
+        self.recorder.record(name, time.perf_counter() - t0, ok)
+        return status, headers, body
+
+    def think(self) -> None:
+        time.sleep(self.rnd.uniform(self.args.think_min, self.args.think_max))
+
+    def login(self, name: str = "login") -> bool:
+        status, headers, _ = self.step(
+            name, "POST", "/login", {"email": self.email, "password": self.args.password}, expect=(303,)
+        )
+        return status == 303 and headers.get("location", headers.get("Location", "")).endswith("/")
+
+    def workday_iteration(self) -> None:
+        patient = f"P{self.rnd.randint(1, self.args.patients):04d}"
+
+        self.step("modo_sessao", "GET", "/modo-sessao")
+        self.think()
+        self.step(
+            "salvar_nota", "POST", "/modo-sessao/add",
+            {"stage": self.rnd.choice(("pre", "during", "post")), "patient_alias": patient,
+             "content": "Registro de carga. " * self.rnd.randint(3, 20)},
+            expect=(303,),
+        )
+        self.think()
+        self.step("modo_sessao_paciente", "GET", f"/modo-sessao?patient={patient}")
+        self.think()
+        self.step("normas", "GET", "/normas")
+        self.think()
+        _, _, body = self.step("documentos", "GET", "/documentos")
+        if self.doc_id is None:
+            m = _DOC_ID.search(body.decode("utf-8", "replace"))
+            self.doc_id = int(m.group(1)) if m else 0
+        if self.doc_id:
+            self.step(
+                "documentos_render", "POST", "/documentos/render",
+                {"doc_id": self.doc_id, "paciente_nome": patient, "profissional_nome": "Clínico"},
+            )
+            self.think()
+        self.step(
+            "gerar_pdf", "POST", "/documentos/gerar-documento-pdf",
+            {"tipo": self.rnd.choice(("declaracao", "atestado", "recibo")), "paciente": patient},
+        )
+        self.think()
+
+    def run(self) -> None:
+        try:
+            if not self.login():
+                return
+            while time.monotonic() < self.stop_at:
+                self.workday_iteration()
+
+            if self.idle_seconds > 0:
+                # passa do timeout de sessão: a próxima página deve mandar para o login
+                time.sleep(self.idle_seconds)
+                self.step("pos_timeout", "GET", "/modo-sessao", expect=(303,))
+                self.login("relogin")
+        finally:
+            self.client.close()
+
+
+# ==============================================================================
+# ESTÁGIOS / RELATÓRIO
+# ==============================================================================
+def run_stage(args, clinicians: int) -> dict:
+    recorder = Recorder()
+    emails = [
+        f"bench{(i // args.users) % args.orgs + 1}_{i % args.users + 1}@bench.local"
+        for i in range(clinicians)
+    ]
+    started = time.monotonic()
+    stop_at = started + args.stage_seconds
+    threads = [Clinician(args, email, recorder, stop_at, args.idle_seconds) for email in emails]
+    for t in threads:
+        t.start()
+        time.sleep(args.ramp_seconds / max(clinicians, 1))
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started - (args.idle_seconds if args.idle_seconds > 0 else 0)
+
+    steps, total, total_errors = {}, 0, 0
+    for name, timings in recorder.timings.items():
+        ms = [t * 1000 for t in timings]
+        errors = recorder.errors.get(name, 0)
+        total += len(ms)
+        total_errors += errors
+        steps[name] = {
+            "n": len(ms),
+            "errors": errors,
+            "error_rate": round(errors / len(ms), 4) if ms else 0.0,
+            "p50_ms": round(_percentile(ms, 50), 2),
+            "p95_ms": round(_percentile(ms, 95), 2),
+            "p99_ms": round(_percentile(ms, 99), 2),
+        }
+    all_ms = [t * 1000 for ts in recorder.timings.values() for t in ts]
+    return {
+        "clinicians": clinicians,
+        "requests": total,
+        "errors": total_errors,
+        "error_rate": round(total_errors / total, 4) if total else 0.0,
+        "rps": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+        "p95_ms": round(_percentile(all_ms, 95), 2),
+        "steps": steps,
+    }
+
+
+def saturation(stages: list[dict], slo_ms: float, max_error_rate: float, min_gain: float) -> dict:
+    """Primeiro estágio que estoura o SLO/erros ou não ganha vazão; o anterior é a capacidade."""
+    capacity = None
+    for prev, cur in zip([None] + stages[:-1], stages):
+        reason = None
+        if cur["error_rate"] > max_error_rate:
+            reason = f"erros {cur['error_rate']:.1%} > {max_error_rate:.1%}"
+        elif cur["p95_ms"] > slo_ms:
+            reason = f"p95 {cur['p95_ms']:.0f}ms > {slo_ms:.0f}ms"
+        elif prev and prev["rps"] and (cur["rps"] - prev["rps"]) / prev["rps"] < min_gain:
+            reason = f"vazão {prev['rps']:.1f} -> {cur['rps']:.1f} req/s"
+        if reason:
+            return {"saturated_at": cur["clinicians"], "capacity": capacity, "reason": reason}
+        capacity = cur["clinicians"]
+    return {"saturated_at": None, "capacity": capacity, "reason": "não saturou nos estágios testados"}
+
+
+def print_report(stages: list[dict], sat: dict) -> None:
+    out = sys.stderr
+    for st in stages:
+        print(
+            f"\n== {st['clinicians']} clínicos: {st['rps']:.1f} req/s, "
+            f"p95 {st['p95_ms']:.0f}ms, erros {st['error_rate']:.2%}",
+            file=out,
+        )
+        for name, s in st["steps"].items():
+            print(
+                f"   {name:<22} n={s['n']:<6} p50={s['p50_ms']:>8.1f} p95={s['p95_ms']:>8.1f} "
+                f"p99={s['p99_ms']:>8.1f} erros={s['errors']}",
+                file=out,
+            )
+    print(f"\nCapacidade: {sat['capacity']} clínicos simultâneos ({sat['reason']})", file=out)
+
+
+def seed_db(args) -> None:
+    os.environ["DB_PATH"] = os.path.abspath(args.seed_db)
+    from ..core.database import Base, SessionLocal, engine
+    from .. import models  # noqa: F401 - registra as tabelas no metadata
+    from ..seed_multi import seed_synthetic
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        seed_synthetic(
+            db, orgs=args.orgs, users_per_org=args.users,
+            notes_per_org=args.notes, patients_per_org=args.patients,
+        )
+    finally:
+        db.close()
+    print(f"Banco pronto: {args.seed_db} ({args.orgs} orgs x {args.users} usuários)", file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--stages", default="1,2,4,8,16", help="clínicos simultâneos por estágio")
+    parser.add_argument("--stage-seconds", type=float, default=30.0)
+    parser.add_argument("--ramp-seconds", type=float, default=2.0, help="espalha a entrada dos clínicos")
+    parser.add_argument("--think-min", type=float, default=0.2)
+    parser.add_argument("--think-max", type=float, default=1.0)
+    parser.add_argument("--idle-seconds", type=float, default=0.0,
+                        help="pausa no fim do estágio (use > SESSION_TIMEOUT_MINUTES do servidor)")
+    parser.add_argument("--orgs", type=int, default=5)
+    parser.add_argument("--users", type=int, default=10, help="usuários por organização")
+    parser.add_argument("--notes", type=int, default=2000, help="notas por organização (com --seed-db)")
+    parser.add_argument("--patients", type=int, default=50)
+    parser.add_argument("--password", default="bench")
+    parser.add_argument("--slo-ms", type=float, default=1000.0, help="p95 máxima aceitável")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--min-gain", type=float, default=0.10, help="ganho mínimo de vazão entre estágios")
+    parser.add_argument("--seed-db", help="só cria os dados sintéticos neste arquivo e sai")
+    parser.add_argument("--out", help="grava o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    if args.seed_db:
+        seed_db(args)
+        return 0
+
+    stages = []
+    for n in (int(x) for x in args.stages.split(",") if x.strip()):
+        stages.append(run_stage(args, n))
+        print(f"estágio {n}: {stages[-1]['rps']:.1f} req/s, p95 {stages[-1]['p95_ms']:.0f}ms", file=sys.stderr)
+
+    sat = saturation(stages, args.slo_ms, args.max_error_rate, args.min_gain)
+    print_report(stages, sat)
+    report = {"url": args.url, "stages": stages, "saturation": sat}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
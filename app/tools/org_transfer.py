@@ -0,0 +1,54 @@
+"""
+Exporta / importa uma organização (ZIP com um .ndjson por tabela).
+
+Uso:
+    python -m app.tools.org_transfer export --org 1 --out clinica.zip [--com-senhas]
+    python -m app.tools.org_transfer import clinica.zip [--name "Novo nome"]
+
+A exportação é a mesma de /admin/exportar. A importação cria uma
+organização nova nesta instância (ids renumerados) e recusa o arquivo se
+algum e-mail já estiver cadastrado aqui. Pode rodar com o app no ar.
+
+Sem --com-senhas o ZIP não leva os hashes de senha: os usuários importados
+ficam com uma senha que nenhum login aceita. Use --com-senhas só para migrar
+a própria instância, entre servidores sob o mesmo controle.
+"""
+import argparse
+import json
+
+from .. import org_transfer
+from ..core.database import Base, engine
+from .. import models  # noqa: F401 - registra as tabelas no metadata
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    exp = sub.add_parser("export", help="grava o ZIP de uma organização")
+    exp.add_argument("--org", type=int, required=True, help="id da organização")
+    exp.add_argument("--out", required=True, help="arquivo .zip de saída")
+    exp.add_argument(
+        "--com-senhas", action="store_true",
+        help="inclui os hashes de senha (só para migrar a instância)",
+    )
+    imp = sub.add_parser("import", help="importa um ZIP como organização nova")
+    imp.add_argument("file", help="arquivo .zip gerado pelo export")
+    imp.add_argument("--name", help="nome da organização (padrão: o do arquivo)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    if args.cmd == "export":
+        with open(args.out, "wb") as f:
+            for chunk in org_transfer.export_org(args.org, include_password_hashes=args.com_senhas):
+                f.write(chunk)
+        print(f"exportado: {args.out}")
+    else:
+        try:
+            report = org_transfer.import_org(args.file, name=args.name)
+        except org_transfer.TransferError as e:
+            raise SystemExit(f"importação recusada: {e}")
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Confere o plano (EXPLAIN QUERY PLAN) das consultas quentes de cada router.
+
+Uso:
+    python -m app.tools.query_plans                 # banco temporário com dados sintéticos
+    python -m app.tools.query_plans --verbose       # mostra o plano de todas as consultas
+    python -m app.tools.bench --check-plans         # junto com o benchmark
+
+Roda as rotas do benchmark e as páginas de admin capturando o SQL (com os
+parâmetros) que chega ao SQLite e falha se algum SELECT fizer varredura
+completa de tabela (SCAN sem índice) ou ordenar em B-tree temporária,
+a não ser que esteja em ALLOWLIST (com o motivo).
+Consultas do startup (seeds) ficam de fora. Roda sem SHARD_PER_ORG: o plano
+é o mesmo em cada shard.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Consultas liberadas: regex sobre o SQL normalizado -> motivo
+ALLOWLIST: dict[str, str] = {
+    # SQLAlchemy confere a existência das tabelas no startup (create_all)
+    r"^PRAGMA ": "introspecção do SQLAlchemy",
+}
+
+# Rotas extras (além dos cenários do benchmark): páginas de admin e signup
+EXTRA_ROUTES = (
+    ("admin_usuarios", "GET", "/admin/usuarios", None),
+    ("admin_solicitacoes", "GET", "/admin/solicitacoes", None),
+    ("admin_solicitacoes_atendidas", "GET", "/admin/solicitacoes?status=atendidas&antes=1000000", None),
+    ("convites", "GET", "/invites", None),
+    ("biblioteca", "GET", "/biblioteca", None),
+    ("normas_duplicatas", "GET", "/normas/duplicatas?titulo=Norma&resumo=resumo+de+teste+com+palavras+suficientes", None),
+    ("signup", "GET", "/signup?code=NAOEXISTE", None),
+)
+
+_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(\S+)(?!.*USING (COVERING )?INDEX)")
+_TEMP = re.compile(r"USE TEMP B-TREE")
+
+
+def _normalize(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+@dataclass
+class CapturedQuery:
+    sql: str
+    params: tuple
+    routes: set = field(default_factory=set)
+
+
+class SqlCapture:
+    """Guarda cada SELECT distinto (com um exemplo de parâmetros) enquanto ativo."""
+
+    def __init__(self):
+        self.queries: dict[str, CapturedQuery] = {}
+        # None = fora de uma rota (startup/seed): não é consulta quente
+        self.route: str | None = None
+
+    def _listener(self, conn, cursor, statement, parameters, context, executemany):
+        if self.route is None:
+            return
+        sql = _normalize(statement)
+        if executemany or not sql.upper().startswith(("SELECT", "WITH")):
+            return
+        entry = self.queries.get(sql)
+        if entry is None:
+            params = tuple(parameters) if isinstance(parameters, (list, tuple)) else parameters
+            entry = self.queries[sql] = CapturedQuery(sql, params)
+        entry.routes.add(self.route)
+
+    def __enter__(self):
+        event.listen(Engine, "before_cursor_execute", self._listener)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, "before_cursor_execute", self._listener)
+
+
+@dataclass
+class PlanResult:
+    query: CapturedQuery
+    plan: list[str]
+    problems: list[str]
+    allowed: str | None = None
+
+
+def explain(db_path: str, queries: list[CapturedQuery], allowlist: dict[str, str] = ALLOWLIST) -> list[PlanResult]:
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        results = []
+        for q in queries:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {q.sql}", q.params or ()).fetchall()
+            plan = [r[3] for r in rows]
+            problems = []
+            for detail in plan:
+                if _SCAN.search(detail):
+                    problems.append(f"varredura completa: {detail}")
+                elif _TEMP.search(detail):
+                    problems.append(f"ordenação temporária: {detail}")
+            allowed = next((why for pat, why in allowlist.items() if re.search(pat, q.sql)), None)
+            results.append(PlanResult(q, plan, problems, allowed))
+        return results
+    finally:
+        conn.close()
+
+
+def report(results: list[PlanResult], verbose: bool = False, out=sys.stderr) -> int:
+    """Imprime o resultado; devolve o número de consultas reprovadas."""
+    failures = 0
+    for r in results:
+        failed = bool(r.problems) and not r.allowed
+        failures += failed
+        if not (failed or verbose):
+            continue
+        status = "FALHA" if failed else ("liberada" if r.problems else "ok")
+        print(f"\n[{status}] rotas: {', '.join(sorted(r.query.routes))}", file=out)
+        print(f"  {r.query.sql[:400]}", file=out)
+        for line in r.plan:
+            print(f"    -> {line}", file=out)
+        if r.problems and r.allowed:
+            print(f"  (allowlist: {r.allowed})", file=out)
+    print(
+        f"\n{len(results)} consultas verificadas, {failures} com varredura/ordenação sem índice.",
+        file=out,
+    )
+    return failures
+
+
+def check(engine, db_path: str, capture: SqlCapture, verbose: bool = False) -> int:
+    """ANALYZE + EXPLAIN de tudo o que foi capturado; devolve o número de falhas."""
+    # estatísticas atualizadas: o planejador do SQLite escolhe índices com base nelas
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    return report(explain(db_path, list(capture.queries.values())), verbose=verbose)
+
+
+async def _exercise(app, ctx: dict, capture: SqlCapture) -> None:
+    from .bench import AsgiClient, scenarios
+
+    client = AsgiClient(app)
+    await app.router.startup()
+    try:
+        routes = [
+            (name, method, path, data)
+            for name, method, path, data, _ in scenarios(ctx["email"], ctx["password"], ctx["doc_id"], ctx["patient"])
+        ]
+        # o login vem primeiro nos cenários: as demais rotas precisam da sessão
+        for name, method, path, data in routes + list(EXTRA_ROUTES):
+            capture.route = name
+            await client.request(method, path, data)
+        capture.route = None
+    finally:
+        await app.router.shutdown()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="arquivo SQLite (padrão: temporário)")
+    parser.add_argument("--orgs", type=int, default=2)
+    parser.add_argument("--notes", type=int, default=2000, help="notas por organização")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    tmpdir = None
+    if args.db:
+        os.environ["DB_PATH"] = os.path.abspath(args.db)
+    else:
+        tmpdir = tempfile.TemporaryDirectory(prefix="setting-plans-")
+        os.environ["DB_PATH"] = os.path.join(tmpdir.name, "plans.db")
+    os.environ["SHARD_PER_ORG"] = "0"
+
+    # sem log de acesso: milhares de requisições sintéticas só poluem a saída
+    os.environ.setdefault("ACCESS_LOG", "0")
+    # todas as requisições vêm do mesmo "IP": o limite de taxa pararia o login
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    # ANALYZE/arquivamento no meio da medição distorceriam os números
+    os.environ.setdefault("SCHEDULER_ENABLED", "0")
+
+    try:
+        from ..core.database import DB_PATH, engine, read_engine
+        from ..main import app
+        from .bench import prepare
+
+        ctx = prepare(argparse.Namespace(
+            orgs=args.orgs, users=5, notes=args.notes, cards=200, templates=20, patients=50,
+        ))
+        with SqlCapture() as capture:
+            asyncio.run(_exercise(app, ctx, capture))
+
+        failures = check(engine, DB_PATH, capture, verbose=args.verbose)
+        engine.dispose()
+        read_engine.dispose()
+        return 1 if failures else 0
+    finally:
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+"""
+Divide o banco principal em shards por organização.
+
+Uso:
+    python -m app.tools.shard_split               # copia e confere
+    python -m app.tools.shard_split --delete-source
+
+Para cada organização, copia as linhas de SHARD_TABLES para
+SHARD_DIR/org_<id>.db (INSERT ... SELECT via ATTACH, sem passar pelo Python),
+confere as contagens e preenche invite_code_index no catálogo.
+Com --delete-source, apaga do banco principal as linhas já copiadas.
+Rode com o app parado; depois ligue SHARD_PER_ORG=1.
+"""
+import argparse
+import os
+import sqlite3
+
+from ..core import shards
+from ..core.database import Base, DB_PATH, engine, ensure_autoincrement
+from .. import models  # noqa: F401 - registra as tabelas no metadata
+
+
+def _create_shard(path: str) -> None:
+    eng = shards.create_shard_engine(path)
+    try:
+        Base.metadata.create_all(bind=eng, tables=shards.shard_tables())
+    finally:
+        eng.dispose()
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> list[str]:
+    return [r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def split(db_path: str = DB_PATH, delete_source: bool = False, force: bool = False) -> dict:
+    Base.metadata.create_all(bind=engine)
+    ensure_autoincrement(engine)
+    engine.dispose()
+
+    os.makedirs(shards.SHARD_DIR, exist_ok=True)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    report = {}
+    try:
+        org_ids = [r[0] for r in conn.execute("SELECT id FROM organizations ORDER BY id")]
+        for org_id in org_ids:
+            path = shards.shard_path(org_id)
+            if os.path.exists(path) and not force:
+                raise SystemExit(f"Shard já existe: {path} (use --force para sobrescrever)")
+            if os.path.exists(path):
+                os.remove(path)
+            _create_shard(path)
+
+            conn.execute("ATTACH DATABASE ? AS shard", (path,))
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                counts = {}
+                for table in shards.SHARD_TABLES:
+                    cols = ", ".join(_columns(conn, "shard", table))
+                    conn.execute(
+                        f"INSERT INTO shard.{table} ({cols}) "
+                        f"SELECT {cols} FROM main.{table} WHERE organization_id = ?",
+                        (org_id,),
+                    )
+                    src = conn.execute(
+                        f"SELECT COUNT(*) FROM main.{table} WHERE organization_id = ?", (org_id,)
+                    ).fetchone()[0]
+                    dst = conn.execute(f"SELECT COUNT(*) FROM shard.{table}").fetchone()[0]
+                    if src != dst:
+                        raise RuntimeError(f"org {org_id}: {table} copiou {dst} de {src} linhas")
+                    counts[table] = dst
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO main.invite_code_index (code, organization_id) "
+                    "SELECT code, organization_id FROM main.invite_codes WHERE organization_id = ?",
+                    (org_id,),
+                )
+                if delete_source:
+                    for table in shards.SHARD_TABLES:
+                        conn.execute(f"DELETE FROM main.{table} WHERE organization_id = ?", (org_id,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.execute("DETACH DATABASE shard")
+
+            report[org_id] = counts
+            print(f"org {org_id}: " + ", ".join(f"{t}={n}" for t, n in counts.items()))
+    finally:
+        conn.close()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_PATH, help="banco principal (padrão: DB_PATH)")
+    parser.add_argument("--delete-source", action="store_true", help="apaga do banco principal as linhas copiadas")
+    parser.add_argument("--force", action="store_true", help="sobrescreve shards existentes")
+    args = parser.parse_args()
+    split(args.db, delete_source=args.delete_source, force=args.force)
+
+
+if __name__ == "__main__":
+    main()